@@ -1,21 +1,44 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_httpauth import HTTPBasicAuth
 from services.weather_service import WeatherService
+from services.forecast_record import to_json
+from services.credential_store import CredentialStore
 from routes.ping import ping_blueprint
 from routes.forecast import forecast_blueprint
+from routes.metrics import create_metrics_registry, metrics_blueprint
+from commands.city_index import build_city_index_command
+from commands.archive import backfill_archive_command
+from commands.cache_snapshot import snapshot_cache_command
 from utils.config import Config
+from utils.log import setup_logging
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
 import yaml
 
 # Define the root directory of the application. This is used for configuration file loading.
 WEATHER_ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def create_app(testing=False):
+class ForecastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider formatting the forecast records in responses, such as '12.3C'.
+    """
+    @staticmethod
+    def default(value):
+        try:
+            return to_json(value)
+        except TypeError:
+            return DefaultJSONProvider.default(value)
+
+def create_app(testing=False, start_background_tasks=True):
     """
     Initialize and configure the Flask application.
 
     Args:
         testing (bool): If True, the app will be configured for testing.
+        start_background_tasks (bool): If False, background threads are left for the 
+            caller to start, for example in each worker forked by a preloading server.
 
     Returns:
         Flask app: The configured Flask application.
@@ -24,6 +47,9 @@ def create_app(testing=False):
     app = Flask(__name__)
     app.url_map.strict_slashes = False
 
+    # Forecast records are only formatted into strings when a response is serialized.
+    app.json = ForecastJSONProvider(app)
+
     # Load configuration using Config singleton
     config_instance = Config.get_instance()
     config_instance.load_app_config(testing)
@@ -32,13 +58,46 @@ def create_app(testing=False):
     # Load config into app
     app.config.update(config_instance.get_app_config())
 
-    # Initialize WeatherService and other services
-    weather_service = WeatherService(config_instance)
+    # Set up logging once for the whole application, writing records from a background thread.
+    setup_logging(app.config)
+
+    # Check credentials against a store that reloads users.yaml when it changes, or on a signal.
+    credential_store = CredentialStore(
+        config_instance.get_user_credentials_path(),
+        check_interval_seconds=app.config.get('AUTH_RELOAD_CHECK_SECONDS', 1),
+        memo_seconds=app.config.get('AUTH_MEMO_SECONDS', 60),
+        memo_max_entries=app.config.get('AUTH_MEMO_MAX_ENTRIES', 10000)
+    )
+    app.extensions['credential_store'] = credential_store
+    # Under gunicorn, each worker installs the reload signal itself once it has started.
+    reload_signal = app.config.get('AUTH_RELOAD_SIGNAL')
+    if reload_signal and threading.current_thread() is threading.main_thread():
+        credential_store.install_reload_signal(reload_signal)
+
+    # Initialize WeatherService and other services once, and share them between requests.
+    weather_service = WeatherService(app.config)
+    app.extensions['weather_service'] = weather_service
+    app.extensions['metrics'] = create_metrics_registry(weather_service)
+
+    # Bound the number of batch items resolved concurrently across all requests.
+    app.extensions['batch_executor'] = ThreadPoolExecutor(
+        max_workers=app.config.get('BATCH_MAX_WORKERS', 8), thread_name_prefix='forecast-batch'
+    )
+
+    # Start background tasks, such as warming up the cache and keeping the most requested cities warm.
+    if start_background_tasks and not testing:
+        weather_service.start()
 
     # Register Blueprints
     app.register_blueprint(ping_blueprint)
+    app.register_blueprint(metrics_blueprint)
     app.register_blueprint(forecast_blueprint, url_prefix='/forecast')
 
+    # Register CLI commands, available through 'flask --app app <command>'.
+    app.cli.add_command(build_city_index_command)
+    app.cli.add_command(backfill_archive_command)
+    app.cli.add_command(snapshot_cache_command)
+
     # Define error handlers for different HTTP errors.
     @app.errorhandler(404)
     def not_found(error):
@@ -48,7 +107,7 @@ def create_app(testing=False):
     @app.errorhandler(Exception)
     def handle_exception(error):
         """Handle uncaught exceptions and log them."""
-        app.logger.error(f"Unhandled Exception: {error}")
+        app.logger.error("Unhandled Exception: %s", error)
         return jsonify({'error': 'Something went wrong', 'error_code': 'internal_server_error'}), 500
 
     return app
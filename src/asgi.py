@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+from routes.forecast import cache_headers, is_not_modified, parse_forecast_date, validate_batch
+from routes.metrics import request_finished, request_started
+from services.async_weather_service import AsyncWeatherService
+from services.forecast_record import to_json
+from services.weather_service import UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError
+
+# Routes served natively by the event loop; every other request goes to the Flask app.
+FORECAST_ROUTE = re.compile(r'^/forecast/([^/]+)/?$')
+BATCH_ROUTE = re.compile(r'^/forecast/batch/?$')
+
+# Route patterns of the native routes in the request metrics, as Flask names them.
+FORECAST_RULE = '/forecast/<city>/'
+BATCH_RULE = '/forecast/batch'
+
+class ForecastASGIApp:
+    def __init__(self, flask_app):
+        """
+        Initialize the ForecastASGIApp class around a Flask application.
+
+        The forecast routes, which spend nearly all their time waiting on upstream APIs,
+        are served natively on the event loop through an AsyncWeatherService. Every other
+        request is handed to the Flask application on a thread, so '/ping/', error
+        handling and any future route keep a single implementation.
+
+        Args:
+            flask_app (Flask): The application built by create_app.
+        """
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        self.weather_service = AsyncWeatherService(flask_app.extensions['weather_service'], flask_app.config)
+        self.batch_concurrency = flask_app.config.get('BATCH_MAX_WORKERS', 8)
+        self.max_batch_items = flask_app.config.get('BATCH_MAX_ITEMS', 100)
+        self.metrics = flask_app.extensions['metrics']
+        self.credential_store = flask_app.extensions['credential_store']
+        self.logger = logging.getLogger('ForecastASGIApp')
+
+    async def __call__(self, scope, receive, send):
+        """
+        Handle one ASGI connection.
+
+        Args:
+            scope (dict): The connection scope.
+            receive (callable): Awaitable returning the next event from the client.
+            send (callable): Awaitable sending an event to the client.
+        """
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http':
+            forecast_match = FORECAST_ROUTE.match(scope['path'])
+            if scope['method'] == 'POST' and BATCH_ROUTE.match(scope['path']):
+                await self._guarded(BATCH_RULE, self._batch, scope, receive, send)
+                return
+            if scope['method'] == 'GET' and forecast_match:
+                await self._guarded(FORECAST_RULE, self._forecast, scope, receive, send, forecast_match.group(1))
+                return
+
+        await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        """
+        Answer lifespan events, closing the upstream HTTP client on shutdown.
+
+        Args:
+            receive (callable): Awaitable returning the next lifespan event.
+            send (callable): Awaitable sending a lifespan event.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.weather_service.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _guarded(self, route, handler, scope, receive, send, *args):
+        """
+        Authenticate a forecast request, run its handler and turn errors into JSON responses.
+
+        The request is recorded in the same metrics as the requests served by Flask.
+
+        Args:
+            route (str): The route pattern of the request, for its metrics.
+            handler (callable): Coroutine function returning the JSON payload and status code.
+            scope (dict): The connection scope.
+            receive (callable): Awaitable returning the next event from the client.
+            send (callable): Awaitable sending an event to the client.
+        """
+        start = request_started(self.metrics, route)
+        status_code = 500
+        try:
+            if not self._authenticate(scope):
+                status_code = 401
+                await self._send(send, 401, b"Unauthorized Access", 'text/html; charset=utf-8',
+                                 [(b'www-authenticate', b'Basic realm="Authentication Required"')])
+                return
+
+            headers = {}
+            try:
+                data, status_code, *extra = await handler(scope, receive, *args)
+                if extra:
+                    headers = extra[0]
+            except Exception as error:
+                self.logger.error("Unhandled Exception: %s", error)
+                data, status_code = {'error': 'Something went wrong', 'error_code': 'internal_server_error'}, 500
+
+            header_pairs = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+            if status_code == 304:
+                await self._send(send, 304, b'', 'application/json', header_pairs)
+                return
+
+            # Serialize like Flask's jsonify, so both serving modes return identical bodies.
+            body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=to_json).encode() + b'\n'
+            await self._send(send, status_code, body, 'application/json', header_pairs)
+        finally:
+            request_finished(self.metrics, route, scope['method'], status_code, start)
+
+    def _authenticate(self, scope):
+        """
+        Check the Basic credentials of a request against the configured users.
+
+        Args:
+            scope (dict): The connection scope.
+
+        Returns:
+            bool: True if the credentials are valid.
+        """
+        header = dict(scope['headers']).get(b'authorization')
+        return self.credential_store.verify_authorization(header) is not None
+
+    async def _send(self, send, status_code, body, content_type, headers=()):
+        """
+        Send a complete HTTP response.
+
+        Args:
+            send (callable): Awaitable sending an event to the client.
+            status_code (int): The HTTP status code.
+            body (bytes): The response body.
+            content_type (str): The response content type.
+            headers (iterable): Extra header name and value pairs, as bytes.
+        """
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [
+                (b'content-type', content_type.encode()),
+                (b'content-length', str(len(body)).encode()),
+                *headers
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _locate(self, city, forecast_date=None):
+        """
+        Find the coordinates and time of a forecast request, like routes.forecast.locate_forecast.
+
+        Args:
+            city (str): The name of the city.
+            forecast_date (str, optional): The requested ISO-8601 date. Defaults to None.
+
+        Returns:
+            tuple: The latitude, longitude and timestamp and None, or None and an error
+                tuple of JSON payload and HTTP status code.
+        """
+        try:
+            lat, lon = await self.weather_service.convert_city_to_coordinates(city)
+        except GeocodingUnavailableError:
+            return None, (UPSTREAM_UNAVAILABLE_MESSAGE, 503)
+        if lat is None or lon is None:
+            return None, ({'error': f"Cannot find city '{city}'", 'error_code': 'city_not_found'}, 404)
+
+        timestamp, error = parse_forecast_date(forecast_date)
+        if error:
+            return None, error
+        return (lat, lon, timestamp), None
+
+    async def _resolve(self, city, forecast_date=None):
+        """
+        Resolve the weather for a city and optional date, like routes.forecast.resolve_forecast.
+
+        Args:
+            city (str): The name of the city.
+            forecast_date (str, optional): The requested ISO-8601 date. Defaults to None.
+
+        Returns:
+            tuple: JSON payload and HTTP status code.
+        """
+        location, error = await self._locate(city, forecast_date)
+        if error:
+            return error
+
+        status_code, data = await self.weather_service.get_weather(*location)
+        return data, status_code
+
+    async def _forecast(self, scope, receive, city):
+        """
+        Serve 'GET /forecast/<city>/'.
+
+        Args:
+            scope (dict): The connection scope.
+            receive (callable): Awaitable returning the next event from the client.
+            city (str): The name of the city.
+
+        Returns:
+            tuple: JSON payload, HTTP status code and caching headers; the status code is
+                304 if the client's copy, named by 'If-None-Match', is current.
+        """
+        # Like Flask's request.args, the first value wins and '+' decodes to a space.
+        query = parse_qs(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        forecast_date = query.get('at', [None])[0]
+
+        location, error = await self._locate(city, forecast_date)
+        if error:
+            return error
+
+        status_code, data = await self.weather_service.get_weather(*location)
+        if status_code != 200:
+            return data, status_code
+
+        # Answer clients that already hold this response without serializing it again.
+        headers = cache_headers(self.weather_service.weather_service, location, data)
+        if_none_match = dict(scope['headers']).get(b'if-none-match', b'').decode('latin-1')
+        if is_not_modified(if_none_match, headers):
+            return None, 304, headers
+        return data, 200, headers
+
+    async def _batch(self, scope, receive):
+        """
+        Serve 'POST /forecast/batch', resolving all items concurrently.
+
+        Args:
+            scope (dict): The connection scope.
+            receive (callable): Awaitable returning the next event from the client.
+
+        Returns:
+            tuple: JSON payload and HTTP status code.
+        """
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+
+        items, error = validate_batch(payload, self.max_batch_items)
+        if error:
+            return error
+
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def resolve_item(item):
+            async with semaphore:
+                try:
+                    return await self._resolve(item['city'], item.get('at'))
+                except Exception as error:
+                    self.logger.error("Batch item failed for city '%s': %s", item['city'], error)
+                    return {'error': 'Something went wrong', 'error_code': 'internal_server_error'}, 500
+
+        # Geocoding and weather fetches of all items overlap on the event loop.
+        outcomes = await asyncio.gather(*(resolve_item(item) for item in items))
+        results = [
+            {'city': item['city'], 'at': item.get('at'), 'status': status_code, 'body': data}
+            for item, (data, status_code) in zip(items, outcomes)
+        ]
+        return {'results': results}, 200
+
+def create_asgi_app(testing=False):
+    """
+    Create the ASGI application, for example with 'uvicorn --factory asgi:create_asgi_app'.
+
+    Args:
+        testing (bool): If True, the app will be configured for testing.
+
+    Returns:
+        ForecastASGIApp: The ASGI application.
+    """
+    return ForecastASGIApp(create_app(testing))
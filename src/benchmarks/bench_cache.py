@@ -0,0 +1,80 @@
+"""
+Micro-benchmark CacheService.get and CacheService.set at several cache sizes.
+
+For each size the database is filled with that many entries, then random keys are
+read through a cold instance (served by the database) and again (served by the memory
+tier), and new keys are written. Run from the 'src' directory:
+
+    python -m benchmarks.bench_cache --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import logging
+import random
+import shutil
+import tempfile
+import time
+from services.cache_service import CacheService
+from services.forecast_record import ForecastRecord, encode_value
+
+# A value shaped like a processed weather response.
+SAMPLE_VALUE = ForecastRecord(dt=1700000000, temp=12.3, pressure=1013, humidity=81, clouds=75)
+
+def time_per_operation(operation, keys):
+    """
+    Time an operation over a list of keys.
+
+    Args:
+        operation (callable): Called once per key.
+        keys (list): The keys.
+
+    Returns:
+        float: Mean time per operation in microseconds.
+    """
+    start = time.perf_counter()
+    for key in keys:
+        operation(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+def run(sizes, operations=2000):
+    """
+    Run the cache benchmark once per size.
+
+    Args:
+        sizes (list): Numbers of entries stored before measuring.
+        operations (int): Number of timed operations of each kind. Defaults to 2000.
+
+    Returns:
+        list: Mean microseconds per get and set for each size.
+    """
+    serialized = encode_value(SAMPLE_VALUE)
+    results = []
+    for size in sizes:
+        cache_dir = tempfile.mkdtemp(prefix='weather-bench-cache-')
+        try:
+            cache = CacheService(cache_dir=cache_dir, expiry_seconds=3600)
+            now = time.time()
+            cache.store.import_entries((f"key-{index}", serialized, now) for index in range(size))
+
+            keys = [f"key-{random.randrange(size)}" for _ in range(operations)]
+            cold_cache = CacheService(cache_dir=cache_dir, expiry_seconds=3600, memory_max_entries=operations)
+            results.append({
+                'entries': size,
+                'get_disk_us': time_per_operation(cold_cache.get, keys),
+                'get_memory_us': time_per_operation(cold_cache.get, keys),
+                'get_miss_us': time_per_operation(cold_cache.get, [f"missing-{index}" for index in range(operations)]),
+                'set_us': time_per_operation(lambda key: cache.set(key, SAMPLE_VALUE),
+                                             [f"new-{index}" for index in range(operations)])
+            })
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--operations', type=int, default=2000)
+    arguments = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(run(arguments.sizes, arguments.operations), indent=2))
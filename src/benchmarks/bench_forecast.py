@@ -0,0 +1,151 @@
+"""
+Measure '/forecast/<city>/' throughput and latency across cache-hit ratios.
+
+The application is served on a local port and calls a local stub of OpenWeatherMap, so
+the benchmark runs offline. The application and the stub each run in their own forked
+process, so neither competes with the load generator for the interpreter lock. For a hit
+ratio of 0.9, nine requests in ten ask for one of a few warmed-up cities and the tenth
+for a city never requested before, which misses both the geocoding and the weather
+caches. Run from the 'src' directory:
+
+    python -m benchmarks.bench_forecast --hit-ratios 0 0.5 0.9 1 --latency 0.05
+"""
+import argparse
+import base64
+import http.client
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import tempfile
+from urllib.parse import urlsplit
+from werkzeug.serving import make_server
+from app import create_app
+from services.weather_service import WeatherService
+from utils.config import Config
+from .bench_server_throughput import run as run_load
+from .stub_server import StubServer
+
+def build_app(stub_config, overrides=None):
+    """
+    Build the application against the stub, with empty caches in a temporary directory.
+
+    Args:
+        stub_config (dict): Settings pointing the service at the stub, from StubServer.config.
+        overrides (dict, optional): Extra configuration settings. Defaults to None.
+
+    Returns:
+        Flask: The application.
+    """
+    app = create_app(testing=True)
+    app.config.update(stub_config)
+    app.config.update({
+        'CACHE_DIR': tempfile.mkdtemp(prefix='weather-bench-'),
+        'CACHE_EXPIRY_SECONDS': 3600,
+        'HTTP_RETRY_BACKOFF': 0
+    })
+    app.config.update(overrides or {})
+    app.extensions['weather_service'] = WeatherService(app.config)
+    return app
+
+def serve_app(stub_config, connection):
+    """
+    Serve the application on a free local port; run in a child process.
+
+    Args:
+        stub_config (dict): Settings pointing the service at the stub.
+        connection (multiprocessing.connection.Connection): Receives the port once listening.
+    """
+    logging.disable(logging.INFO)
+    server = make_server('127.0.0.1', 0, build_app(stub_config), threaded=True)
+    connection.send(server.server_port)
+    server.serve_forever()
+
+def warm_up(base_url, paths, headers):
+    """
+    Request each path once, so later requests for it hit the caches.
+
+    Args:
+        base_url (str): Scheme, host and port of the application.
+        paths (list): The paths to request.
+        headers (dict): Headers sent with every request.
+    """
+    target = urlsplit(base_url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    for path in paths:
+        connection.request('GET', path, headers=headers)
+        connection.getresponse().read()
+    connection.close()
+
+def auth_headers():
+    """
+    Build Basic authentication headers for the first configured user.
+
+    Returns:
+        dict: The Authorization header.
+    """
+    username, password = next(iter(Config.get_instance().get_user_credentials().items()))
+    return {'Authorization': 'Basic ' + base64.b64encode(f"{username}:{password}".encode()).decode()}
+
+def run(hit_ratios, clients=16, duration=5, latency=0.0, error_rate=0.0, hot_cities=10):
+    """
+    Run the forecast benchmark once per hit ratio.
+
+    Args:
+        hit_ratios (list): Shares of requests that should hit the caches.
+        clients (int): Number of concurrent clients. Defaults to 16.
+        duration (float): Seconds of load per hit ratio. Defaults to 5.
+        latency (float): Seconds of latency added by the stub. Defaults to 0.
+        error_rate (float): Share of stub responses that are errors. Defaults to 0.
+        hot_cities (int): Number of warmed-up cities serving the hits. Defaults to 10.
+
+    Returns:
+        list: One result per hit ratio, with throughput and latency percentiles.
+    """
+    stub = StubServer(latency=latency, error_rate=error_rate).start(in_process=True)
+    context = multiprocessing.get_context('fork')
+    headers = auth_headers()
+    results = []
+    try:
+        for hit_ratio in hit_ratios:
+            receiver, sender = context.Pipe(duplex=False)
+            app_process = context.Process(target=serve_app, args=(stub.config(), sender), daemon=True)
+            app_process.start()
+            base_url = f"http://127.0.0.1:{receiver.recv()}"
+
+            # Warm up the hot cities, then mix hits and misses at the requested ratio.
+            hot_paths = [f"/forecast/hot-city-{index}/" for index in range(hot_cities)]
+            warm_up(base_url, hot_paths, headers)
+
+            cold_cities = itertools.count()
+            def next_path():
+                if random.random() < hit_ratio:
+                    return random.choice(hot_paths)
+                return f"/forecast/cold-city-{next(cold_cities)}/"
+
+            try:
+                result = run_load(base_url + '/', clients, duration, headers, next_path)
+            finally:
+                app_process.terminate()
+                app_process.join()
+
+            result.update({'hit_ratio': hit_ratio, 'upstream_latency': latency, 'upstream_error_rate': error_rate})
+            del result['url']
+            results.append(result)
+    finally:
+        stub.stop()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hit-ratios', type=float, nargs='+', default=[0.0, 0.5, 0.9, 0.99, 1.0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(run(arguments.hit_ratios, arguments.clients, arguments.duration,
+                         arguments.latency, arguments.error_rate), indent=2))
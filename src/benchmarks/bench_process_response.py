@@ -0,0 +1,55 @@
+"""
+Micro-benchmark WeatherService.process_response on onecall and timemachine payloads.
+
+Run from the 'src' directory:
+
+    python -m benchmarks.bench_process_response --iterations 100000
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+import timeit
+from services.weather_service import WeatherService
+from .stub_server import weather_point
+
+def run(iterations=100000):
+    """
+    Time process_response on representative payloads.
+
+    Args:
+        iterations (int): Number of timed calls per payload. Defaults to 100000.
+
+    Returns:
+        dict: Mean microseconds per call for each payload.
+    """
+    weather_service = WeatherService({
+        'API_KEY': 'benchmark',
+        'BASE_URL': 'http://127.0.0.1/onecall',
+        'GEOCODING_URL': 'http://127.0.0.1/geo',
+        'CACHE_DIR': tempfile.mkdtemp(prefix='weather-bench-')
+    })
+
+    now = int(time.time())
+    payloads = {
+        'onecall': {
+            'current': weather_point(51.5, -0.12, now),
+            'hourly': [weather_point(51.5, -0.12, now + step * 3600) for step in range(48)]
+        },
+        'timemachine': {'data': [weather_point(51.5, -0.12, now - 86400)]}
+    }
+
+    results = {'iterations': iterations}
+    for name, payload in payloads.items():
+        seconds = timeit.timeit(lambda: weather_service.process_response(payload), number=iterations)
+        results[f"{name}_us"] = seconds / iterations * 1e6
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100000)
+    arguments = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(run(arguments.iterations), indent=2))
@@ -0,0 +1,97 @@
+"""
+Measure the request throughput and latency of a running server.
+
+Start the server in the mode to compare, then run from the 'src' directory:
+
+    python -m benchmarks.bench_server_throughput http://127.0.0.1:8080/ping/ --clients 16 --duration 10
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+def percentile(sorted_values, fraction):
+    """
+    Pick a percentile from sorted values by the nearest-rank method.
+
+    Args:
+        sorted_values (list): Values in ascending order.
+        fraction (float): The percentile as a fraction, for example 0.99.
+
+    Returns:
+        float: The percentile, or 0.0 if there are no values.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run(url, clients, duration, headers=None, next_path=None):
+    """
+    Send requests from concurrent keep-alive clients for a fixed duration.
+
+    Args:
+        url (str): The URL requested by every client.
+        clients (int): Number of concurrent clients.
+        duration (float): How long to send requests, in seconds.
+        headers (dict, optional): Headers sent with every request. Defaults to None.
+        next_path (callable, optional): Returns the path and query of each request, 
+            overriding those of the URL. Defaults to None.
+
+    Returns:
+        dict: Throughput, error count and latency percentiles in milliseconds.
+    """
+    target = urlsplit(url)
+    path = target.path + (f"?{target.query}" if target.query else '')
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        client_latencies, client_errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', next_path() if next_path else path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    client_errors += 1
+            except (OSError, http.client.HTTPException):
+                client_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            client_latencies.append(time.perf_counter() - start)
+        connection.close()
+        latencies.extend(client_latencies)
+        errors.append(client_errors)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'url': url,
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    arguments = parser.parse_args()
+    print(json.dumps(run(arguments.url, arguments.clients, arguments.duration), indent=2))
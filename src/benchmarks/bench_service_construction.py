@@ -0,0 +1,45 @@
+"""
+Measure the per-request overhead removed by sharing application-scoped services.
+
+Before services were registered on the application, every forecast request built a
+new WeatherService, which reloaded configuration and opened its caches. This script
+times that construction against the lookup that replaced it.
+
+Run from the 'src' directory:
+
+    python -m benchmarks.bench_service_construction --iterations 200
+"""
+import argparse
+import json
+import tempfile
+import timeit
+from app import create_app
+from services.weather_service import WeatherService
+
+def run(iterations):
+    """
+    Time service construction against the application-scoped lookup.
+
+    Args:
+        iterations (int): Number of timed repetitions of each variant.
+
+    Returns:
+        dict: Mean time per request of each variant in microseconds.
+    """
+    app = create_app(testing=True)
+    app.config['CACHE_DIR'] = tempfile.mkdtemp()
+
+    with app.app_context():
+        construct = timeit.timeit(lambda: WeatherService(app.config), number=iterations)
+        lookup = timeit.timeit(lambda: app.extensions['weather_service'], number=iterations)
+
+    return {
+        'iterations': iterations,
+        'construct_per_request_us': construct / iterations * 1e6,
+        'shared_instance_us': lookup / iterations * 1e6
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    print(json.dumps(run(parser.parse_args().iterations), indent=2))
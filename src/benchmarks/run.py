@@ -0,0 +1,118 @@
+"""
+Run the benchmark suite and write its results as JSON.
+
+Results carry the commit they were measured on, so two runs can be compared to spot
+regressions. Run from the 'src' directory:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --compare results.json
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from . import bench_cache, bench_forecast, bench_process_response
+
+# Metrics where a larger value is better; for every other number, smaller is better.
+HIGHER_IS_BETTER = ('requests_per_second',)
+
+def current_commit():
+    """
+    Identify the checked-out commit.
+
+    Returns:
+        str: The commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(quick=False, suites=('forecast', 'cache', 'process_response')):
+    """
+    Run the selected benchmarks.
+
+    Args:
+        quick (bool): If True, use small sizes and short durations. Defaults to False.
+        suites (tuple): Names of the benchmarks to run.
+
+    Returns:
+        dict: Run metadata and the results of each benchmark.
+    """
+    results = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'quick': quick,
+        'results': {}
+    }
+    if 'forecast' in suites:
+        results['results']['forecast'] = bench_forecast.run(
+            [0.0, 0.5, 0.9, 0.99, 1.0], clients=16, duration=2 if quick else 10
+        )
+    if 'cache' in suites:
+        results['results']['cache'] = bench_cache.run(
+            [1000, 10000] if quick else [1000, 100000, 1000000], operations=1000 if quick else 5000
+        )
+    if 'process_response' in suites:
+        results['results']['process_response'] = bench_process_response.run(10000 if quick else 200000)
+    return results
+
+def compare(baseline, current, threshold=0.1):
+    """
+    List the metrics that got worse by more than a threshold between two runs.
+
+    Args:
+        baseline (dict): Results of the earlier run.
+        current (dict): Results of the later run.
+        threshold (float): Relative change tolerated. Defaults to 0.1.
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    regressions = []
+
+    def walk(path, before, after):
+        if isinstance(before, dict) and isinstance(after, dict):
+            for key in before.keys() & after.keys():
+                walk(f"{path}.{key}", before[key], after[key])
+        elif isinstance(before, list) and isinstance(after, list):
+            for index, (item_before, item_after) in enumerate(zip(before, after)):
+                walk(f"{path}[{index}]", item_before, item_after)
+        elif isinstance(before, float) and isinstance(after, float) and before > 0:
+            change = (after - before) / before
+            if path.endswith(HIGHER_IS_BETTER):
+                change = -change
+            if change > threshold:
+                regressions.append(f"{path}: {before:.3f} -> {after:.3f} ({change:+.0%} worse)")
+
+    walk('results', baseline.get('results', {}), current.get('results', {}))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="Use small sizes and short durations.")
+    parser.add_argument('--suites', nargs='+', default=['forecast', 'cache', 'process_response'])
+    parser.add_argument('--output', help="Write the results to this file instead of stdout.")
+    parser.add_argument('--compare', help="Report regressions against the results in this file.")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    arguments = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    current = run(arguments.quick, arguments.suites)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), current, arguments.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,232 @@
+"""
+Local stub of the OpenWeatherMap onecall, timemachine and geocoding APIs.
+
+Responses are generated deterministically from the request, so benchmarks run offline
+and are repeatable. Latency and errors can be injected to model a slow or failing
+provider. Run it on its own from the 'src' directory:
+
+    python -m benchmarks.stub_server --port 9090 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Paths served by the stub, to be used as BASE_URL and GEOCODING_URL.
+ONECALL_PATH = '/data/3.0/onecall'
+TIMEMACHINE_PATH = '/data/3.0/onecall/timemachine'
+GEOCODING_PATH = '/geo/1.0/direct'
+
+def weather_point(lat, lon, timestamp):
+    """
+    Generate a plausible, deterministic weather data point.
+
+    Args:
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+        timestamp (int): Unix timestamp of the data point.
+
+    Returns:
+        dict: The data point, shaped like the OpenWeatherMap API.
+    """
+    seed = zlib.crc32(f"{lat:.2f},{lon:.2f},{timestamp // 3600}".encode())
+    return {
+        'dt': timestamp,
+        'temp': round(-10 + (seed % 400) / 10, 2),
+        'pressure': 980 + seed % 50,
+        'humidity': seed % 101,
+        'clouds': (seed >> 8) % 101
+    }
+
+def city_coordinates(city_name):
+    """
+    Derive deterministic coordinates from a city name.
+
+    Args:
+        city_name (str): The requested city name.
+
+    Returns:
+        tuple: Latitude and longitude.
+    """
+    seed = zlib.crc32(city_name.strip().lower().encode())
+    return round((seed % 18000) / 100 - 90, 4), round(((seed >> 8) % 36000) / 100 - 180, 4)
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep client connections open, like the real API, and send headers and body without
+    # waiting for Nagle's algorithm, which would add delayed-ACK stalls to every response.
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """
+        Answer a GET request after the configured latency, or with an injected error.
+        """
+        settings = self.server.settings
+        latency = settings['latency'] + random.uniform(0, settings['jitter'])
+        if latency:
+            time.sleep(latency)
+
+        target = urlsplit(self.path)
+        with self.server.lock:
+            self.server.request_counts[target.path] = self.server.request_counts.get(target.path, 0) + 1
+
+        if random.random() < settings['error_rate']:
+            self._send(settings['error_status'], {'cod': settings['error_status'], 'message': 'Injected error'})
+            return
+
+        query = {key: values[0] for key, values in parse_qs(target.query).items()}
+        if target.path == GEOCODING_PATH:
+            self._geocode(query)
+        elif target.path == TIMEMACHINE_PATH:
+            lat, lon = float(query['lat']), float(query['lon'])
+            timestamp = int(query['dt'])
+            self._send(200, {'lat': lat, 'lon': lon, 'timezone': 'UTC', 'data': [weather_point(lat, lon, timestamp)]})
+        elif target.path == ONECALL_PATH:
+            lat, lon = float(query['lat']), float(query['lon'])
+            now = int(time.time())
+            hour = now - now % 3600
+            self._send(200, {
+                'lat': lat,
+                'lon': lon,
+                'timezone': 'UTC',
+                'current': weather_point(lat, lon, now),
+                'hourly': [weather_point(lat, lon, hour + step * 3600) for step in range(48)]
+            })
+        else:
+            self._send(404, {'cod': 404, 'message': 'Not found'})
+
+    def _geocode(self, query):
+        """
+        Answer a geocoding request. Names starting with 'unknown' are not found.
+
+        Args:
+            query (dict): The query string parameters.
+        """
+        city_name = query.get('q', '')
+        if not city_name or city_name.lower().startswith('unknown'):
+            self._send(200, [])
+            return
+        lat, lon = city_coordinates(city_name)
+        self._send(200, [{'name': city_name, 'lat': lat, 'lon': lon, 'country': 'XX'}])
+
+    def _send(self, status_code, payload):
+        """
+        Send a JSON response.
+
+        Args:
+            status_code (int): The HTTP status code.
+            payload (any): The JSON payload.
+        """
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500):
+        """
+        Initialize the StubServer class.
+
+        Args:
+            host (str): Address to listen on. Defaults to '127.0.0.1'.
+            port (int): Port to listen on, 0 for any free port. Defaults to 0.
+            latency (float): Seconds added to every response. Defaults to 0.
+            jitter (float): Maximum random seconds added on top of the latency. Defaults to 0.
+            error_rate (float): Share of requests answered with an error. Defaults to 0.
+            error_status (int): Status code of injected errors. Defaults to 500.
+        """
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.settings = {
+            'latency': latency,
+            'jitter': jitter,
+            'error_rate': error_rate,
+            'error_status': error_status
+        }
+        self.server.request_counts = {}
+        self.server.lock = threading.Lock()
+        self._thread = None
+        self._process = None
+
+    @property
+    def url(self):
+        """
+        The base URL of the stub.
+        """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self):
+        """
+        Number of requests received per path.
+        """
+        return dict(self.server.request_counts)
+
+    def config(self):
+        """
+        Return the application settings pointing the service at the stub.
+
+        Returns:
+            dict: BASE_URL and GEOCODING_URL settings.
+        """
+        return {'BASE_URL': self.url + ONECALL_PATH, 'GEOCODING_URL': self.url + GEOCODING_PATH}
+
+    def start(self, in_process=False):
+        """
+        Serve requests in a daemon thread, or in a forked process.
+
+        A separate process keeps the stub from competing for the interpreter lock with
+        the code being measured, but request counts are then not collected.
+
+        Args:
+            in_process (bool): If True, serve from a forked child process. Defaults to False.
+
+        Returns:
+            StubServer: The started stub.
+        """
+        if in_process:
+            self._process = multiprocessing.get_context('fork').Process(
+                target=self.server.serve_forever, name='owm-stub', daemon=True
+            )
+            self._process.start()
+        else:
+            self._thread = threading.Thread(target=self.server.serve_forever, name='owm-stub', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        else:
+            self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    arguments = parser.parse_args()
+
+    stub = StubServer(arguments.host, arguments.port, arguments.latency, arguments.jitter,
+                      arguments.error_rate, arguments.error_status)
+    print(json.dumps(stub.config()))
+    stub.server.serve_forever()
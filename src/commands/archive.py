@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from services.city_index import normalize_city_name
+from services.forecast_record import ForecastRecord
+from services.providers import read_recordings
+from services.spatial import haversine_km
+
+def _parse_date(value):
+    """
+    Parse a YYYY-MM-DD date as midnight UTC.
+
+    Args:
+        value (str): The date.
+
+    Returns:
+        int: Unix timestamp of the date.
+    """
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+@click.command('backfill-archive')
+@click.argument('recordings', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--city', 'cities', multiple=True, required=True,
+              help="City to backfill, known to the city index or geocoding cache. Repeat for several cities.")
+@click.option('--start', required=True, help="First day to backfill, as YYYY-MM-DD.")
+@click.option('--end', required=True, help="Last day to backfill, as YYYY-MM-DD.")
+@click.option('--radius-km', type=float, default=5, show_default=True,
+              help="Largest distance between a city and the location of a recording.")
+@with_appcontext
+def backfill_archive_command(recordings, cities, start, end, radius_km):
+    """
+    Fill the historical archive from recorded timemachine responses, without calling the API.
+
+    RECORDINGS are JSON files of OpenWeatherMap timemachine responses, one response, a
+    list of responses, or one response per line. Observations from START to END
+    inclusive, recorded within the radius of a city, are archived under that city.
+    """
+    weather_service = current_app.extensions['weather_service']
+    if weather_service.archive is None:
+        raise click.UsageError("The archive is disabled; set ARCHIVE_DIR in the configuration.")
+    try:
+        start_timestamp, end_timestamp = _parse_date(start), _parse_date(end) + 24 * 60 * 60
+    except ValueError:
+        raise click.UsageError("Dates must be formatted as YYYY-MM-DD.")
+
+    # Resolve every city offline, to the coordinates requests for it are served from.
+    locations = {}
+    for city in cities:
+        coordinates = weather_service.lookup_city_offline(normalize_city_name(city))
+        if not coordinates:
+            raise click.UsageError(f"Unknown city: {city}. Add it to the city index first.")
+        locations[city] = coordinates
+
+    # Collect the observations of each city, so each partition is written once.
+    observations = {city: [] for city in cities}
+    for response in read_recordings(recordings):
+        for city, (lat, lon) in locations.items():
+            if haversine_km(lat, lon, response['lat'], response['lon']) > radius_km:
+                continue
+            for data_point in response.get('data', []):
+                record = ForecastRecord.from_data_point(data_point)
+                if record.dt is not None and start_timestamp <= record.dt < end_timestamp:
+                    observations[city].append(record)
+
+    for city, records in observations.items():
+        lat, lon = weather_service.quantize(*locations[city])
+        added = weather_service.archive.add(lat, lon, records)
+        click.echo(f"Archived {added} observations for {city}")
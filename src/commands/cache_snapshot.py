@@ -0,0 +1,22 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+@click.command('snapshot-cache')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help="Where to write the snapshot. Defaults to the CACHE_SNAPSHOT_PATH setting.")
+@with_appcontext
+def snapshot_cache_command(output):
+    """
+    Write the newest servable entries of the weather and geocoding caches to a snapshot file.
+
+    A new instance configured with the snapshot as CACHE_SNAPSHOT_PATH restores it at
+    startup, and starts with a hot cache instead of an empty one.
+    """
+    weather_service = current_app.extensions['weather_service']
+    output = output or weather_service.snapshot_path
+    if not output:
+        raise click.UsageError("Pass --output or set CACHE_SNAPSHOT_PATH in the configuration.")
+
+    written = weather_service.snapshot(output)
+    click.echo(f"Wrote {written} cache entries to {output}")
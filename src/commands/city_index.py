@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from services.city_index import CityIndex
+
+@click.command('build-city-index')
+@click.argument('gazetteer', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help="Where to write the index. Defaults to the CITY_INDEX_PATH setting.")
+@click.option('--min-population', type=int, default=0, show_default=True,
+              help="Skip places with fewer inhabitants.")
+@click.option('--alternate-names/--no-alternate-names', default=False, show_default=True,
+              help="Also index the alternate names of each place.")
+@with_appcontext
+def build_city_index_command(gazetteer, output, min_population, alternate_names):
+    """
+    Build the offline city index from a GeoNames dump.
+
+    GAZETTEER is a tab-separated GeoNames file such as 'cities15000.txt'. Restart the
+    service after rebuilding the index so that workers load the new file.
+    """
+    output = output or current_app.config.get('CITY_INDEX_PATH')
+    if not output:
+        raise click.UsageError("Pass --output or set CITY_INDEX_PATH in the configuration.")
+
+    city_index = CityIndex.build_from_gazetteer(gazetteer, min_population, alternate_names)
+    city_index.save(output)
+    click.echo(f"Indexed {len(city_index)} names into {output}")
@@ -0,0 +1,54 @@
+# Gunicorn settings for the production server. Every setting can be overridden with
+# an environment variable, for example WEB_WORKERS=8.
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8080')
+
+# Worker processes, and threads per worker for requests waiting on upstream calls.
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Seconds an idle client connection is kept open.
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Recycle workers after this many requests, with jitter so they do not restart together.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Build the application in the master so workers share it copy-on-write.
+preload_app = True
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', None)
+errorlog = '-'
+
+def post_fork(server, worker):
+    """
+    Reset per-process state inherited from the master and start background tasks.
+    """
+    from wsgi import app
+    weather_service = app.extensions['weather_service']
+    weather_service.after_fork()
+    weather_service.start()
+
+def post_worker_init(worker):
+    """
+    Install the credentials reload signal in the worker, after gunicorn has set up its own signal handlers.
+    """
+    from wsgi import app
+    reload_signal = app.config.get('AUTH_RELOAD_SIGNAL')
+    if reload_signal:
+        app.extensions['credential_store'].install_reload_signal(reload_signal)
+
+def on_exit(server):
+    """
+    Snapshot the cache when the server shuts down, so the next instance starts hot.
+    """
+    from wsgi import app
+    weather_service = app.extensions['weather_service']
+    if weather_service.snapshot_path:
+        weather_service.snapshot()
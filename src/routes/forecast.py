@@ -1,30 +1,38 @@
 from flask import Blueprint, jsonify, request, current_app
-from services.weather_service import WeatherService
 from dateutil.parser import parse
-from datetime import datetime as dt, timedelta
+from datetime import datetime as dt, timezone
 from flask_httpauth import HTTPBasicAuth
-from utils.config import Config
-import os
-import pytz
-import yaml
+from werkzeug.http import parse_etags
+from services.forecast_record import ForecastRecord
+from services.weather_service import UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError
+import hashlib
+import time
 
 # Create a Blueprint for the forecast route
 forecast_blueprint = Blueprint('forecast', __name__)
 
-# Update the load_user_credentials function to use the Config class
-def load_user_credentials(testing=False):
-    config_instance = Config.get_instance()
-    config_instance.load_user_credentials()
-    return config_instance.get_user_credentials()
-
-users = load_user_credentials()
-
 auth = HTTPBasicAuth()
 
+# Bounds of the 'at' parameter: the first date with historical data, and the days of forecast ahead.
+MIN_FORECAST_TIMESTAMP = int(dt(1979, 1, 1, tzinfo=timezone.utc).timestamp())
+MAX_FORECAST_DAYS_AHEAD = 4
+
 @auth.verify_password
 def verify_password(username, password):
-    if username in users and users[username] == password:
-        return username
+    """
+    Check the credentials of the current request against the application's credential store.
+
+    The whole Authorization header is checked, so that repeat requests are answered
+    from the store's memo of verified headers.
+
+    Args:
+        username (str): The user name, already decoded from the header.
+        password (str): The password, already decoded from the header.
+
+    Returns:
+        str: The user name if the credentials are valid, otherwise None.
+    """
+    return current_app.extensions['credential_store'].verify_authorization(request.headers.get('Authorization'))
 
 # Apply authentication to the forecast blueprint
 @forecast_blueprint.before_request
@@ -32,6 +40,154 @@ def verify_password(username, password):
 def before_forecast():
     pass
 
+def parse_forecast_date(forecast_date):
+    """
+    Validate an ISO-8601 'at' value and convert it to a Unix timestamp.
+
+    Args:
+        forecast_date (str): The requested date, or None for current weather.
+
+    Returns:
+        tuple: The timestamp (None for current weather) and None, or None and an error
+            tuple of JSON payload and HTTP status code.
+    """
+    if not forecast_date:
+        return None, None
+
+    forecast_date = forecast_date.replace(" ", "+")
+    try:
+        # Parse the provided date, trying the strict ISO-8601 parser before the lenient one.
+        try:
+            datetime_obj = dt.fromisoformat(forecast_date)
+        except ValueError:
+            datetime_obj = parse(forecast_date)
+        if datetime_obj.tzinfo is None or datetime_obj.tzinfo.utcoffset(datetime_obj) is None:
+            datetime_obj = datetime_obj.replace(tzinfo=timezone.utc)
+        timestamp = int(datetime_obj.timestamp())
+    except (ValueError, OverflowError):
+        return None, ({'error': 'Invalid date format', 'error_code': 'invalid_date_format'}, 400)
+
+    if timestamp < MIN_FORECAST_TIMESTAMP:
+        return None, ({'error': 'Dates before January 1st, 1979 are not supported', 'error_code': 'invalid_date'}, 400)
+
+    # Check if the date is more than 4 days in the future.
+    if timestamp > time.time() + MAX_FORECAST_DAYS_AHEAD * 24 * 3600:
+        return None, ({'error': 'Dates more than 4 days in the future are not supported', 'error_code': 'invalid_date'}, 400)
+
+    return timestamp, None
+
+def locate_forecast(weather_service, city, forecast_date=None):
+    """
+    Find the coordinates and time of a forecast request.
+
+    Args:
+        weather_service (WeatherService): The application's weather service.
+        city (str): The name of the city.
+        forecast_date (str, optional): The requested ISO-8601 date. Defaults to None.
+
+    Returns:
+        tuple: The latitude, longitude and timestamp (None for current weather) and None,
+            or None and an error tuple of JSON payload and HTTP status code.
+    """
+    # Convert the city name to geographic coordinates, answering like a weather fetch if the API is unavailable.
+    try:
+        lat, lon = weather_service.convert_city_to_coordinates(city)
+    except GeocodingUnavailableError:
+        return None, (UPSTREAM_UNAVAILABLE_MESSAGE, 503)
+    if lat is None or lon is None:
+        return None, ({'error': f"Cannot find city '{city}'", 'error_code': 'city_not_found'}, 404)
+
+    timestamp, error = parse_forecast_date(forecast_date)
+    if error:
+        return None, error
+    return (lat, lon, timestamp), None
+
+def resolve_forecast(weather_service, city, forecast_date=None):
+    """
+    Resolve the weather for a city and optional date through the weather service.
+
+    Args:
+        weather_service (WeatherService): The application's weather service.
+        city (str): The name of the city.
+        forecast_date (str, optional): The requested ISO-8601 date. Defaults to None.
+
+    Returns:
+        tuple: JSON payload and HTTP status code.
+    """
+    location, error = locate_forecast(weather_service, city, forecast_date)
+    if error:
+        return error
+
+    # Fetch the weather data.
+    status_code, data = weather_service.get_weather(*location)
+    return data, status_code
+
+def cache_headers(weather_service, location, data):
+    """
+    Build the HTTP caching headers of a successful forecast response.
+
+    'Cache-Control' lets clients keep the response for the remaining lifetime of the
+    cache entry it was served from. Responses require authentication, so they are
+    marked private and shared caches never serve them to other clients. The strong
+    'ETag' is a hash of the binary form of the record, so it is computed without
+    serializing the response.
+
+    Args:
+        weather_service (WeatherService): The application's weather service.
+        location (tuple): The latitude, longitude and timestamp of the forecast.
+        data (any): The weather data returned by the weather service.
+
+    Returns:
+        dict: The 'Cache-Control' header, and the 'ETag' header for forecast records.
+    """
+    max_age = weather_service.time_to_live(*location)
+    headers = {'Cache-Control': f"private, max-age={max_age}" if max_age > 0 else 'no-cache'}
+    if isinstance(data, ForecastRecord):
+        headers['ETag'] = f'"{hashlib.blake2b(data.encode(), digest_size=16).hexdigest()}"'
+    return headers
+
+def is_not_modified(if_none_match, headers):
+    """
+    Check whether an 'If-None-Match' request header matches the ETag of a response.
+
+    Args:
+        if_none_match (str): The request header, or None.
+        headers (dict): The headers built by cache_headers.
+
+    Returns:
+        bool: True if the client's copy is current and a 304 response can be sent.
+    """
+    etag = headers.get('ETag')
+    if not if_none_match or etag is None:
+        return False
+    return parse_etags(if_none_match).contains_weak(etag.strip('"'))
+
+def validate_batch(payload, max_items):
+    """
+    Validate the JSON body of a batch forecast request.
+
+    Args:
+        payload (any): The decoded JSON body, or None if it was missing or invalid.
+        max_items (int): Maximum number of items allowed in one batch.
+
+    Returns:
+        tuple: The list of items and None, or None and an error tuple of JSON payload 
+            and HTTP status code.
+    """
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, ({'error': "Expected a JSON object with a non-empty 'items' list", 'error_code': 'invalid_batch'}, 400)
+
+    if len(items) > max_items:
+        return None, ({'error': f"Batches are limited to {max_items} items", 'error_code': 'batch_too_large'}, 400)
+
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('city'), str) \
+                or not isinstance(item.get('at', ''), (str, type(None))):
+            return None, ({'error': "Each item needs a 'city' string and an optional 'at' string", 'error_code': 'invalid_batch'}, 400)
+
+    return items, None
+
 @forecast_blueprint.route('/<city>/', methods=['GET'])
 def get_forecast(city):
     """
@@ -45,43 +201,60 @@ def get_forecast(city):
         city (str): The name of the city.
 
     Returns:
-        Response: JSON response containing weather data or an error message.
+        Response: JSON response containing weather data or an error message, or an
+            empty 304 response if the client's copy, named by 'If-None-Match', is current.
     """
-    weather_service = WeatherService(current_app.config)
+    weather_service = current_app.extensions['weather_service']
 
-    # Convert the city name to geographic coordinates.
-    lat, lon = weather_service.convert_city_to_coordinates(city)
-    if lat is None or lon is None:
-        return jsonify({'error': f"Cannot find city '{city}'", 'error_code': 'city_not_found'}), 404
+    try:
+        location, error = locate_forecast(weather_service, city, request.args.get('at', None))
+        if error:
+            return jsonify(error[0]), error[1]
 
-    forecast_date = request.args.get('at', None)
-    if forecast_date:
-        forecast_date = forecast_date.replace(" ", "+")
-        try:
-            # Parse the provided date and ensure it's in a valid format.
-            datetime_obj = parse(forecast_date)
-            if datetime_obj.tzinfo is None or datetime_obj.tzinfo.utcoffset(datetime_obj) is None:
-                datetime_obj = datetime_obj.replace(tzinfo=pytz.UTC)
-            compare_date = parse("1979-01-01").replace(tzinfo=pytz.UTC)
+        status_code, data = weather_service.get_weather(*location)
+        if status_code != 200:
+            return jsonify(data), status_code
 
-            if datetime_obj < compare_date:
-                return jsonify({'error': 'Dates before January 1st, 1979 are not supported', 'error_code': 'invalid_date'}), 400
+        # Answer clients that already hold this response without serializing it again.
+        headers = cache_headers(weather_service, location, data)
+        if is_not_modified(request.headers.get('If-None-Match'), headers):
+            return '', 304, headers
+        return jsonify(data), 200, headers
+    except Exception as e:
+        return jsonify({'error': 'Something went wrong', 'error_code': 'internal_server_error'}), 500
 
-            # Check if the date is more than 4 days in the future.
-            max_future_date = dt.now(pytz.UTC) + timedelta(days=4)
-            if datetime_obj > max_future_date:
-                return jsonify({'error': 'Dates more than 4 days in the future are not supported', 'error_code': 'invalid_date'}), 400
+@forecast_blueprint.route('/batch', methods=['POST'])
+def post_batch_forecast():
+    """
+    Retrieve the weather forecast for many cities in one request.
 
-            timestamp = int(datetime_obj.timestamp())
+    The request body is a JSON object with an 'items' list, each item holding a 'city' 
+    and an optional ISO-8601 'at' date. Items are resolved concurrently on the 
+    application's bounded batch pool, and each result carries its own status code.
 
-        except ValueError:
-            return jsonify({'error': 'Invalid date format', 'error_code': 'invalid_date_format'}), 400
-    else:
-        timestamp = None
+    Returns:
+        Response: JSON response with one result per item, in request order, or an error message.
+    """
+    items, error = validate_batch(request.get_json(silent=True), current_app.config.get('BATCH_MAX_ITEMS', 100))
+    if error:
+        return jsonify(error[0]), error[1]
 
-    try:
-        # Fetch and return the weather data.
-        status_code, data = weather_service.get_weather(lat, lon, timestamp)
-        return jsonify(data), status_code
-    except Exception as e:
-        return jsonify({'error': 'Something went wrong', 'error_code': 'internal_server_error'}), 500
\ No newline at end of file
+    weather_service = current_app.extensions['weather_service']
+    batch_executor = current_app.extensions['batch_executor']
+    logger = current_app.logger
+
+    def resolve_item(item):
+        try:
+            return resolve_forecast(weather_service, item['city'], item.get('at'))
+        except Exception as e:
+            logger.error("Batch item failed for city '%s': %s", item['city'], e)
+            return {'error': 'Something went wrong', 'error_code': 'internal_server_error'}, 500
+
+    # Resolve all items concurrently and keep the results in request order.
+    futures = [batch_executor.submit(resolve_item, item) for item in items]
+    results = []
+    for item, future in zip(items, futures):
+        data, status_code = future.result()
+        results.append({'city': item['city'], 'at': item.get('at'), 'status': status_code, 'body': data})
+
+    return jsonify({'results': results}), 200
@@ -0,0 +1,190 @@
+# routes/metrics.py
+
+import time
+from flask import Blueprint, Response, current_app, g, request
+from services.circuit_breaker import CircuitBreaker
+from utils.metrics import MetricsRegistry
+
+# Blueprint setup for the 'metrics' route, which also instruments every request of the application.
+metrics_blueprint = Blueprint('metrics', __name__)
+
+# Names of the request metrics updated on every request.
+REQUEST_DURATION = 'weather_http_request_duration_seconds'
+REQUESTS_IN_FLIGHT = 'weather_http_requests_in_flight'
+
+# Route label of requests that matched no route.
+UNMATCHED_ROUTE = '<unmatched>'
+
+def create_metrics_registry(weather_service):
+    """
+    Create the registry of the application metrics.
+
+    Request metrics are updated as requests are served. Upstream and cache metrics are
+    read from the counters the services already keep, when the registry is rendered.
+
+    Args:
+        weather_service (WeatherService): The service whose upstream calls and caches are reported.
+
+    Returns:
+        MetricsRegistry: The registry.
+    """
+    registry = MetricsRegistry()
+    registry.histogram(REQUEST_DURATION, "Time spent serving HTTP requests.", ('route', 'method', 'status'))
+    registry.gauge(REQUESTS_IN_FLIGHT, "HTTP requests currently being served.", ('route',))
+
+    # Upstream calls, labelled 'geocode', 'onecall' or 'timemachine'.
+    http = weather_service.http
+    registry.register('weather_upstream_request_duration_seconds', 'histogram',
+                      "Time spent calling the OpenWeatherMap API, including retries.", ('operation',), http.latency)
+    registry.register('weather_upstream_requests_in_flight', 'gauge',
+                      "Calls to the OpenWeatherMap API currently in flight.", ('operation',), http.in_flight)
+
+    # Circuit breaker states, 0 when closed, 1 when half open and 2 when open, and hedged requests sent.
+    breaker_states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    registry.register('weather_upstream_circuit_state', 'gauge',
+                      "State of the circuit breaker of each upstream operation: 0 closed, 1 half open, 2 open.",
+                      ('operation',), lambda: {name: breaker_states[breaker.state] for name, breaker in list(http.breakers.items())})
+    registry.register('weather_upstream_hedged_requests_total', 'counter',
+                      "Second attempts sent because the first was slower than the 95th percentile.",
+                      ('operation',), http.hedges)
+
+    # Weather fetches answered by each provider, provider calls that failed, and fan-outs skipped for a busy pool.
+    providers = weather_service.providers
+    registry.register('weather_provider_responses_total', 'counter',
+                      "Weather fetches answered by each provider.", ('provider',), providers.wins)
+    registry.register('weather_provider_failures_total', 'counter',
+                      "Weather provider calls that failed without a response.", ('provider',), providers.failures)
+    registry.register('weather_provider_skipped_fanouts_total', 'counter',
+                      "Weather fetches failed over on the request thread because the fan-out pool was busy.",
+                      ('policy',), providers.skipped_fanouts)
+
+    # Upstream quota, if one is configured.
+    quota = weather_service.quota
+    if quota is not None:
+        registry.register('weather_upstream_quota_remaining', 'gauge',
+                          "Upstream calls left in the token bucket shared by all workers.", (),
+                          lambda: {None: quota.remaining()})
+        registry.register('weather_upstream_quota_denials_total', 'counter',
+                          "Upstream calls refused for lack of quota, by priority.", ('priority',), quota.denials)
+
+    caches = (weather_service.cache, weather_service.geocoding_cache)
+
+    def cache_lookups():
+        return {
+            (cache.name, result): count
+            for cache in caches
+            for result, count in cache.lookups.values().items()
+        }
+
+    def cache_evictions():
+        return {cache.name: cache.memory.evictions for cache in caches}
+
+    def cache_entries():
+        entries = {}
+        for cache in caches:
+            entries[(cache.name, 'memory')] = len(cache.memory)
+            entries[(cache.name, 'disk')] = len(cache.store)
+        return entries
+
+    def cache_removals():
+        return {
+            (cache.name, reason): count
+            for cache in caches
+            for reason, count in cache.removals.values().items()
+        }
+
+    def cache_bytes():
+        return {cache.name: cache.memory.size_bytes for cache in caches}
+
+    registry.register('weather_cache_lookups_total', 'counter',
+                      "Cache lookups by outcome: memory_hits, disk_hits, stale_hits, misses or expirations.",
+                      ('cache', 'result'), cache_lookups)
+    registry.register('weather_cache_evictions_total', 'counter',
+                      "Entries evicted from the memory tier.", ('cache',), cache_evictions)
+    registry.register('weather_cache_disk_removals_total', 'counter',
+                      "Entries removed from the cache database by sweeps, by reason: expired or evicted.",
+                      ('cache', 'reason'), cache_removals)
+    registry.register('weather_cache_entries', 'gauge',
+                      "Entries held by a cache tier.", ('cache', 'tier'), cache_entries)
+    registry.register('weather_cache_memory_bytes', 'gauge',
+                      "Estimated size of the memory tier in bytes.", ('cache',), cache_bytes)
+    return registry
+
+def request_started(registry, route):
+    """
+    Count a request as in flight.
+
+    Args:
+        registry (MetricsRegistry): The registry of the application.
+        route (str): The route pattern of the request.
+
+    Returns:
+        float: The start time of the request, to pass to request_finished.
+    """
+    registry.get(REQUESTS_IN_FLIGHT).inc(route)
+    return time.perf_counter()
+
+def request_finished(registry, route, method, status_code, start):
+    """
+    Record the duration of a request and stop counting it as in flight.
+
+    Args:
+        registry (MetricsRegistry): The registry of the application.
+        route (str): The route pattern of the request.
+        method (str): The HTTP method.
+        status_code (int): The HTTP status code of the response.
+        start (float): The start time returned by request_started.
+    """
+    registry.get(REQUEST_DURATION).observe(time.perf_counter() - start, (route, method, status_code))
+    registry.get(REQUESTS_IN_FLIGHT).dec(route)
+
+def _route():
+    """
+    Return the route pattern of the current request, so URLs of one route share their labels.
+    """
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+@metrics_blueprint.before_app_request
+def start_request_metrics():
+    """
+    Start timing the current request.
+    """
+    g.metrics_start = request_started(current_app.extensions['metrics'], _route())
+
+@metrics_blueprint.after_app_request
+def record_request_metrics(response):
+    """
+    Record the duration and status of the current request.
+
+    Args:
+        response (Response): The response about to be sent.
+
+    Returns:
+        Response: The unchanged response.
+    """
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        request_finished(current_app.extensions['metrics'], _route(), request.method, response.status_code, start)
+    return response
+
+@metrics_blueprint.teardown_app_request
+def end_request_metrics(error):
+    """
+    Stop counting a request that failed before a response was produced as in flight.
+
+    Args:
+        error (Exception): The unhandled exception, if any.
+    """
+    if g.pop('metrics_start', None) is not None:
+        current_app.extensions['metrics'].get(REQUESTS_IN_FLIGHT).dec(_route())
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Expose the application metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics of this worker process.
+    """
+    body = current_app.extensions['metrics'].render()
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,6 +1,6 @@
 # routes/ping.py
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify
 
 # Blueprint setup for the 'ping' route. This establishes a group of routes under the '/ping' URL.
 ping_blueprint = Blueprint('ping', __name__)
@@ -12,15 +12,19 @@ def ping():
 
     This endpoint is useful for monitoring and verifying that the application is running.
     It returns basic information about the application, including its name, status, and version.
+    While the cache is being warmed up the worker is not ready for traffic, and the endpoint
+    answers with 503, so load balancers and readiness probes hold requests back.
 
     Returns:
         Response: JSON response containing the application name, status, and version.
     """
+    ready = current_app.extensions['weather_service'].is_ready()
+
     # Construct the response with application details.
     response = {
         "name": "weatherservice",
-        "status": "ok",
+        "status": "ok" if ready else "warming_up",
         "version": "1.0.0"
     }
     # Return the response in JSON format.
-    return jsonify(response)
+    return jsonify(response), 200 if ready else 503
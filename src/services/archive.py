@@ -0,0 +1,246 @@
+import bisect
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from .forecast_record import ForecastRecord
+
+class HistoricalArchive:
+    # Header of a partition file: magic bytes, format version and record count, padded to 16 bytes.
+    FILE_MAGIC = b'WCAR'
+    FILE_VERSION = 1
+    FILE_HEADER = struct.Struct('<4sHxxI4x')
+
+    # Value columns following the 'dt' column, all float64; a uint16 column of field kinds ends the file.
+    VALUE_COLUMNS = ForecastRecord.FIELDS
+
+    # Seconds covered by one observation.
+    STEP_SECONDS = 3600
+
+    def __init__(self, archive_dir, max_open_partitions=256):
+        """
+        Initialize the HistoricalArchive class with the directory holding its partitions.
+
+        Past observations never change, so they are kept forever, in one file per location
+        and month. Each file stores its records column by column (timestamps, then each
+        weather field) and is memory-mapped for reading, so a lookup is a bisection over
+        the timestamp column without parsing the file. Files are never modified in place:
+        adding observations writes a new version and atomically replaces the old one,
+        which readers that mapped it keep using safely.
+
+        Args:
+            archive_dir (str): Directory of the archive.
+            max_open_partitions (int): Number of partitions kept mapped. Defaults to 256.
+        """
+        self.archive_dir = archive_dir
+        self.max_open_partitions = max_open_partitions
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # Mapped partitions by path, least recently used first.
+        self._partitions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def partition_path(self, lat, lon, timestamp):
+        """
+        Return the path of the partition holding a location and time.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int): Unix timestamp.
+
+        Returns:
+            str: The path, for example '<archive_dir>/+51.5074-0.1278/2024-01.wca'.
+        """
+        return os.path.join(self.archive_dir, f"{lat:+.4f}{lon:+.4f}", time.strftime('%Y-%m.wca', time.gmtime(timestamp)))
+
+    def get(self, lat, lon, timestamp):
+        """
+        Look up the archived observation of the hour containing a time.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int): Unix timestamp.
+
+        Returns:
+            ForecastRecord: The observation, or None if it is not archived.
+        """
+        columns = self._columns(self.partition_path(lat, lon, timestamp))
+        if columns is None:
+            return None
+
+        timestamps = columns[0]
+        hour_start = timestamp - timestamp % self.STEP_SECONDS
+        position = bisect.bisect_left(timestamps, hour_start)
+        if position == len(timestamps) or timestamps[position] >= hour_start + self.STEP_SECONDS:
+            return None
+        return self._record(columns, position)
+
+    def add(self, lat, lon, records):
+        """
+        Archive observations of a location, keeping any already archived for the same time.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            records (iterable): ForecastRecords with their 'dt' set.
+
+        Returns:
+            int: The number of observations added.
+        """
+        by_partition = {}
+        for record in records:
+            if record.dt is not None:
+                by_partition.setdefault(self.partition_path(lat, lon, record.dt), []).append(record)
+
+        added = 0
+        for path, partition_records in by_partition.items():
+            added += self._merge_partition(path, partition_records)
+        return added
+
+    def _merge_partition(self, path, records):
+        """
+        Write a new version of a partition with the given records added.
+
+        Writers of the same partition are serialized with a lock file, across threads and processes.
+
+        Args:
+            path (str): Path of the partition.
+            records (list): The records to add.
+
+        Returns:
+            int: The number of records added.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            existing = {record.dt: record for record in self._read_partition(path)}
+            new_records = [record for record in records if record.dt not in existing]
+            if not new_records:
+                return 0
+            for record in new_records:
+                existing[record.dt] = record
+
+            temporary_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+            with open(temporary_path, 'wb') as partition_file:
+                partition_file.write(self._encode_partition([existing[dt] for dt in sorted(existing)]))
+            os.replace(temporary_path, path)
+        return len(new_records)
+
+    def _encode_partition(self, records):
+        """
+        Encode sorted records into the columnar partition format.
+
+        Args:
+            records (list): Records sorted by time.
+
+        Returns:
+            bytes: The partition file contents.
+        """
+        count = len(records)
+        kinds = []
+        for record in records:
+            record_kinds = 0
+            for index, name in enumerate(ForecastRecord.__slots__):
+                value = getattr(record, name)
+                kind = ForecastRecord.MISSING if value is None else ForecastRecord.FLOAT if isinstance(value, float) else ForecastRecord.INTEGER
+                record_kinds |= kind << (2 * index)
+            kinds.append(record_kinds)
+
+        parts = [
+            self.FILE_HEADER.pack(self.FILE_MAGIC, self.FILE_VERSION, count),
+            struct.pack(f'<{count}q', *(record.dt for record in records))
+        ]
+        for name in self.VALUE_COLUMNS:
+            parts.append(struct.pack(f'<{count}d', *(float(getattr(record, name) or 0) for record in records)))
+        parts.append(struct.pack(f'<{count}H', *kinds))
+        return b''.join(parts)
+
+    def _read_partition(self, path):
+        """
+        Read every record of a partition.
+
+        Args:
+            path (str): Path of the partition.
+
+        Returns:
+            list: The records, sorted by time.
+        """
+        columns = self._columns(path)
+        if columns is None:
+            return []
+        return [self._record(columns, position) for position in range(len(columns[0]))]
+
+    @staticmethod
+    def _record(columns, position):
+        """
+        Rebuild the record stored at a position of mapped columns.
+
+        Args:
+            columns (tuple): The mapped columns of a partition.
+            position (int): The position of the record.
+
+        Returns:
+            ForecastRecord: The record.
+        """
+        kinds = columns[-1][position]
+        values = []
+        for index, column in enumerate(columns[:-1]):
+            kind = (kinds >> (2 * index)) & 3
+            value = column[position]
+            values.append(None if kind == ForecastRecord.MISSING else int(value) if kind == ForecastRecord.INTEGER else value)
+        return ForecastRecord(*values)
+
+    def _columns(self, path):
+        """
+        Return the mapped columns of a partition, remapping it if it was replaced.
+
+        Args:
+            path (str): Path of the partition.
+
+        Returns:
+            tuple: Memory views of the 'dt' column, each value column and the kinds
+                column, or None if the partition does not exist.
+
+        Raises:
+            ValueError: If the file is not an archive partition.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._partitions.get(path)
+            if cached is not None and cached[0] == (stat.st_ino, stat.st_mtime_ns):
+                self._partitions.move_to_end(path)
+                return cached[1]
+
+        with open(path, 'rb') as partition_file:
+            mapped = mmap.mmap(partition_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        magic, version, count = self.FILE_HEADER.unpack_from(view)
+        if magic != self.FILE_MAGIC or version != self.FILE_VERSION:
+            raise ValueError(f"Not an archive partition: {path}")
+
+        offset = self.FILE_HEADER.size
+        columns = [view[offset:offset + 8 * count].cast('q')]
+        offset += 8 * count
+        for _ in self.VALUE_COLUMNS:
+            columns.append(view[offset:offset + 8 * count].cast('d'))
+            offset += 8 * count
+        columns.append(view[offset:offset + 2 * count].cast('H'))
+        columns = tuple(columns)
+
+        # Views keep their mapping alive, so evicted partitions are unmapped once no reader holds them.
+        with self._lock:
+            self._partitions[path] = ((stat.st_ino, stat.st_mtime_ns), columns)
+            self._partitions.move_to_end(path)
+            while len(self._partitions) > self.max_open_partitions:
+                self._partitions.popitem(last=False)
+        return columns
@@ -0,0 +1,407 @@
+import asyncio
+import logging
+import time
+import httpx
+from .city_index import normalize_city_name
+from .circuit_breaker import CircuitOpenError
+from .http_client import HttpClient
+from .quota import QuotaManager
+from .providers import UPSTREAM_LOG_FIELDS, OpenWeatherMapProvider, ProvidersUnavailableError
+from .weather_service import QUOTA_EXHAUSTED_MESSAGE, UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError
+
+class AsyncWeatherService:
+    def __init__(self, weather_service, config):
+        """
+        Initialize the AsyncWeatherService class, the asyncio counterpart of a WeatherService.
+
+        The AsyncWeatherService shares the caches, city index, background refresh pool and
+        metrics of the given WeatherService, but calls the upstream APIs through a
+        non-blocking, pooled HTTP client, so one event loop can wait on thousands of slow
+        upstream calls at once. Everything that reads or writes the cache databases, the
+        archive or the quota, and so may wait on a lock, runs on a thread so it never
+        stalls the loop; only in-memory work, such as counting requests, runs inline.
+
+        Args:
+            weather_service (WeatherService): The synchronous service whose state is shared.
+            config (Mapping): The application configuration, such as Flask's 'app.config'.
+        """
+        self.weather_service = weather_service
+        self.pool_size = config.get('ASYNC_HTTP_POOL_SIZE', 1000)
+        self.timeout = httpx.Timeout(
+            config.get('HTTP_READ_TIMEOUT', 10), connect=config.get('HTTP_CONNECT_TIMEOUT', 3.05)
+        )
+        self.retries = config.get('HTTP_RETRIES', 2)
+        self.backoff_factor = config.get('HTTP_RETRY_BACKOFF', 0.5)
+
+        # The client is bound to the event loop it was created in.
+        self._client = None
+        self._client_loop = None
+
+        # Upstream fetches in flight, keyed by cache key, shared by concurrent misses.
+        self._in_flight = {}
+
+        self.logger = logging.getLogger('AsyncWeatherService')
+
+    def _get_client(self):
+        """
+        Return the HTTP client of the running event loop, creating it if needed.
+
+        Returns:
+            httpx.AsyncClient: The pooled client.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        """
+        Close the HTTP client and its pooled connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url, params, name):
+        """
+        Issue a GET request, retrying with backoff on 429 and 5xx, and record its latency.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation the latency is recorded under.
+
+        Returns:
+            httpx.Response: The response, after any retries.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the operation is open.
+            httpx.HTTPError: If the request failed, for example on a timeout.
+        """
+        # Share the circuit breakers and hedging delays of the synchronous client.
+        http = self.weather_service.http
+        breaker = http.breaker(name)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker of '{name}' is open")
+
+        http.in_flight.inc(name)
+        start = time.perf_counter()
+        try:
+            delay = http.hedge_delay(name)
+            if delay is None:
+                response = await self._attempt(url, params, name)
+            else:
+                response = await self._hedged_get(url, params, name, delay)
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            http.record_latency(name, time.perf_counter() - start)
+            http.in_flight.dec(name)
+
+        http.record_outcome(breaker, response.status_code)
+        return response
+
+    async def _attempt(self, url, params, name):
+        """
+        Send one attempt of a request, with its retries, and record its latency.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation.
+
+        Returns:
+            httpx.Response: The response, after any retries.
+        """
+        client = self._get_client()
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            response = await client.get(url, params=params)
+            if response.status_code not in HttpClient.RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+        self.weather_service.http.attempt_latency.observe(time.perf_counter() - start, name)
+        return response
+
+    async def _hedged_get(self, url, params, name, delay):
+        """
+        Send a request, and a second attempt if the first has not answered after 'delay' seconds.
+
+        The first attempt to answer wins and the other one is cancelled.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation.
+            delay (float): Seconds to wait before the second attempt.
+
+        Returns:
+            httpx.Response: The response of the first attempt to succeed.
+        """
+        attempts = {asyncio.ensure_future(self._attempt(url, params, name))}
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done and await asyncio.to_thread(self.weather_service.http.allow_hedge, name):
+            self.weather_service.http.hedges.inc(name)
+            attempts.add(asyncio.ensure_future(self._attempt(url, params, name)))
+
+        # Use the first attempt that answers, or raise the error of the last one to fail.
+        while True:
+            done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+            answered = [attempt for attempt in done if attempt.exception() is None]
+            if answered or not attempts:
+                for attempt in attempts:
+                    attempt.cancel()
+                return (answered or list(done))[0].result()
+
+    async def _coalesce(self, key, factory):
+        """
+        Await the upstream fetch for a key, sharing it with concurrent callers.
+
+        Args:
+            key (str): Identifies fetches that can share a result.
+            factory (callable): Returns the coroutine performing the fetch.
+
+        Returns:
+            any: The result of the fetch.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # Shield the shared fetch so one cancelled caller does not cancel it for the others.
+        return await asyncio.shield(task)
+
+    async def get_weather(self, lat, lon, timestamp=None):
+        """
+        Fetches weather data for given coordinates, like WeatherService.get_weather.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data. Defaults to None.
+
+        Returns:
+            tuple: HTTP status code and the weather data or error message.
+        """
+        weather_service = self.weather_service
+        lat, lon = weather_service.quantize(lat, lon)
+        timestamp = weather_service.normalize_timestamp(timestamp)
+
+        # Answer times inside the hourly forecast window from the series of the location.
+        if timestamp is not None and weather_service.in_series_window(timestamp):
+            record = await asyncio.to_thread(weather_service.lookup_series, lat, lon, timestamp)
+            if record is None:
+                status_code, data = await self.get_weather(lat, lon)
+                if status_code != 200:
+                    return status_code, data
+                record = await asyncio.to_thread(weather_service.lookup_series, lat, lon, timestamp)
+            if record is not None:
+                return 200, record
+
+        # Past observations never change, so archived ones are served without a lookup in the cache.
+        if weather_service.is_archivable(timestamp):
+            archived_record = await asyncio.to_thread(weather_service.lookup_archive, lat, lon, timestamp)
+            if archived_record is not None:
+                return 200, archived_record
+
+        cache_key = weather_service.cache_key(lat, lon, timestamp)
+        if weather_service.refresher is not None and timestamp is None:
+            weather_service.refresher.record(lat, lon)
+
+        # Try to retrieve the response from cache first; near the quota limit, however old it is.
+        cached_entry = await asyncio.to_thread(
+            lambda: weather_service.cache.get_entry(cache_key, weather_service.stale_max_age())
+        )
+        if cached_entry:
+            cached_response, age = cached_entry
+            if age >= weather_service.cache.expiry_seconds:
+                weather_service.refresh_in_background(lat, lon, timestamp)
+            elif timestamp is None:
+                weather_service.remember_location(lat, lon)
+            return 200, cached_response
+
+        # Serve the current weather of a nearby location, if one is cached and fresh.
+        if timestamp is None:
+            nearby_response = await asyncio.to_thread(
+                weather_service.nearby_entry,
+                lat, lon, lambda near_lat, near_lon: weather_service.cache_key(near_lat, near_lon, None)
+            )
+            if nearby_response is not None:
+                return 200, nearby_response
+
+        # Concurrent misses for the same key share a single upstream fetch.
+        return await self._coalesce(cache_key, lambda: self._fetch_weather(lat, lon, timestamp, cache_key))
+
+    async def _fetch_weather(self, lat, lon, timestamp, cache_key):
+        """
+        Fetches weather data after a cache miss, holding the cross-process lease if enabled.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+
+        Returns:
+            tuple: HTTP status code and the weather data or error message.
+        """
+        weather_service = self.weather_service
+        if not weather_service.cross_process_single_flight:
+            return await self._request_weather(lat, lon, timestamp, cache_key)
+
+        # Wait until either another worker caches the data or this one holds the lease.
+        cache = weather_service.cache
+        while not await asyncio.to_thread(cache.acquire_lease, cache_key, weather_service.lease_seconds):
+            await asyncio.sleep(weather_service.lease_poll_seconds)
+            cached_response = await asyncio.to_thread(cache.get, cache_key)
+            if cached_response:
+                return 200, cached_response
+
+        try:
+            cached_response = await asyncio.to_thread(cache.get, cache_key)
+            if cached_response:
+                return 200, cached_response
+            return await self._request_weather(lat, lon, timestamp, cache_key)
+        finally:
+            await asyncio.to_thread(cache.release_lease, cache_key)
+
+    async def _request_weather(self, lat, lon, timestamp, cache_key):
+        """
+        Requests weather data from the API and caches successful responses.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+
+        Returns:
+            tuple: HTTP status code and the weather data or error message.
+        """
+        weather_service = self.weather_service
+
+        # Wait for the upstream quota without blocking the event loop, refusing the call if none is left.
+        if weather_service.quota is not None and not await self._acquire_quota(weather_service.quota):
+            return 429, QUOTA_EXHAUSTED_MESSAGE
+
+        try:
+            status_code, data = await weather_service.providers.route_async(
+                lambda provider: self._fetch_from_provider(provider, lat, lon, timestamp)
+            )
+        except ProvidersUnavailableError:
+            return 503, UPSTREAM_UNAVAILABLE_MESSAGE
+        if status_code == 200:
+            # Cache and archive the response on a thread, since both wait on file locks.
+            return status_code, await asyncio.to_thread(
+                weather_service.store_response, lat, lon, timestamp, cache_key, data
+            )
+        else:
+            if status_code == 429 and weather_service.quota is not None:
+                await asyncio.to_thread(weather_service.quota.exhaust)
+            self.logger.error("API error: %s, %s", status_code, data)
+            return status_code, data
+
+    async def _fetch_from_provider(self, provider, lat, lon, timestamp):
+        """
+        Fetches the weather of a location from one provider without blocking the event loop.
+
+        OpenWeatherMap is called through the non-blocking client; other providers run on a thread.
+
+        Args:
+            provider (WeatherProvider): The provider.
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+
+        Returns:
+            tuple: HTTP status code and the response data or error message.
+        """
+        if not isinstance(provider, OpenWeatherMapProvider):
+            return await asyncio.to_thread(provider.fetch, lat, lon, timestamp)
+
+        endpoint, params, operation = provider.request(lat, lon, timestamp)
+        response = await self._get(endpoint, params, operation)
+        self.logger.info("Request URL: %s", response.url, extra=UPSTREAM_LOG_FIELDS[operation])
+        return provider.parse(response.status_code, response.json())
+
+    async def _acquire_quota(self, quota):
+        """
+        Take a token for an interactive upstream call, like QuotaManager.acquire.
+
+        Args:
+            quota (QuotaManager): The quota of the weather service.
+
+        Returns:
+            bool: True if the call may proceed.
+        """
+        deadline = time.monotonic() + quota.max_wait_seconds
+        while True:
+            wait = await asyncio.to_thread(quota.try_acquire, QuotaManager.INTERACTIVE)
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                quota.deny(QuotaManager.INTERACTIVE)
+                return False
+            await asyncio.sleep(wait)
+
+    async def convert_city_to_coordinates(self, city_name):
+        """
+        Converts a city name to latitude and longitude, like WeatherService.convert_city_to_coordinates.
+
+        Args:
+            city_name (str): The name of the city to convert.
+
+        Returns:
+            tuple: Latitude and longitude of the city, or None, None if not found or in case of an error.
+
+        Raises:
+            GeocodingUnavailableError: If the geocoding API could not be reached.
+        """
+        weather_service = self.weather_service
+        normalized_name = normalize_city_name(city_name)
+
+        # Try the offline city index, then the geocoding cache.
+        coordinates = await asyncio.to_thread(weather_service.lookup_city_offline, normalized_name)
+        if coordinates:
+            return coordinates
+
+        return await self._coalesce(f"geocode:{normalized_name}", lambda: self._request_coordinates(city_name, normalized_name))
+
+    async def _request_coordinates(self, city_name, normalized_name):
+        """
+        Requests the coordinates of a city from the geocoding API and caches them.
+
+        Args:
+            city_name (str): The name of the city as requested.
+            normalized_name (str): The normalized name used as cache key.
+
+        Returns:
+            tuple: Latitude and longitude of the city, or None, None if not found or in case of an error.
+
+        Raises:
+            GeocodingUnavailableError: If the geocoding API could not be reached.
+        """
+        weather_service = self.weather_service
+        params = {'q': city_name, 'limit': 1, 'appid': weather_service.api_key}
+
+        try:
+            response = await self._get(weather_service.geocoding_url, params, 'geocode')
+        except (CircuitOpenError, httpx.HTTPError) as error:
+            self.logger.error("Geocoding API unavailable: %s", error)
+            raise GeocodingUnavailableError(str(error)) from error
+        if response.status_code == 200:
+            data = response.json()
+            if data:
+                await asyncio.to_thread(weather_service.geocoding_cache.set, normalized_name, [data[0]['lat'], data[0]['lon']])
+                return data[0]['lat'], data[0]['lon']
+            else:
+                self.logger.error("City not found: %s", city_name)
+                return None, None
+        else:
+            self.logger.error("Geocoding API error: %s", response.status_code)
+            return None, None
@@ -1,64 +1,124 @@
 import json
 import os
+import threading
 import time
 import logging
 from datetime import datetime
+from .cache_store import SQLiteCacheStore
+from .forecast_record import decode_value, encode_value
+from .memory_cache import MemoryCache
+from utils.metrics import Counter
 
 class CacheService:
-    def __init__(self, cache_dir='/app/cache', expiry_seconds=10):
+    def __init__(self, cache_dir='/app/cache', expiry_seconds=10, memory_max_entries=1024,
+                 memory_max_bytes=16 * 1024 * 1024, name='cache', stale_seconds=0,
+                 max_entries=None, max_bytes=None, retention_seconds=0, keep_expired=None):
         """
         Initialize the CacheService class with a cache directory and expiry time.
 
-        This initialization sets up the CacheService with a directory for storing cache files 
-        and an expiry duration for each cache item. It creates the cache directory and file 
-        if they don't exist and sets up logging.
+        This initialization sets up the CacheService with a directory for storing the cache 
+        database and an expiry duration for each cache item. Lookups are served from a 
+        bounded in-memory LRU tier first and fall back to the database, whose hits are 
+        promoted into memory; writes go through to both tiers. Entries older than the 
+        expiry time stay available as stale values for a further 'stale_seconds', so 
+        callers can serve them while refreshing. It creates the cache directory if it 
+        doesn't exist, migrates any legacy 'cache.json' file into the database and sets 
+        up logging.
+
+        The database is kept bounded by sweep, which deletes entries that can no longer
+        be served and then evicts the least recently used entries beyond 'max_entries'
+        or 'max_bytes'. Entries that can no longer be served are kept for a further
+        'retention_seconds', and not deleted at all while 'keep_expired' returns True, for
+        callers that serve expired values when they cannot fetch new ones. With a bound
+        set, reads only note which keys they hit; the access times are written in one
+        batch by the next sweep, so sweep must run regularly.
 
         Args:
-            cache_dir (str): Directory where the cache file will be stored. Defaults to '/app/cache'.
+            cache_dir (str): Directory where the cache database will be stored. Defaults to '/app/cache'.
             expiry_seconds (int): Time in seconds after which a cache entry is considered expired. Defaults to 10.
+            memory_max_entries (int): Maximum number of entries in the memory tier. Defaults to 1024.
+            memory_max_bytes (int): Maximum size of the memory tier in bytes. Defaults to 16 MiB.
+            name (str): Base name of the cache files, so several caches can share a directory. Defaults to 'cache'.
+            stale_seconds (int): Time in seconds an expired entry is still served as stale. Defaults to 0.
+            max_entries (int, optional): Maximum number of entries in the database. Defaults to None, for no limit.
+            max_bytes (int, optional): Maximum size of the values in the database, in bytes. Defaults to None, for no limit.
+            retention_seconds (int): Time in seconds sweeps keep entries that can no longer be served. Defaults to 0.
+            keep_expired (callable, optional): Tells sweeps to keep every entry that can no longer be served
+                while it returns True. Defaults to None.
         """
 
-        # Construct the path to the cache file.
-        self.cache_file = os.path.join(cache_dir, 'cache.json')
+        # Construct the paths to the cache database and the legacy JSON cache file.
+        self.db_path = os.path.join(cache_dir, f"{name}.db")
+        self.cache_file = os.path.join(cache_dir, f"{name}.json")
         
-        # Store the expiry duration for cache items.
+        # Store the expiry duration for cache items, and how much longer they may be served stale.
         self.expiry_seconds = expiry_seconds
+        self.stale_seconds = stale_seconds
+
+        # Bounds of the database, enforced by sweep, and the keys read since the last sweep.
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_seconds
+        self.keep_expired = keep_expired
+        self._track_access = max_entries is not None or max_bytes is not None
+        self._accessed = set()
 
         # Create the cache directory if it does not exist.
         if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
-
-        # Create an empty cache file if it does not exist.
-        if not os.path.exists(self.cache_file):
-            with open(self.cache_file, 'w') as file:
-                json.dump({}, file)
+            os.makedirs(cache_dir, exist_ok=True)
 
-        # Set up logging with a specific format and level.
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+        # Set up logging, with the structured fields of each event prepared once.
         self.logger = logging.getLogger('CacheService')
+        self.name = name
+        self._log_fields = {
+            event: {'event': event, 'cache': name}
+            for event in ('cache_hit', 'cache_miss', 'cache_stale', 'cache_expired', 'cache_set')
+        }
+
+        # Open the persistent store and import entries left behind by the JSON cache.
+        self.store = SQLiteCacheStore(self.db_path)
+        self._migrate_legacy_cache()
+
+        # Create the in-memory tier and the lookup counters used to size both tiers,
+        # labelled 'memory_hits', 'disk_hits', 'stale_hits', 'misses' or 'expirations'.
+        self.memory = MemoryCache(memory_max_entries, memory_max_bytes)
+        self.lookups = Counter()
+
+        # Entries removed from the database by sweeps, labelled 'expired' or 'evicted'.
+        self.removals = Counter()
+
         self.logger.info("Cache service initialized")
 
-    def _load_cache(self):
+    def _migrate_legacy_cache(self):
         """
-        Load the cache from the file.
+        Import the entries of a legacy 'cache.json' file into the cache database.
 
-        Returns:
-            dict: The current state of the cache loaded from the file.
+        The file is first renamed to a name private to this process, so when several 
+        workers start at once exactly one of them performs the migration. Once imported 
+        it is kept as 'cache.json.migrated' for reference.
         """
-        # Open the cache file and load its content as a JSON object.
-        with open(self.cache_file, 'r') as file:
-            return json.load(file)
+        claimed_file = f"{self.cache_file}.migrating.{os.getpid()}"
+        try:
+            os.rename(self.cache_file, claimed_file)
+        except FileNotFoundError:
+            # Nothing to migrate, or another worker has already claimed the file.
+            return
 
-    def _save_cache(self, cache):
-        """
-        Save the cache to the file.
+        try:
+            with open(claimed_file, 'r') as file:
+                cache = json.load(file)
+        except ValueError:
+            self.logger.error("Legacy cache file is not valid JSON: %s", self.cache_file)
+            cache = {}
 
-        Args:
-            cache (dict): The cache data to be saved to the file.
-        """
-        # Write the cache content to the file as a JSON object.
-        with open(self.cache_file, 'w') as file:
-            json.dump(cache, file)
+        # Entries keep their original timestamps, so expiry semantics are unchanged.
+        self.store.import_entries(
+            (key, json.dumps(item['value']), item['timestamp'])
+            for key, item in cache.items()
+            if isinstance(item, dict) and 'value' in item and 'timestamp' in item
+        )
+        os.replace(claimed_file, f"{self.cache_file}.migrated")
+        self.logger.info("Migrated %d entries from %s", len(cache), self.cache_file)
 
     def set(self, key, value):
         """
@@ -68,17 +128,15 @@ class CacheService:
             key (str): The key under which the value will be stored.
             value (any): The value to be stored in the cache.
         """
-        # Load the current state of the cache.
-        cache = self._load_cache()
-        
-        # Add or update the value in the cache along with the current timestamp.
-        cache[key] = {'value': value, 'timestamp': time.time()}
-        
-        # Save the updated cache back to the file.
-        self._save_cache(cache)
+        serialized = encode_value(value)
+        timestamp = time.time()
+
+        # Write the value through to the persistent store, then to the memory tier.
+        self.store.set(key, serialized, timestamp)
+        self.memory.set(key, value, timestamp, len(serialized))
         
         # Log the action of setting a cache value.
-        self.logger.info(f"Set cache for key: {key}")
+        self.logger.info("Set cache for key: %s", key, extra=self._log_fields['cache_set'])
 
     def get(self, key):
         """
@@ -90,25 +148,218 @@ class CacheService:
         Returns:
             any: The cached value if found and not expired, otherwise None.
         """
-        # Load the cache.
-        cache = self._load_cache()
-        
-        # Fetch the item from cache.
-        cached_item = cache.get(key)
-        
+        entry = self.get_entry(key)
+        if entry is None or entry[1] >= self.expiry_seconds:
+            return None
+        return entry[0]
+
+    def get_entry(self, key, max_age=None):
+        """
+        Retrieves a value from the cache along with its age, including stale values.
+
+        Args:
+            key (str): The key whose value needs to be retrieved.
+            max_age (float, optional): Age from which the entry is expired. Defaults to 
+                'expiry_seconds' plus 'stale_seconds'.
+
+        Returns:
+            tuple: The cached value and its age in seconds, or None if not found or past 
+                'max_age'. The value is stale if its age is at least 'expiry_seconds'.
+        """
+        if max_age is None:
+            max_age = self.expiry_seconds + self.stale_seconds
+
+        # Try the memory tier first.
+        memory_item = self.memory.get(key)
+        if memory_item:
+            value, timestamp = memory_item
+            age = time.time() - timestamp
+            if age < self.expiry_seconds:
+                if self._track_access:
+                    self._accessed.add(key)
+                self.lookups.inc('memory_hits')
+                self.logger.info("Cache hit for key: %s", key, extra=self._log_fields['cache_hit'])
+                return value, age
+
+            # Another worker may have stored a newer value, so fall through to the store.
+            if age >= max_age:
+                self.memory.delete(key, timestamp)
+                memory_item = None
+
+        # Fetch the item from the store.
+        cached_item = self.store.get(key)
+
+        # A stale value still in memory is served even if a sweep has deleted its row.
+        if not cached_item and memory_item:
+            value, timestamp = memory_item
+            self.lookups.inc('stale_hits')
+            self.logger.info("Cache stale for key: %s", key, extra=self._log_fields['cache_stale'])
+            return value, time.time() - timestamp
+
         # Handle cache miss.
         if not cached_item:
-            self.logger.info(f"Cache miss for key: {key}")
+            self.lookups.inc('misses')
+            self.logger.info("Cache miss for key: %s", key, extra=self._log_fields['cache_miss'])
             return None
 
+        serialized, timestamp = cached_item
+        age = time.time() - timestamp
+
         # Check if the cache entry has expired.
-        if time.time() - cached_item['timestamp'] < self.expiry_seconds:
-            # Return the value if not expired.
-            self.logger.info(f"Cache hit for key: {key}")
-            return cached_item['value']
+        if age < max_age:
+            # Promote the entry into the memory tier and return the value.
+            value = decode_value(serialized)
+            self.memory.set(key, value, timestamp, len(serialized))
+            if self._track_access:
+                self._accessed.add(key)
+            if age < self.expiry_seconds:
+                self.lookups.inc('disk_hits')
+                self.logger.info("Cache hit for key: %s", key, extra=self._log_fields['cache_hit'])
+            else:
+                self.lookups.inc('stale_hits')
+                self.logger.info("Cache stale for key: %s", key, extra=self._log_fields['cache_stale'])
+            return value, age
         else:
-            # Handle expired cache.
-            self.logger.info(f"Cache expired for key: {key}")
-            del cache[key]
-            self._save_cache(cache)
+            # Handle expired cache, leaving alone any entry rewritten since it was read.
+            self.lookups.inc('expirations')
+            self.logger.info("Cache expired for key: %s", key, extra=self._log_fields['cache_expired'])
+            self.store.delete(key, timestamp)
             return None
+
+    def preload(self):
+        """
+        Load the newest unexpired entries of the database into the memory tier.
+
+        Called before a server forks its workers, so they start with a warm memory tier 
+        whose pages are shared copy-on-write.
+
+        Returns:
+            int: The number of entries loaded.
+        """
+        min_timestamp = time.time() - self.expiry_seconds - self.stale_seconds
+        entries = self.store.recent(self.memory.max_entries, min_timestamp)
+
+        # Insert the oldest first, so the newest entries end up most recently used.
+        for key, serialized, timestamp in reversed(entries):
+            self.memory.set(key, decode_value(serialized), timestamp, len(serialized))
+
+        self.logger.info("Preloaded %d entries into the %s memory tier", len(entries), self.name)
+        return len(entries)
+
+    def sweep(self):
+        """
+        Bound the database: delete the entries that can no longer be served, past their
+        retention and unless 'keep_expired' says otherwise, then evict the least recently
+        used entries until 'max_entries' and 'max_bytes' hold.
+
+        Every worker may sweep the shared database; each step is a short transaction.
+
+        Returns:
+            tuple: The number of expired entries deleted and the number of entries evicted.
+        """
+        now = time.time()
+
+        # Record the reads since the last sweep first, so eviction sees recently used entries.
+        accessed, self._accessed = self._accessed, set()
+        if accessed:
+            self.store.touch(accessed, now)
+
+        expired = 0
+        if self.keep_expired is None or not self.keep_expired():
+            expired = self.store.delete_expired(now - self.expiry_seconds - self.stale_seconds - self.retention_seconds)
+        evicted = 0
+        if self._track_access:
+            evicted = self.store.evict(self.max_entries, self.max_bytes)
+        self.store.delete_expired_leases(now)
+
+        self.removals.inc('expired', expired)
+        self.removals.inc('evicted', evicted)
+        if expired or evicted:
+            self.logger.info("Swept the %s cache: %d expired, %d evicted", self.name, expired, evicted)
+        return expired, evicted
+
+    def snapshot_entries(self, max_entries=None):
+        """
+        Export the newest entries that can still be served, for a snapshot of the cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of entries exported. Defaults to
+                the size of the memory tier, the set of entries worth starting hot with.
+
+        Returns:
+            list: Tuples of key, serialized value and timestamp, newest first.
+        """
+        min_timestamp = time.time() - self.expiry_seconds - self.stale_seconds
+        return self.store.recent(max_entries or self.memory.max_entries, min_timestamp)
+
+    def restore_entries(self, entries):
+        """
+        Import the entries of a snapshot that can still be served, keeping any newer stored entry.
+
+        Args:
+            entries (iterable): Tuples of key, serialized value and timestamp.
+
+        Returns:
+            int: The number of entries imported.
+        """
+        min_timestamp = time.time() - self.expiry_seconds - self.stale_seconds
+        entries = [entry for entry in entries if entry[2] >= min_timestamp]
+        self.store.import_entries(entries)
+        self.logger.info("Restored %d entries into the %s cache", len(entries), self.name)
+        return len(entries)
+
+    def acquire_lease(self, key, lease_seconds):
+        """
+        Take a lease on a key, shared with every process using the same cache directory.
+
+        A lease lets one worker fetch a missing value while the others wait for it to 
+        appear in the cache. It lapses on its own if its holder dies.
+
+        Args:
+            key (str): The key to lease.
+            lease_seconds (float): Time after which the lease lapses if not released.
+
+        Returns:
+            bool: True if the lease was taken by the calling thread.
+        """
+        now = time.time()
+        return self.store.acquire_lease(key, self._lease_owner(), now + lease_seconds, now)
+
+    def release_lease(self, key):
+        """
+        Release a lease taken by the calling thread.
+
+        Args:
+            key (str): The leased key.
+        """
+        self.store.release_lease(key, self._lease_owner())
+
+    def _lease_owner(self):
+        """
+        Identify the calling thread as a lease holder.
+
+        Returns:
+            str: An identifier unique to the calling process and thread.
+        """
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def get_stats(self):
+        """
+        Report hit, miss and eviction counters for both cache tiers.
+
+        Returns:
+            dict: Counters and the current size of the memory tier.
+        """
+        lookups = self.lookups.values()
+        return {
+            'memory_hits': lookups.get('memory_hits', 0),
+            'disk_hits': lookups.get('disk_hits', 0),
+            'stale_hits': lookups.get('stale_hits', 0),
+            'misses': lookups.get('misses', 0),
+            'expirations': lookups.get('expirations', 0),
+            'memory_evictions': self.memory.evictions,
+            'disk_expirations': self.removals.value('expired'),
+            'disk_evictions': self.removals.value('evicted'),
+            'memory_entries': len(self.memory),
+            'memory_bytes': self.memory.size_bytes
+        }
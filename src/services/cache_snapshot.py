@@ -0,0 +1,96 @@
+import os
+import struct
+import threading
+
+# Header of a snapshot file: magic bytes, format version and number of sections.
+FILE_MAGIC = b'WCSN'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')
+
+# Header of a section: the length of the cache name, then the number of entries after the name.
+SECTION_NAME = struct.Struct('<B')
+SECTION_COUNT = struct.Struct('<I')
+
+# Header of an entry: its timestamp, whether the value is text, and the lengths of the key and value.
+ENTRY_HEADER = struct.Struct('<d?HI')
+
+def write_snapshot(path, sections):
+    """
+    Write cache entries to a snapshot file, atomically replacing any previous snapshot.
+
+    Args:
+        path (str): Path of the snapshot file.
+        sections (dict): Cache names mapped to lists of key, serialized value and timestamp tuples.
+
+    Returns:
+        int: The number of entries written.
+    """
+    chunks = [FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(sections))]
+    written = 0
+    for name, entries in sections.items():
+        encoded_name = name.encode('utf-8')
+        chunks.append(SECTION_NAME.pack(len(encoded_name)) + encoded_name + SECTION_COUNT.pack(len(entries)))
+        for key, value, timestamp in entries:
+            encoded_key = key.encode('utf-8')
+            is_text = isinstance(value, str)
+            encoded_value = value.encode('utf-8') if is_text else bytes(value)
+            chunks.append(ENTRY_HEADER.pack(timestamp, is_text, len(encoded_key), len(encoded_value)))
+            chunks.append(encoded_key)
+            chunks.append(encoded_value)
+        written += len(entries)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(b''.join(chunks))
+    os.replace(temporary_path, path)
+    return written
+
+def read_snapshot(path):
+    """
+    Read the cache entries of a snapshot file written by write_snapshot.
+
+    Args:
+        path (str): Path of the snapshot file.
+
+    Returns:
+        dict: Cache names mapped to lists of key, serialized value and timestamp tuples.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a snapshot, or is truncated.
+    """
+    with open(path, 'rb') as snapshot_file:
+        data = snapshot_file.read()
+
+    try:
+        magic, version, section_count = FILE_HEADER.unpack_from(data)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"Not a version {FILE_VERSION} cache snapshot: {path}")
+
+        offset = FILE_HEADER.size
+        sections = {}
+        for _ in range(section_count):
+            (name_length,) = SECTION_NAME.unpack_from(data, offset)
+            offset += SECTION_NAME.size
+            name = data[offset:offset + name_length].decode('utf-8')
+            offset += name_length
+            (count,) = SECTION_COUNT.unpack_from(data, offset)
+            offset += SECTION_COUNT.size
+
+            entries = sections[name] = []
+            for _ in range(count):
+                timestamp, is_text, key_length, value_length = ENTRY_HEADER.unpack_from(data, offset)
+                offset += ENTRY_HEADER.size
+                key = data[offset:offset + key_length].decode('utf-8')
+                offset += key_length
+                value = data[offset:offset + value_length]
+                offset += value_length
+                if offset > len(data):
+                    raise ValueError(f"Cache snapshot is truncated: {path}")
+                entries.append((key, value.decode('utf-8') if is_text else value, timestamp))
+    except (struct.error, UnicodeDecodeError) as error:
+        raise ValueError(f"Cache snapshot is corrupt: {path}: {error}")
+    return sections
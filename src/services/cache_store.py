@@ -0,0 +1,321 @@
+import os
+import sqlite3
+import threading
+
+class SQLiteCacheStore:
+    def __init__(self, db_path, timeout=30):
+        """
+        Initialize the SQLiteCacheStore class with the path of its database file.
+
+        The store keeps one row per cache key in a SQLite database running in WAL mode,
+        so point lookups and writes cost roughly the same no matter how many entries are
+        stored, and several worker processes can read and write the same file safely.
+        Connections are opened lazily, one per thread and process.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            timeout (int): Seconds to wait for a lock held by another connection. Defaults to 30.
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        # Create the tables up front so every later statement can assume they exist.
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, "
+            "value BLOB NOT NULL, "
+            "timestamp REAL NOT NULL, "
+            "accessed REAL NOT NULL DEFAULT 0)"
+        )
+
+        # Databases of older releases lack the access time; their entries count as least recently used.
+        columns = [row[1] for row in self._connection().execute("PRAGMA table_info(cache)")]
+        if 'accessed' not in columns:
+            try:
+                self._connection().execute("ALTER TABLE cache ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                # Another worker added the column first.
+                pass
+
+        # Index entries by age and by last access, so expired and least recently used entries are found without a scan.
+        self._connection().execute("CREATE INDEX IF NOT EXISTS cache_timestamp ON cache (timestamp)")
+        self._connection().execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "key TEXT PRIMARY KEY, "
+            "owner TEXT NOT NULL, "
+            "expires REAL NOT NULL)"
+        )
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS quota ("
+            "name TEXT PRIMARY KEY, "
+            "tokens REAL NOT NULL, "
+            "updated REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """
+        Return the connection owned by the current thread, opening it if needed.
+
+        Connections must not be shared between threads or across a fork, so a new one
+        is opened whenever the calling thread or process has not used the store before.
+
+        Returns:
+            sqlite3.Connection: The connection for the current thread.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        # Autocommit mode: every statement is its own short transaction.
+        connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """
+        Fetch the stored value and timestamp for a key.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            tuple: The stored value and its timestamp, or None if the key is not stored.
+        """
+        return self._connection().execute(
+            "SELECT value, timestamp FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+
+    def set(self, key, value, timestamp):
+        """
+        Insert or replace the value stored for a key.
+
+        Args:
+            key (str): The key to store the value under.
+            value (str | bytes): The serialized value.
+            timestamp (float): The time at which the value was stored.
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, timestamp, accessed) VALUES (?, ?, ?, ?)",
+            (key, value, timestamp, timestamp)
+        )
+
+    def delete(self, key, timestamp=None):
+        """
+        Delete the entry stored for a key.
+
+        When a timestamp is given the entry is only deleted if it is still the one that
+        was read, so an entry written concurrently by another worker is left alone.
+
+        Args:
+            key (str): The key to delete.
+            timestamp (float, optional): Timestamp the entry must have to be deleted. Defaults to None.
+        """
+        if timestamp is None:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        else:
+            self._connection().execute(
+                "DELETE FROM cache WHERE key = ? AND timestamp = ?", (key, timestamp)
+            )
+
+    def import_entries(self, entries):
+        """
+        Bulk insert entries in a single transaction, keeping any newer entry already stored.
+
+        Args:
+            entries (iterable): Tuples of key, serialized value and timestamp.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO cache (key, value, timestamp, accessed) VALUES (?1, ?2, ?3, ?3) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, timestamp = excluded.timestamp, "
+                "accessed = MAX(cache.accessed, excluded.accessed) "
+                "WHERE excluded.timestamp > cache.timestamp",
+                entries
+            )
+
+    def recent(self, limit, min_timestamp):
+        """
+        Fetch the most recently stored entries.
+
+        Args:
+            limit (int): Maximum number of entries returned.
+            min_timestamp (float): Entries stored before this time are skipped.
+
+        Returns:
+            list: Tuples of key, serialized value and timestamp, newest first.
+        """
+        return self._connection().execute(
+            "SELECT key, value, timestamp FROM cache WHERE timestamp >= ? ORDER BY timestamp DESC LIMIT ?",
+            (min_timestamp, limit)
+        ).fetchall()
+
+    def touch(self, keys, accessed):
+        """
+        Record that entries were read, in a single transaction.
+
+        Args:
+            keys (iterable): The keys of the entries read.
+            accessed (float): The time of the reads.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ? AND accessed < ?",
+                ((accessed, key, accessed) for key in keys)
+            )
+
+    def delete_expired(self, min_timestamp):
+        """
+        Delete the entries stored before a time.
+
+        Args:
+            min_timestamp (float): Entries stored before this time are deleted.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        return self._connection().execute("DELETE FROM cache WHERE timestamp < ?", (min_timestamp,)).rowcount
+
+    def evict(self, max_entries=None, max_bytes=None):
+        """
+        Delete the least recently used entries until the store holds at most 'max_entries'
+        entries and 'max_bytes' bytes of values.
+
+        Args:
+            max_entries (int, optional): Largest number of entries kept. Defaults to None, for no limit.
+            max_bytes (int, optional): Largest total size of the values kept. Defaults to None, for no limit.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            count, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(length(value)), 0) FROM cache").fetchone()
+            excess_entries = count - max_entries if max_entries is not None else 0
+            excess_bytes = size - max_bytes if max_bytes is not None else 0
+            if excess_entries <= 0 and excess_bytes <= 0:
+                return 0
+
+            # Walk the entries from the least recently used until both limits hold.
+            evicted = []
+            for key, value_size in connection.execute("SELECT key, length(value) FROM cache ORDER BY accessed"):
+                if len(evicted) >= excess_entries and excess_bytes <= 0:
+                    break
+                evicted.append((key,))
+                excess_bytes -= value_size
+            connection.executemany("DELETE FROM cache WHERE key = ?", evicted)
+        return len(evicted)
+
+    def delete_expired_leases(self, now):
+        """
+        Delete the leases that have lapsed.
+
+        Args:
+            now (float): The current time.
+        """
+        self._connection().execute("DELETE FROM leases WHERE expires < ?", (now,))
+
+    def acquire_lease(self, key, owner, expires, now):
+        """
+        Take the lease on a key unless another owner holds an unexpired lease on it.
+
+        Args:
+            key (str): The key to lease.
+            owner (str): Identifies the holder of the lease.
+            expires (float): Time at which the lease lapses if it is not released.
+            now (float): The current time.
+
+        Returns:
+            bool: True if the lease was taken.
+        """
+        cursor = self._connection().execute(
+            "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+            (key, owner, expires, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key, owner):
+        """
+        Release a lease, if it is still held by the given owner.
+
+        Args:
+            key (str): The leased key.
+            owner (str): The holder of the lease.
+        """
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def take_token(self, name, capacity, refill_rate, reserve, now):
+        """
+        Refill a token bucket for the time elapsed, then take one token unless that would
+        leave fewer than 'reserve' tokens.
+
+        The bucket is read and updated in one immediate transaction, so every process
+        sharing the database draws from the same budget.
+
+        Args:
+            name (str): The name of the bucket.
+            capacity (float): Largest number of tokens the bucket holds; a new bucket starts full.
+            refill_rate (float): Tokens added per second.
+            reserve (float): Tokens that must be left after taking one.
+            now (float): The current time.
+
+        Returns:
+            tuple: Whether a token was taken, and the tokens left in the bucket.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, updated FROM quota WHERE name = ?", (name,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * refill_rate)
+            taken = tokens - 1 >= reserve
+            if taken:
+                tokens -= 1
+            connection.execute(
+                "INSERT OR REPLACE INTO quota (name, tokens, updated) VALUES (?, ?, ?)", (name, tokens, now)
+            )
+        return taken, tokens
+
+    def get_tokens(self, name):
+        """
+        Fetch the tokens of a bucket as of its last update.
+
+        Args:
+            name (str): The name of the bucket.
+
+        Returns:
+            tuple: The tokens and the time they were counted, or None if the bucket was never used.
+        """
+        return self._connection().execute("SELECT tokens, updated FROM quota WHERE name = ?", (name,)).fetchone()
+
+    def set_tokens(self, name, tokens, now):
+        """
+        Set the tokens of a bucket, such as emptying it when the upstream API reports its limit is hit.
+
+        Args:
+            name (str): The name of the bucket.
+            tokens (float): The tokens left in the bucket.
+            now (float): The current time.
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO quota (name, tokens, updated) VALUES (?, ?, ?)", (name, tokens, now)
+        )
+
+    def __len__(self):
+        """
+        Count the entries currently stored.
+
+        Returns:
+            int: The number of stored entries.
+        """
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
@@ -0,0 +1,61 @@
+import logging
+import threading
+
+class CacheSweeper:
+    def __init__(self, caches, interval_seconds=60):
+        """
+        Initialize the CacheSweeper class for a set of caches.
+
+        Entries are otherwise only removed from a cache database when their own key is
+        read after they expire, so keys that are never read again, such as one-off
+        historical times, would stay forever. The sweeper calls CacheService.sweep on
+        every cache each interval, which deletes those entries and evicts the least
+        recently used ones beyond the size bounds of the cache.
+
+        Args:
+            caches (iterable): The CacheService instances to sweep.
+            interval_seconds (float): Time between two sweeps. Defaults to 60.
+        """
+        self.caches = tuple(caches)
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger('CacheSweeper')
+
+    def start(self):
+        """
+        Start sweeping in a daemon thread, unless already started.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='weather-cache-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the sweep thread after its current sweep.
+        """
+        self._stopped.set()
+
+    def _run(self):
+        """
+        Sweep the caches until stopped.
+        """
+        while not self._stopped.wait(self.interval_seconds):
+            self.sweep_once()
+
+    def sweep_once(self):
+        """
+        Sweep every cache once, carrying on with the others if one fails.
+
+        Returns:
+            dict: Cache names mapped to the number of expired and evicted entries removed.
+        """
+        removed = {}
+        for cache in self.caches:
+            try:
+                removed[cache.name] = cache.sweep()
+            except Exception as error:
+                self.logger.error("Sweeping the %s cache failed: %s", cache.name, error)
+        return removed
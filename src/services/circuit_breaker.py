@@ -0,0 +1,74 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream endpoint whose circuit breaker is open.
+    """
+
+class CircuitBreaker:
+    # States of the breaker: calls pass, calls are refused, or a few probe calls pass.
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, half_open_max_calls=1):
+        """
+        Initialize the CircuitBreaker class, which stops calling an endpoint that keeps failing.
+
+        After 'failure_threshold' consecutive failures the breaker opens and calls are
+        refused at once, instead of each one waiting for a timeout. After 'reset_seconds'
+        it lets up to 'half_open_max_calls' probe calls through: a successful probe closes
+        it again, a failed one opens it for another 'reset_seconds'.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker. Defaults to 5.
+            reset_seconds (float): Seconds the breaker stays open before probing. Defaults to 30.
+            half_open_max_calls (int): Probe calls allowed at once while half open. Defaults to 1.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Decide whether a call may go through, moving from open to half open once the reset time has passed.
+
+        Returns:
+            bool: True if the call may go through; the caller must then record its outcome.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        """
+        Record a successful call, closing the breaker.
+        """
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """
+        Record a failed call, opening the breaker after too many in a row or after a failed probe.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
@@ -0,0 +1,170 @@
+import bisect
+import csv
+import os
+import struct
+import sys
+import unicodedata
+from array import array
+
+def normalize_city_name(city_name):
+    """
+    Normalize a city name so that different spellings of the same query compare equal.
+
+    Accents are stripped, the name is case-folded and runs of whitespace are collapsed,
+    including around the commas separating a city from its country code.
+
+    Args:
+        city_name (str): The city name as typed by the user.
+
+    Returns:
+        str: The normalized name, for example 'sao paulo,br' for ' São  Paulo, BR'.
+    """
+    decomposed = unicodedata.normalize('NFKD', city_name)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ','.join(' '.join(part.split()) for part in stripped.casefold().split(','))
+
+class CityIndex:
+    # Header of the index file: magic bytes, entry count and size of the name block.
+    FILE_MAGIC = b'WCIX'
+    FILE_HEADER = struct.Struct('<4sII')
+
+    # GeoNames dump columns used to build the index.
+    NAME_COLUMN = 1
+    ASCII_NAME_COLUMN = 2
+    ALTERNATE_NAMES_COLUMN = 3
+    LATITUDE_COLUMN = 4
+    LONGITUDE_COLUMN = 5
+    FEATURE_CLASS_COLUMN = 6
+    COUNTRY_CODE_COLUMN = 8
+    POPULATION_COLUMN = 14
+
+    def __init__(self, names, coordinates):
+        """
+        Initialize the CityIndex class from sorted names and their coordinates.
+
+        Names are kept in one sorted list searched with bisection and coordinates in a
+        flat array of doubles, so an index of hundreds of thousands of places stays small.
+
+        Args:
+            names (list): Sorted, normalized city names.
+            coordinates (array): Latitude and longitude of each name, interleaved.
+        """
+        self.names = names
+        self.coordinates = coordinates
+
+    def lookup(self, city_name):
+        """
+        Look up the coordinates of a city.
+
+        Args:
+            city_name (str): The city name, optionally followed by ',<country code>'.
+
+        Returns:
+            tuple: Latitude and longitude of the city, or None if it is not indexed.
+        """
+        name = normalize_city_name(city_name)
+        position = bisect.bisect_left(self.names, name)
+        if position == len(self.names) or self.names[position] != name:
+            return None
+        return self.coordinates[2 * position], self.coordinates[2 * position + 1]
+
+    def __len__(self):
+        """
+        Count the names in the index.
+
+        Returns:
+            int: The number of indexed names.
+        """
+        return len(self.names)
+
+    @classmethod
+    def build_from_gazetteer(cls, gazetteer_path, min_population=0, include_alternate_names=False):
+        """
+        Build an index from a tab-separated GeoNames dump such as 'cities15000.txt'.
+
+        Only populated places are indexed. Each place is indexed under its name and its
+        ASCII name, both with and without its country code. When several places share a
+        name the most populous one wins, which matches what the geocoding API returns.
+
+        Args:
+            gazetteer_path (str): Path of the GeoNames dump.
+            min_population (int): Places with fewer inhabitants are skipped. Defaults to 0.
+            include_alternate_names (bool): Also index alternate names. Defaults to False.
+
+        Returns:
+            CityIndex: The built index.
+        """
+        # Normalized name mapped to the population, latitude and longitude of the best match.
+        best_matches = {}
+
+        csv.field_size_limit(sys.maxsize)
+        with open(gazetteer_path, 'r', encoding='utf-8', newline='') as gazetteer_file:
+            for row in csv.reader(gazetteer_file, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) <= cls.POPULATION_COLUMN or row[cls.FEATURE_CLASS_COLUMN] != 'P':
+                    continue
+
+                population = int(row[cls.POPULATION_COLUMN] or 0)
+                if population < min_population:
+                    continue
+
+                place = (population, float(row[cls.LATITUDE_COLUMN]), float(row[cls.LONGITUDE_COLUMN]))
+                place_names = {row[cls.NAME_COLUMN], row[cls.ASCII_NAME_COLUMN]}
+                if include_alternate_names and row[cls.ALTERNATE_NAMES_COLUMN]:
+                    place_names.update(row[cls.ALTERNATE_NAMES_COLUMN].split(','))
+
+                country_code = row[cls.COUNTRY_CODE_COLUMN]
+                for place_name in place_names:
+                    if not place_name:
+                        continue
+                    name = normalize_city_name(place_name)
+                    for key in (name, f"{name},{country_code.casefold()}"):
+                        if key not in best_matches or best_matches[key][0] < population:
+                            best_matches[key] = place
+
+        names = sorted(best_matches)
+        coordinates = array('d')
+        for name in names:
+            _, lat, lon = best_matches[name]
+            coordinates.append(lat)
+            coordinates.append(lon)
+        return cls(names, coordinates)
+
+    def save(self, index_path):
+        """
+        Write the index to a file, replacing any previous version atomically.
+
+        Args:
+            index_path (str): Path of the index file.
+        """
+        name_block = '\n'.join(self.names).encode('utf-8')
+        temporary_path = f"{index_path}.tmp.{os.getpid()}"
+        with open(temporary_path, 'wb') as index_file:
+            index_file.write(self.FILE_HEADER.pack(self.FILE_MAGIC, len(self.names), len(name_block)))
+            index_file.write(name_block)
+            self.coordinates.tofile(index_file)
+        os.replace(temporary_path, index_path)
+
+    @classmethod
+    def load(cls, index_path):
+        """
+        Load an index written by CityIndex.save.
+
+        Args:
+            index_path (str): Path of the index file.
+
+        Returns:
+            CityIndex: The loaded index.
+
+        Raises:
+            ValueError: If the file is not a city index.
+        """
+        with open(index_path, 'rb') as index_file:
+            magic, count, name_block_size = cls.FILE_HEADER.unpack(index_file.read(cls.FILE_HEADER.size))
+            if magic != cls.FILE_MAGIC:
+                raise ValueError(f"Not a city index file: {index_path}")
+            name_block = index_file.read(name_block_size).decode('utf-8')
+            coordinates = array('d')
+            coordinates.fromfile(index_file, 2 * count)
+
+        names = name_block.split('\n') if count else []
+        return cls(names, coordinates)
@@ -0,0 +1,194 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import signal
+import threading
+import time
+import yaml
+
+class CredentialStore:
+    # Prefix of passwords stored in users.yaml as a hex SHA-256 digest instead of in clear.
+    DIGEST_PREFIX = 'sha256:'
+
+    # Signals the gunicorn master and workers handle themselves, which cannot trigger a reload.
+    GUNICORN_SIGNALS = frozenset(('SIGHUP', 'SIGQUIT', 'SIGINT', 'SIGTERM', 'SIGTTIN', 'SIGTTOU',
+                                  'SIGUSR1', 'SIGUSR2', 'SIGWINCH', 'SIGCHLD', 'SIGABRT'))
+
+    def __init__(self, path, check_interval_seconds=1, memo_seconds=60, memo_max_entries=10000):
+        """
+        Initialize the CredentialStore class with the users file it serves.
+
+        Passwords are hashed when the file is loaded and checked with a constant-time
+        comparison of digests, so no password is compared in clear. Each verified
+        Authorization header is remembered for 'memo_seconds' under a keyed hash of the
+        header, so repeat requests skip decoding and hashing. The file is reloaded when
+        its modification time changes, checked at most every 'check_interval_seconds',
+        or when reload is called, for example on a signal. Readers never take
+        a lock: a reload swaps the users and an empty memo in as one tuple.
+
+        Args:
+            path (str): Path of the YAML file mapping user names to passwords.
+            check_interval_seconds (float): Seconds between checks of the file, 0 to never check. Defaults to 1.
+            memo_seconds (float): Seconds a verified header is remembered, 0 to disable the memo. Defaults to 60.
+            memo_max_entries (int): Largest number of remembered headers. Defaults to 10000.
+        """
+        self.path = path
+        self.check_interval_seconds = check_interval_seconds
+        self.memo_seconds = memo_seconds
+        self.memo_max_entries = memo_max_entries
+        self.logger = logging.getLogger('CredentialStore')
+
+        # Random salt of the digests computed here, and the digest compared for unknown users.
+        self._salt = os.urandom(16)
+        self._unknown_user = (self._salt, hashlib.sha256(self._salt + os.urandom(16)).digest())
+
+        self._reload_lock = threading.Lock()
+        self._file_signature = None
+        self._next_check = 0.0
+        self._state = ({}, {})
+        self.reload()
+
+    def reload(self):
+        """
+        Load the users file again, keeping the current users if it cannot be read.
+
+        Returns:
+            bool: True if the users were replaced.
+        """
+        with self._reload_lock:
+            try:
+                signature = self._signature()
+                with open(self.path, 'r') as users_file:
+                    users = yaml.safe_load(users_file) or {}
+            except (OSError, yaml.YAMLError) as error:
+                self.logger.error("Could not load credentials from %s: %s", self.path, error)
+                return False
+
+            credentials = {str(username): self._hash_secret(str(password)) for username, password in users.items()}
+            self._file_signature = signature
+            self._state = (credentials, {})
+        self.logger.info("Loaded %d users from %s", len(credentials), self.path)
+        return True
+
+    def install_reload_signal(self, signal_name):
+        """
+        Reload the users file whenever the process receives a signal.
+
+        Must be called from the main thread of the process to reload, so under gunicorn
+        from each worker once it has set up its own signal handlers.
+
+        Args:
+            signal_name (str): Name of the signal, such as 'SIGUSR1' outside gunicorn.
+
+        Raises:
+            ValueError: If the signal does not exist, or gunicorn handles it.
+        """
+        if signal_name in self.GUNICORN_SIGNALS or not hasattr(signal, signal_name):
+            raise ValueError(f"{signal_name} cannot be used to reload credentials")
+
+        # Reload on another thread, since the interrupted thread may hold the store's lock.
+        signal.signal(getattr(signal, signal_name),
+                      lambda signum, frame: threading.Thread(target=self.reload, daemon=True).start())
+
+    def _signature(self):
+        """
+        Identify the current version of the users file.
+
+        Returns:
+            tuple: Its inode, size and modification time.
+        """
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _hash_secret(self, password):
+        """
+        Turn a password from the users file into the salt and digest it is checked against.
+
+        Args:
+            password (str): The password in clear, or 'sha256:' followed by its hex digest.
+
+        Returns:
+            tuple: The salt and the SHA-256 digest of the salted password.
+        """
+        if password.startswith(self.DIGEST_PREFIX):
+            return b'', bytes.fromhex(password[len(self.DIGEST_PREFIX):])
+        return self._salt, hashlib.sha256(self._salt + password.encode('utf-8')).digest()
+
+    def _check_for_changes(self):
+        """
+        Reload the users file if it changed, at most once per check interval.
+
+        Only one thread checks at a time; the others carry on with the current users.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval_seconds
+            try:
+                changed = self._signature() != self._file_signature
+            except OSError:
+                changed = False
+        finally:
+            self._reload_lock.release()
+        if changed:
+            self.reload()
+
+    def verify(self, username, password):
+        """
+        Check a user name and password in constant time.
+
+        Args:
+            username (str): The user name.
+            password (str): The password.
+
+        Returns:
+            str: The user name if the password is correct, otherwise None.
+        """
+        credentials = self._state[0]
+        salt, digest = credentials.get(username, self._unknown_user)
+        candidate = hashlib.sha256(salt + password.encode('utf-8')).digest()
+        if hmac.compare_digest(candidate, digest) and username in credentials:
+            return username
+        return None
+
+    def verify_authorization(self, header):
+        """
+        Check the Basic credentials of an Authorization header, remembering verified headers.
+
+        Args:
+            header (str | bytes): The Authorization header, or None.
+
+        Returns:
+            str: The user name if the credentials are valid, otherwise None.
+        """
+        if not header:
+            return None
+        if self.check_interval_seconds and time.monotonic() >= self._next_check:
+            self._check_for_changes()
+
+        if isinstance(header, str):
+            header = header.encode('latin-1')
+        memo = self._state[1]
+        key = hashlib.blake2b(header, digest_size=16, key=self._salt).digest()
+        remembered = memo.get(key)
+        if remembered is not None and remembered[1] > time.monotonic():
+            return remembered[0]
+
+        scheme, _, encoded = header.partition(b' ')
+        if scheme.lower() != b'basic':
+            return None
+        try:
+            username, _, password = base64.b64decode(encoded.strip()).decode('utf-8').partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+
+        verified = self.verify(username, password)
+        if verified is not None and self.memo_seconds > 0:
+            # Forget every header at once when full; they are verified again on their next request.
+            if len(memo) >= self.memo_max_entries:
+                memo.clear()
+            memo[key] = (verified, time.monotonic() + self.memo_seconds)
+        return verified
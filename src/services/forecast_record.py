@@ -0,0 +1,255 @@
+import bisect
+import json
+import struct
+from array import array
+
+class ForecastRecord:
+    # Weather fields kept from an OpenWeatherMap data point, and the unit each is formatted with.
+    FIELDS = ('temp', 'pressure', 'humidity', 'clouds')
+    UNITS = {'temp': 'C', 'pressure': 'hPa', 'humidity': '%', 'clouds': '%'}
+
+    # Names of the fields in API responses.
+    RESPONSE_NAMES = {'temp': 'temperature', 'pressure': 'pressure', 'humidity': 'humidity', 'clouds': 'clouds'}
+
+    # Binary layout: tag byte, field kinds (two bits per field, 'dt' first), 'dt' and the weather fields.
+    TAG = b'\x01'
+    LAYOUT = struct.Struct('<cHq4d')
+
+    # Kinds of field values, so integers and floats keep their formatting after a round trip.
+    MISSING, INTEGER, FLOAT = 0, 1, 2
+
+    __slots__ = ('dt', 'temp', 'pressure', 'humidity', 'clouds')
+
+    def __init__(self, dt=None, temp=None, pressure=None, humidity=None, clouds=None):
+        """
+        Initialize the ForecastRecord class, the numeric weather at one point in time.
+
+        Records keep the numbers returned by OpenWeatherMap; they are only formatted into
+        strings such as '12.3C' when a response is serialized, by ForecastRecord.to_dict.
+
+        Args:
+            dt (int, optional): Unix timestamp of the data point. Defaults to None.
+            temp (float, optional): Temperature in degrees Celsius. Defaults to None.
+            pressure (int, optional): Pressure in hPa. Defaults to None.
+            humidity (int, optional): Relative humidity in percent. Defaults to None.
+            clouds (int, optional): Cloud cover in percent. Defaults to None.
+        """
+        self.dt = dt
+        self.temp = temp
+        self.pressure = pressure
+        self.humidity = humidity
+        self.clouds = clouds
+
+    @classmethod
+    def from_data_point(cls, data_point):
+        """
+        Build a record from an OpenWeatherMap data point, such as 'current' or 'data[0]'.
+
+        Values that are not numbers are treated as missing.
+
+        Args:
+            data_point (dict): The data point.
+
+        Returns:
+            ForecastRecord: The record.
+        """
+        return cls(*(_number(data_point.get(name)) for name in ('dt',) + cls.FIELDS))
+
+    def to_dict(self):
+        """
+        Format the record as returned by the API, for example {'temperature': '12.3C', ...}.
+
+        Returns:
+            dict: The formatted weather fields, 'N/A' standing in for missing values.
+        """
+        return {
+            self.RESPONSE_NAMES[name]: f"{'N/A' if value is None else value}{self.UNITS[name]}"
+            for name, value in zip(self.FIELDS, (self.temp, self.pressure, self.humidity, self.clouds))
+        }
+
+    def encode(self):
+        """
+        Encode the record into its fixed-size binary form.
+
+        Returns:
+            bytes: The encoded record.
+        """
+        values = (self.dt, self.temp, self.pressure, self.humidity, self.clouds)
+        kinds = 0
+        for position, value in enumerate(values):
+            kind = self.MISSING if value is None else self.FLOAT if isinstance(value, float) else self.INTEGER
+            kinds |= kind << (2 * position)
+        return self.LAYOUT.pack(self.TAG, kinds, int(self.dt or 0), *(float(value or 0) for value in values[1:]))
+
+    @classmethod
+    def decode(cls, encoded):
+        """
+        Decode a record encoded by ForecastRecord.encode.
+
+        Args:
+            encoded (bytes): The encoded record.
+
+        Returns:
+            ForecastRecord: The record.
+        """
+        _, kinds, timestamp, *numbers = cls.LAYOUT.unpack(encoded)
+        values = []
+        for position, value in enumerate([timestamp] + numbers):
+            kind = (kinds >> (2 * position)) & 3
+            values.append(None if kind == cls.MISSING else int(value) if kind == cls.INTEGER else value)
+        return cls(*values)
+
+    def __eq__(self, other):
+        if not isinstance(other, ForecastRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ForecastRecord({fields})"
+
+class ForecastSeries:
+    # Binary layout: tag byte and record count, followed by the encoded records.
+    TAG = b'\x02'
+    HEADER = struct.Struct('<cI')
+
+    # Seconds covered by each data point of an hourly series.
+    STEP_SECONDS = 3600
+
+    __slots__ = ('timestamps', 'records')
+
+    def __init__(self, records):
+        """
+        Initialize the ForecastSeries class, the hourly forecast of one location.
+
+        Records are kept sorted by time, with their timestamps in a flat array searched
+        by bisection, so any time inside the series is answered without an upstream call.
+
+        Args:
+            records (iterable): ForecastRecords; records without a timestamp are skipped.
+        """
+        self.records = sorted((record for record in records if record.dt is not None), key=lambda record: record.dt)
+        self.timestamps = array('q', (record.dt for record in self.records))
+
+    @classmethod
+    def from_data_points(cls, data_points):
+        """
+        Build a series from OpenWeatherMap data points, such as the 'hourly' list of a onecall response.
+
+        Args:
+            data_points (list): The data points.
+
+        Returns:
+            ForecastSeries: The series.
+        """
+        return cls(ForecastRecord.from_data_point(data_point) for data_point in data_points)
+
+    def at(self, timestamp):
+        """
+        Return the record of the hour containing a time.
+
+        Args:
+            timestamp (int): Unix timestamp.
+
+        Returns:
+            ForecastRecord: The record, or None if the time is outside the series.
+        """
+        position = bisect.bisect_right(self.timestamps, timestamp) - 1
+        if position < 0 or timestamp - self.timestamps[position] >= self.STEP_SECONDS:
+            return None
+        return self.records[position]
+
+    def __len__(self):
+        return len(self.records)
+
+    def encode(self):
+        """
+        Encode the series into its binary form.
+
+        Returns:
+            bytes: The encoded series.
+        """
+        return self.HEADER.pack(self.TAG, len(self.records)) + b''.join(record.encode() for record in self.records)
+
+    @classmethod
+    def decode(cls, encoded):
+        """
+        Decode a series encoded by ForecastSeries.encode.
+
+        Args:
+            encoded (bytes): The encoded series.
+
+        Returns:
+            ForecastSeries: The series.
+        """
+        _, count = cls.HEADER.unpack_from(encoded)
+        size = ForecastRecord.LAYOUT.size
+        offsets = range(cls.HEADER.size, cls.HEADER.size + count * size, size)
+        return cls(ForecastRecord.decode(encoded[offset:offset + size]) for offset in offsets)
+
+    def __eq__(self, other):
+        if not isinstance(other, ForecastSeries):
+            return NotImplemented
+        return self.records == other.records
+
+def _number(value):
+    """
+    Keep a value if it is an integer or a float.
+
+    Args:
+        value (any): The value from the API.
+
+    Returns:
+        int | float: The value, or None if it is missing or not a number.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+def encode_value(value):
+    """
+    Serialize a cache value: records and series in their binary form, anything else as JSON text.
+
+    Args:
+        value (any): The value to cache.
+
+    Returns:
+        bytes | str: The serialized value.
+    """
+    if isinstance(value, (ForecastRecord, ForecastSeries)):
+        return value.encode()
+    return json.dumps(value)
+
+def decode_value(serialized):
+    """
+    Deserialize a cache value written by encode_value, or by an older release as JSON text.
+
+    Args:
+        serialized (bytes | str): The serialized value.
+
+    Returns:
+        any: The cached value.
+    """
+    if isinstance(serialized, bytes):
+        if serialized[:1] == ForecastRecord.TAG:
+            return ForecastRecord.decode(serialized)
+        if serialized[:1] == ForecastSeries.TAG:
+            return ForecastSeries.decode(serialized)
+    return json.loads(serialized)
+
+def to_json(value):
+    """
+    Serialize records nested in a response payload, for use as a JSON encoder default.
+
+    Args:
+        value (any): An object the JSON encoder cannot serialize.
+
+    Returns:
+        dict: The formatted record.
+
+    Raises:
+        TypeError: If the object is not a ForecastRecord.
+    """
+    if isinstance(value, ForecastRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
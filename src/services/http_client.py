@@ -0,0 +1,306 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.metrics import Counter, Gauge, Histogram
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class HttpClient:
+    # Upstream statuses worth retrying: rate limiting and transient server errors.
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    # Quantile of the attempt latency after which a hedged request is sent, and the samples needed first.
+    HEDGE_QUANTILE = 0.95
+    HEDGE_MIN_SAMPLES = 20
+
+    # Seconds the hedging delay of an operation is reused before it is computed again.
+    HEDGE_DELAY_REFRESH_SECONDS = 1.0
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10, retries=2, backoff_factor=0.5,
+                 breaker_failure_threshold=5, breaker_reset_seconds=30, breaker_half_open_calls=1,
+                 hedge=False, hedge_min_delay=0.05, hedge_permit=None, hedge_pool_size=4):
+        """
+        Initialize the HttpClient class with a pooled, keep-alive session.
+
+        One HttpClient is meant to be shared by all threads of a worker so that
+        connections to the upstream API are reused instead of paying for a new TCP and
+        TLS handshake on every call. Idempotent GET requests are retried with
+        exponential backoff on 429 and 5xx responses, honouring 'Retry-After'.
+
+        Each upstream operation has its own circuit breaker, so a failing endpoint is
+        refused at once instead of tying up a thread until its timeout. With hedging
+        enabled, a second attempt is sent when the first one takes longer than the 95th
+        percentile of past attempts, and whichever answers first is used. A hedged
+        attempt is only sent if 'hedge_permit' allows it, so it can be paid for out of
+        an upstream call budget. Racing two attempts takes threads of a small pool of
+        'hedge_pool_size' threads; when none is free, the request is sent on the
+        caller's thread without a hedge, so requests never queue behind slow attempts.
+
+        Args:
+            pool_size (int): Maximum number of connections kept per host. Defaults to 10.
+            connect_timeout (float): Seconds to wait for a connection. Defaults to 3.05.
+            read_timeout (float): Seconds to wait for response data. Defaults to 10.
+            retries (int): Maximum number of retries per request. Defaults to 2.
+            backoff_factor (float): Base of the exponential backoff in seconds. Defaults to 0.5.
+            breaker_failure_threshold (int): Consecutive failures that open a breaker. Defaults to 5.
+            breaker_reset_seconds (float): Seconds a breaker stays open before probing. Defaults to 30.
+            breaker_half_open_calls (int): Probe calls allowed while a breaker is half open. Defaults to 1.
+            hedge (bool): Whether to send hedged requests. Defaults to False.
+            hedge_min_delay (float): Shortest delay before a hedged request, in seconds. Defaults to 0.05.
+            hedge_permit (callable, optional): Called with the name of the operation before each hedged
+                attempt, which is skipped unless it returns True. Defaults to None, to always send them.
+            hedge_pool_size (int): Attempts that may run on the hedging pool at once. Defaults to 4.
+        """
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.pool_size = pool_size
+        self.hedge_pool_size = hedge_pool_size
+        self.retry = retry
+        self.reset()
+
+        # Latency histogram and calls in flight, labelled by the name of the upstream operation.
+        self.latency = Histogram()
+        self.in_flight = Gauge()
+
+        # Circuit breakers, created on first use of each upstream operation.
+        self.breaker_settings = (breaker_failure_threshold, breaker_reset_seconds, breaker_half_open_calls)
+        self.breakers = {}
+
+        # Latency of single attempts, which sets the hedging delay, and the hedged requests sent.
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_permit = hedge_permit
+        self.attempt_latency = Histogram()
+        self._hedge_delays = {}
+        self.hedges = Counter()
+
+    def reset(self):
+        """
+        Replace the session and its connection pools with new, empty ones.
+
+        A forked worker must call this before its first request, so it never shares a 
+        pooled socket with its parent.
+        """
+        self.adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=self.retry)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_pool_size, thread_name_prefix='http-hedge')
+        self._hedge_slots = threading.BoundedSemaphore(self.hedge_pool_size)
+
+    def get(self, url, params=None, name='default'):
+        """
+        Issue a GET request through the shared session and record its latency.
+
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): Query string parameters. Defaults to None.
+            name (str): Name of the upstream operation the latency is recorded under. Defaults to 'default'.
+
+        Returns:
+            requests.Response: The response, after any retries.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the operation is open.
+            requests.RequestException: If the request failed, for example on a timeout.
+        """
+        breaker = self.breaker(name)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker of '{name}' is open")
+
+        self.in_flight.inc(name)
+        start = time.perf_counter()
+        try:
+            # Race attempts on the hedging pool only if it has a thread free for the first one.
+            delay = self.hedge_delay(name)
+            if delay is None or not self._hedge_slots.acquire(blocking=False):
+                response = self._attempt(url, params, name)
+            else:
+                response = self._hedged_get(url, params, name, delay)
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            self.record_latency(name, time.perf_counter() - start)
+            self.in_flight.dec(name)
+
+        self.record_outcome(breaker, response.status_code)
+        return response
+
+    def _attempt(self, url, params, name):
+        """
+        Send one attempt of a request and record its latency.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation.
+
+        Returns:
+            requests.Response: The response, after any retries.
+        """
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        self.attempt_latency.observe(time.perf_counter() - start, name)
+        return response
+
+    def _pooled_attempt(self, url, params, name):
+        """
+        Send one attempt on the hedging pool, then give its slot back.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation.
+
+        Returns:
+            requests.Response: The response, after any retries.
+        """
+        try:
+            return self._attempt(url, params, name)
+        finally:
+            self._hedge_slots.release()
+
+    def _hedged_get(self, url, params, name, delay):
+        """
+        Send a request, and a second attempt if the first has not answered after 'delay' seconds.
+
+        The caller must hold a slot of the hedging pool for the first attempt. The hedge
+        is skipped if no other slot is free. The first attempt to answer wins; the other
+        one is left to finish in the background, holding its slot until it does.
+
+        Args:
+            url (str): The URL to request.
+            params (dict): Query string parameters.
+            name (str): Name of the upstream operation.
+            delay (float): Seconds to wait before the second attempt.
+
+        Returns:
+            requests.Response: The response of the first attempt to succeed.
+        """
+        attempts = {self.hedge_executor.submit(self._pooled_attempt, url, params, name)}
+        done, pending = wait(attempts, timeout=delay)
+        if not done and self._hedge_slots.acquire(blocking=False):
+            if self.allow_hedge(name):
+                self.hedges.inc(name)
+                attempts.add(self.hedge_executor.submit(self._pooled_attempt, url, params, name))
+            else:
+                self._hedge_slots.release()
+
+        # Use the first attempt that answers, or raise the error of the last one to fail.
+        while True:
+            done, attempts = wait(attempts, return_when=FIRST_COMPLETED)
+            answered = [attempt for attempt in done if attempt.exception() is None]
+            if answered or not attempts:
+                return (answered or list(done))[0].result()
+
+    def breaker(self, name):
+        """
+        Return the circuit breaker of an upstream operation, creating it on first use.
+
+        Args:
+            name (str): Name of the upstream operation.
+
+        Returns:
+            CircuitBreaker: The breaker.
+        """
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers.setdefault(name, CircuitBreaker(*self.breaker_settings))
+        return breaker
+
+    def record_outcome(self, breaker, status_code):
+        """
+        Record the outcome of a call that got a response: server errors count as failures.
+
+        Args:
+            breaker (CircuitBreaker): The breaker of the upstream operation.
+            status_code (int): The HTTP status code of the response.
+        """
+        if status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def hedge_delay(self, name):
+        """
+        Return how long to wait for an attempt before sending a hedged one.
+
+        Args:
+            name (str): Name of the upstream operation.
+
+        The delay is computed from the merged latency histogram at most once per
+        HEDGE_DELAY_REFRESH_SECONDS, so the check is cheap on every call.
+
+        Returns:
+            float: The 95th percentile of past attempt latencies, at least 'hedge_min_delay',
+                or None if hedging is disabled or too few attempts were seen.
+        """
+        if not self.hedge:
+            return None
+        now = time.monotonic()
+        cached = self._hedge_delays.get(name)
+        if cached is not None and now < cached[0]:
+            return cached[1]
+
+        delay = None
+        if self.attempt_latency.snapshot(name)['count'] >= self.HEDGE_MIN_SAMPLES:
+            delay = max(self.hedge_min_delay, self.attempt_latency.quantile(self.HEDGE_QUANTILE, name))
+        self._hedge_delays[name] = (now + self.HEDGE_DELAY_REFRESH_SECONDS, delay)
+        return delay
+
+    def allow_hedge(self, name):
+        """
+        Check whether a hedged attempt of an operation may be sent.
+
+        Args:
+            name (str): Name of the upstream operation.
+
+        Returns:
+            bool: True unless 'hedge_permit' refuses the attempt.
+        """
+        return self.hedge_permit is None or self.hedge_permit(name)
+
+    def record_latency(self, name, seconds):
+        """
+        Record the latency of one upstream call.
+
+        Args:
+            name (str): Name of the upstream operation.
+            seconds (float): How long the call took.
+        """
+        self.latency.observe(seconds, name)
+
+    def get_stats(self):
+        """
+        Report transport metrics for the connection pools of the session.
+
+        Returns:
+            dict: Number of requests sent, number of connections opened (each one a
+                TCP and possibly TLS handshake), the share of requests that reused a
+                pooled connection and the latency histogram of each upstream operation.
+        """
+        pools = self.adapter.poolmanager.pools
+        connections, sent_requests = 0, 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                sent_requests += pool.num_requests
+
+        return {
+            'requests': sent_requests,
+            'handshakes': connections,
+            'reuse_ratio': 1 - connections / sent_requests if sent_requests else 0.0,
+            'latency': self.latency.snapshots()
+        }
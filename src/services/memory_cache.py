@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+class MemoryCache:
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        """
+        Initialize the MemoryCache class with its entry and byte limits.
+
+        The MemoryCache is a bounded, thread-safe LRU map held in the worker process.
+        When either limit is exceeded the least recently used entries are evicted.
+
+        Args:
+            max_entries (int): Maximum number of entries kept. Defaults to 1024.
+            max_bytes (int): Maximum total size of the entries kept, in bytes. Defaults to 16 MiB.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Fetch an entry and mark it as the most recently used.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            tuple: The value and its timestamp, or None if the key is not held.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key, value, timestamp, size):
+        """
+        Insert or replace an entry, evicting least recently used entries to stay in budget.
+
+        Entries larger than the whole byte budget are not held at all.
+
+        Args:
+            key (str): The key to store the value under.
+            value (any): The value to hold.
+            timestamp (float): The time at which the value was stored.
+            size (int): Approximate size of the value in bytes.
+        """
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, timestamp, size)
+            self.size_bytes += size
+
+            # Evict from the least recently used end until both limits hold.
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= evicted[2]
+                self.evictions += 1
+
+    def delete(self, key, timestamp=None):
+        """
+        Remove an entry.
+
+        When a timestamp is given the entry is only removed if it still has that timestamp.
+
+        Args:
+            key (str): The key to remove.
+            timestamp (float, optional): Timestamp the entry must have to be removed. Defaults to None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (timestamp is not None and entry[1] != timestamp):
+                return
+            del self._entries[key]
+            self.size_bytes -= entry[2]
+
+    def __len__(self):
+        """
+        Count the entries currently held.
+
+        Returns:
+            int: The number of held entries.
+        """
+        return len(self._entries)
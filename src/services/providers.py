@@ -0,0 +1,448 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.metrics import Counter
+from .spatial import haversine_km
+
+# Structured fields of the upstream request log records, per upstream operation.
+UPSTREAM_LOG_FIELDS = {
+    operation: {'event': 'upstream_request', 'operation': operation}
+    for operation in ('geocode', 'onecall', 'timemachine')
+}
+
+def read_recordings(paths):
+    """
+    Read recorded OpenWeatherMap responses from JSON files.
+
+    A file holds one response, a list of responses, or one response per line.
+
+    Args:
+        paths (iterable): Paths of the recording files.
+
+    Yields:
+        dict: Each recorded response that has a 'lat' and 'lon'.
+    """
+    for path in paths:
+        with open(path, encoding='utf-8') as recording_file:
+            text = recording_file.read()
+        try:
+            responses = json.loads(text)
+        except json.JSONDecodeError:
+            responses = [json.loads(line) for line in text.splitlines() if line.strip()]
+        for response in responses if isinstance(responses, list) else [responses]:
+            if 'lat' in response and 'lon' in response:
+                yield response
+
+class ProvidersUnavailableError(Exception):
+    """
+    Raised when no weather provider returned a response, because every call failed.
+    """
+
+class WeatherProvider(ABC):
+    # Name of the provider in configuration, logs and metrics.
+    name = 'provider'
+
+    @abstractmethod
+    def fetch(self, lat, lon, timestamp=None):
+        """
+        Fetch the weather of a location, in the shape of an OpenWeatherMap response.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data. Defaults to None.
+
+        Returns:
+            tuple: The HTTP status code, and the response data ('current' and 'hourly' for
+                current weather, 'data' for historical data) or an error message.
+
+        Raises:
+            Exception: If the provider could not be reached.
+        """
+
+class OpenWeatherMapProvider(WeatherProvider):
+    name = 'openweathermap'
+
+    def __init__(self, http, base_url, api_key):
+        """
+        Initialize the OpenWeatherMapProvider class, which calls the One Call API.
+
+        Args:
+            http (HttpClient): The shared HTTP client, with its retries and circuit breakers.
+            base_url (str): URL of the One Call API.
+            api_key (str): The API key.
+        """
+        self.http = http
+        self.base_url = base_url
+        self.api_key = api_key
+        self.logger = logging.getLogger('OpenWeatherMapProvider')
+
+    def request(self, lat, lon, timestamp=None):
+        """
+        Build the request for the weather of a location.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data. Defaults to None.
+
+        Returns:
+            tuple: The endpoint, the query string parameters and the name of the upstream operation.
+        """
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric',  # Set units to metric.
+            'exclude': 'minutely,daily,alerts'  # Exclude unnecessary data.
+        }
+
+        # Determine the appropriate endpoint based on the presence of a timestamp.
+        if timestamp:
+            params['dt'] = timestamp
+            return self.base_url + "/timemachine", params, 'timemachine'
+        return self.base_url, params, 'onecall'
+
+    @staticmethod
+    def parse(status_code, data):
+        """
+        Turn the status code and JSON body of a response into the result of a fetch.
+
+        Args:
+            status_code (int): The HTTP status code.
+            data (dict): The JSON body.
+
+        Returns:
+            tuple: The status code, and the data or the error message of the API.
+        """
+        if status_code == 200:
+            return status_code, data
+        return status_code, data.get('message', 'Unknown error')
+
+    def fetch(self, lat, lon, timestamp=None):
+        """
+        Fetch the weather of a location from the One Call API.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the operation is open.
+            requests.RequestException: If the request failed, for example on a timeout.
+        """
+        endpoint, params, operation = self.request(lat, lon, timestamp)
+        response = self.http.get(endpoint, params=params, name=operation)
+        self.logger.info("Request URL: %s", response.url, extra=UPSTREAM_LOG_FIELDS[operation])
+        return self.parse(response.status_code, response.json())
+
+class FileProvider(WeatherProvider):
+    name = 'file'
+
+    # Seconds covered by one recorded observation.
+    STEP_SECONDS = 3600
+
+    def __init__(self, path, radius_km=25, delay_seconds=0):
+        """
+        Initialize the FileProvider class, which answers from recorded API responses.
+
+        The provider lets tests and benchmarks run without network access or an API key.
+        Recordings are OpenWeatherMap responses in a JSON file, as read by read_recordings,
+        and are loaded once. A location is answered from the nearest recording within
+        'radius_km': current weather from its 'current' and 'hourly' fields, a past or
+        future time from the data point of its 'data' or 'hourly' list in the same hour.
+
+        Args:
+            path (str): Path of the recordings file.
+            radius_km (float): Largest distance between a location and a recording. Defaults to 25.
+            delay_seconds (float): Latency added to every fetch, to simulate a remote provider. Defaults to 0.
+        """
+        self.path = path
+        self.radius_km = radius_km
+        self.delay_seconds = delay_seconds
+        self.recordings = list(read_recordings([path]))
+
+    def fetch(self, lat, lon, timestamp=None):
+        """
+        Fetch the weather of a location from the nearest recording that covers it.
+        """
+        if self.delay_seconds > 0:
+            time.sleep(self.delay_seconds)
+
+        nearby = sorted(
+            (haversine_km(lat, lon, recording['lat'], recording['lon']), index)
+            for index, recording in enumerate(self.recordings)
+        )
+        for distance, index in nearby:
+            if distance > self.radius_km:
+                break
+            recording = self.recordings[index]
+            if timestamp is None:
+                if 'current' in recording:
+                    return 200, {key: recording[key] for key in ('lat', 'lon', 'current', 'hourly') if key in recording}
+                continue
+
+            hour_start = timestamp - timestamp % self.STEP_SECONDS
+            for data_point in recording.get('data', []) + recording.get('hourly', []):
+                if hour_start <= data_point.get('dt', -1) < hour_start + self.STEP_SECONDS:
+                    return 200, {'lat': recording['lat'], 'lon': recording['lon'], 'data': [data_point]}
+        return 404, 'No recorded weather for this location and time'
+
+def create_provider(name, config, http):
+    """
+    Create a weather provider from the application configuration.
+
+    Args:
+        name (str): 'openweathermap' or 'file'.
+        config (Mapping): The application configuration.
+        http (HttpClient): The shared HTTP client.
+
+    Returns:
+        WeatherProvider: The provider.
+
+    Raises:
+        ValueError: If the provider is unknown.
+    """
+    if name == OpenWeatherMapProvider.name:
+        return OpenWeatherMapProvider(http, config['BASE_URL'], config['API_KEY'])
+    if name == FileProvider.name:
+        return FileProvider(
+            config['FILE_PROVIDER_PATH'],
+            radius_km=config.get('FILE_PROVIDER_RADIUS_KM', 25),
+            delay_seconds=config.get('FILE_PROVIDER_DELAY_SECONDS', 0)
+        )
+    raise ValueError(f"Unknown weather provider: {name}")
+
+class ProviderRouter:
+    # Routing policies: try providers in order until one answers, or ask all at once and take the first answer.
+    FAILOVER = 'failover'
+    FASTEST = 'fastest'
+
+    def __init__(self, providers, policy=FAILOVER, pool_size=None):
+        """
+        Initialize the ProviderRouter class, which chooses the providers a fetch is sent to.
+
+        With the 'failover' policy the first provider is the primary, and the others are
+        only asked when the ones before them failed. With the 'fastest' policy every
+        provider is asked at once, and the first healthy response wins, so the slowest
+        provider no longer sets the tail latency. A response is healthy if its status is
+        200. When no response is healthy, the response of the provider listed first is
+        returned, so a single provider behaves exactly as if it were called directly.
+
+        Fan-outs run on a pool of 'pool_size' threads. A fan-out needs a free thread for
+        every provider; when the pool has too few, the fetch fails over on the caller's
+        thread, primary first, so fetches never queue behind slow providers.
+
+        Args:
+            providers (list): The providers, primary first.
+            policy (str): 'failover' or 'fastest'. Defaults to 'failover'.
+            pool_size (int, optional): Provider calls that may run on the fan-out pool at once.
+                Defaults to None, for 4 per provider.
+
+        Raises:
+            ValueError: If there is no provider or the policy is unknown.
+        """
+        if not providers:
+            raise ValueError("At least one weather provider is required")
+        if policy not in (self.FAILOVER, self.FASTEST):
+            raise ValueError(f"Unknown weather provider policy: {policy}")
+        self.providers = list(providers)
+        self.policy = policy
+        self.pool_size = pool_size or 4 * len(self.providers)
+        self.logger = logging.getLogger('ProviderRouter')
+
+        # Fetches answered by each provider, calls of each provider that raised, and fan-outs skipped for a busy pool.
+        self.wins = Counter()
+        self.failures = Counter()
+        self.skipped_fanouts = Counter()
+        self.reset()
+
+    def reset(self):
+        """
+        Replace the thread pool used to fan out and its free slots, such as after a fork.
+        """
+        self.executor = None
+        if self.policy == self.FASTEST and len(self.providers) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='weather-provider')
+            self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def route(self, call):
+        """
+        Send a fetch to the providers according to the policy.
+
+        Args:
+            call (callable): Takes a provider and returns the status code and data of its fetch.
+
+        Returns:
+            tuple: The status code and data of the chosen response.
+
+        Raises:
+            ProvidersUnavailableError: If every provider raised.
+        """
+        if self.executor is None or not self._take_slots():
+            results = {}
+            for provider in self.providers:
+                results[provider] = self._call(provider, call)
+                if self._is_healthy(results[provider]):
+                    return self._win(provider, results[provider])
+            return self._fallback(results)
+
+        # Ask every provider at once; the losers are left to finish in the background, holding their slots until they do.
+        futures = {self.executor.submit(self._pooled_call, provider, call): provider for provider in self.providers}
+        results = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures[future]
+                results[provider] = future.result()
+                if self._is_healthy(results[provider]):
+                    return self._win(provider, results[provider])
+        return self._fallback(results)
+
+    async def route_async(self, call):
+        """
+        Send a fetch to the providers according to the policy, on the running event loop.
+
+        Args:
+            call (callable): Takes a provider and returns a coroutine of the status code and data of its fetch.
+
+        Returns:
+            tuple: The status code and data of the chosen response.
+
+        Raises:
+            ProvidersUnavailableError: If every provider raised.
+        """
+        if self.policy == self.FAILOVER or len(self.providers) == 1:
+            results = {}
+            for provider in self.providers:
+                results[provider] = await self._call_async(provider, call)
+                if self._is_healthy(results[provider]):
+                    return self._win(provider, results[provider])
+            return self._fallback(results)
+
+        # Ask every provider at once, and cancel the others once one answers.
+        tasks = {asyncio.ensure_future(self._call_async(provider, call)): provider for provider in self.providers}
+        results = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks[task]
+                    results[provider] = task.result()
+                    if self._is_healthy(results[provider]):
+                        return self._win(provider, results[provider])
+        finally:
+            for task in pending:
+                task.cancel()
+        return self._fallback(results)
+
+    def _take_slots(self):
+        """
+        Take a slot of the fan-out pool for every provider, without waiting.
+
+        Returns:
+            bool: True if the slots were taken, False if the pool is too busy to fan out.
+        """
+        taken = 0
+        while taken < len(self.providers) and self._slots.acquire(blocking=False):
+            taken += 1
+        if taken == len(self.providers):
+            return True
+
+        # Give back the slots of a partial fan-out.
+        for _ in range(taken):
+            self._slots.release()
+        self.skipped_fanouts.inc(self.policy)
+        return False
+
+    def _pooled_call(self, provider, call):
+        """
+        Fetch from one provider on the fan-out pool, then give its slot back.
+
+        Returns:
+            tuple: The status code and data, or None if the provider raised.
+        """
+        try:
+            return self._call(provider, call)
+        finally:
+            self._slots.release()
+
+    def _call(self, provider, call):
+        """
+        Fetch from one provider, recording a failure instead of raising.
+
+        Returns:
+            tuple: The status code and data, or None if the provider raised.
+        """
+        try:
+            return call(provider)
+        except Exception as error:
+            self._record_failure(provider, error)
+            return None
+
+    async def _call_async(self, provider, call):
+        """
+        Fetch from one provider on the event loop, recording a failure instead of raising.
+
+        Returns:
+            tuple: The status code and data, or None if the provider raised.
+        """
+        try:
+            return await call(provider)
+        except Exception as error:
+            self._record_failure(provider, error)
+            return None
+
+    def _record_failure(self, provider, error):
+        """
+        Count and log a provider call that raised.
+
+        Args:
+            provider (WeatherProvider): The provider.
+            error (Exception): The error it raised.
+        """
+        self.failures.inc(provider.name)
+        self.logger.error("Weather provider %s failed: %s", provider.name, error,
+                          extra={'event': 'upstream_request', 'provider': provider.name})
+
+    def _is_healthy(self, result):
+        """
+        Check whether a provider's result is a healthy response.
+
+        Args:
+            result (tuple): The status code and data, or None.
+
+        Returns:
+            bool: True if the provider answered with status 200.
+        """
+        return result is not None and result[0] == 200
+
+    def _win(self, provider, result):
+        """
+        Count the provider whose response is returned.
+
+        Returns:
+            tuple: The result.
+        """
+        self.wins.inc(provider.name)
+        return result
+
+    def _fallback(self, results):
+        """
+        Choose the response returned when none is healthy: that of the first listed provider that answered.
+
+        Args:
+            results (dict): Providers mapped to their result, None for those that raised.
+
+        Returns:
+            tuple: The status code and data of the chosen response.
+
+        Raises:
+            ProvidersUnavailableError: If every provider raised.
+        """
+        for provider in self.providers:
+            if results.get(provider) is not None:
+                return self._win(provider, results[provider])
+        raise ProvidersUnavailableError("No weather provider answered")
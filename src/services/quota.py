@@ -0,0 +1,135 @@
+import logging
+import time
+from utils.metrics import Counter
+
+class QuotaManager:
+    # Priorities of upstream calls: requests a user waits for, and refreshes of cached entries.
+    INTERACTIVE = 'interactive'
+    BACKGROUND = 'background'
+
+    # Seconds after which the locally known budget is read again from the store.
+    SNAPSHOT_SECONDS = 1
+
+    def __init__(self, store, calls_per_minute, burst=None, background_reserve=0.5, stale_reserve=0.2,
+                 max_wait_seconds=1, name='openweathermap'):
+        """
+        Initialize the QuotaManager class, which paces upstream calls with a token bucket.
+
+        The bucket holds up to 'burst' tokens and refills at 'calls_per_minute'; every
+        upstream call takes one token. It lives in the persistent cache store, so all
+        worker processes share one budget. Background refreshes only run while the bucket
+        is more than 'background_reserve' full, leaving the rest to interactive requests,
+        which wait up to 'max_wait_seconds' for a token. Once fewer than 'stale_reserve'
+        of the tokens are left, the service prefers serving expired cache entries.
+
+        Args:
+            store (SQLiteCacheStore): The store holding the bucket.
+            calls_per_minute (float): The sustained rate of upstream calls allowed.
+            burst (float, optional): The capacity of the bucket. Defaults to 'calls_per_minute'.
+            background_reserve (float): Share of the capacity kept for interactive requests. Defaults to 0.5.
+            stale_reserve (float): Share of the capacity below which expired entries are served. Defaults to 0.2.
+            max_wait_seconds (float): Longest wait of an interactive request for a token. Defaults to 1.
+            name (str): Name of the bucket in the store. Defaults to 'openweathermap'.
+        """
+        self.store = store
+        self.name = name
+        self.capacity = burst or calls_per_minute
+        self.refill_rate = calls_per_minute / 60
+        self.reserves = {self.INTERACTIVE: 0, self.BACKGROUND: background_reserve * self.capacity}
+        self.stale_threshold = stale_reserve * self.capacity
+        self.max_wait_seconds = max_wait_seconds
+
+        # Calls refused, by priority.
+        self.denials = Counter()
+
+        # The tokens last seen in the store and when they were counted, replaced as one tuple.
+        self._snapshot = (self.capacity, time.time())
+        self.logger = logging.getLogger('QuotaManager')
+
+    def try_acquire(self, priority):
+        """
+        Take a token for an upstream call without waiting.
+
+        Args:
+            priority (str): QuotaManager.INTERACTIVE or QuotaManager.BACKGROUND.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is expected.
+        """
+        now = time.time()
+        reserve = self.reserves[priority]
+        taken, tokens = self.store.take_token(self.name, self.capacity, self.refill_rate, reserve, now)
+        self._snapshot = (tokens, now)
+        if taken:
+            return 0
+        return (reserve + 1 - tokens) / self.refill_rate
+
+    def acquire(self, priority):
+        """
+        Take a token for an upstream call, waiting up to 'max_wait_seconds' for interactive calls.
+
+        Background calls never wait: a refresh refused now is tried again when the entry
+        is next requested.
+
+        Args:
+            priority (str): QuotaManager.INTERACTIVE or QuotaManager.BACKGROUND.
+
+        Returns:
+            bool: True if the call may proceed.
+        """
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            wait = self.try_acquire(priority)
+            if wait == 0:
+                return True
+            if priority == self.BACKGROUND or time.monotonic() + wait > deadline:
+                self.deny(priority)
+                return False
+            time.sleep(wait)
+
+    def deny(self, priority):
+        """
+        Count an upstream call refused for lack of quota.
+
+        Args:
+            priority (str): The priority of the call.
+        """
+        self.denials.inc(priority)
+        self.logger.warning("Upstream quota exhausted, refused a %s call", priority, extra={'event': 'quota_denied'})
+
+    def exhaust(self):
+        """
+        Empty the bucket, when the upstream API answers that its limit was hit.
+        """
+        now = time.time()
+        self.store.set_tokens(self.name, 0, now)
+        self._snapshot = (0, now)
+
+    def remaining(self):
+        """
+        Read the tokens currently left in the shared bucket.
+
+        Returns:
+            float: The remaining budget of upstream calls.
+        """
+        now = time.time()
+        row = self.store.get_tokens(self.name)
+        tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.refill_rate)
+        self._snapshot = (tokens, now)
+        return tokens
+
+    def near_limit(self):
+        """
+        Check whether the budget is low enough that expired cache entries should be served instead.
+
+        The check uses the budget last seen by this process, read again from the store at
+        most once per SNAPSHOT_SECONDS, so it is cheap enough for every cache miss.
+
+        Returns:
+            bool: True if fewer than the stale reserve of tokens are left.
+        """
+        tokens, counted = self._snapshot
+        now = time.time()
+        if now - counted >= self.SNAPSHOT_SECONDS:
+            return self.remaining() < self.stale_threshold
+        return min(self.capacity, tokens + (now - counted) * self.refill_rate) < self.stale_threshold
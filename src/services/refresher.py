@@ -0,0 +1,89 @@
+import logging
+import threading
+from collections import Counter
+
+class WarmRefresher:
+    def __init__(self, weather_service, top_n=10, interval_seconds=5):
+        """
+        Initialize the WarmRefresher class for a WeatherService.
+
+        The WarmRefresher counts requests for current weather per location and, every
+        interval, refreshes the most requested locations whose cache entry is missing or
+        would expire before the next round, so the hottest cities are always warm.
+        Counts are halved every round so popularity follows recent traffic. Request
+        threads record while the refresh thread decays, so both hold a lock.
+
+        Args:
+            weather_service (WeatherService): The service whose cache is kept warm.
+            top_n (int): Number of locations kept warm. Defaults to 10.
+            interval_seconds (float): Time between two refresh rounds. Defaults to 5.
+        """
+        self.weather_service = weather_service
+        self.top_n = top_n
+        self.interval_seconds = interval_seconds
+        self.request_counts = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger('WarmRefresher')
+
+    def record(self, lat, lon):
+        """
+        Count one request for the current weather at a location.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+        """
+        with self._lock:
+            self.request_counts[(lat, lon)] += 1
+
+    def start(self):
+        """
+        Start refreshing in a daemon thread, unless already started.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='weather-warm-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the refresh thread after its current round.
+        """
+        self._stopped.set()
+
+    def _run(self):
+        """
+        Run refresh rounds until stopped.
+        """
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.refresh_once()
+            except Exception as error:
+                self.logger.error("Warm refresh failed: %s", error)
+
+    def refresh_once(self):
+        """
+        Refresh the most requested locations whose cache entry is about to expire.
+
+        Returns:
+            list: The locations for which a refresh was scheduled.
+        """
+        # Decay the counts so that locations which are no longer requested drop out.
+        with self._lock:
+            hottest = [location for location, _ in self.request_counts.most_common(self.top_n)]
+            self.request_counts = Counter({
+                location: count // 2 for location, count in self.request_counts.items() if count > 1
+            })
+
+        cache = self.weather_service.cache
+        scheduled = []
+        for lat, lon in hottest:
+            cache_key = self.weather_service.cache_key(lat, lon, None)
+            entry = cache.get_entry(cache_key)
+            if entry is None or entry[1] + self.interval_seconds >= cache.expiry_seconds:
+                self.weather_service.refresh_in_background(lat, lon, None)
+                scheduled.append((lat, lon))
+        return scheduled
@@ -0,0 +1,57 @@
+import threading
+
+class _Call:
+    def __init__(self):
+        """
+        Initialize the _Call class, the state of one in-flight call shared with its waiters.
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Initialize the SingleFlight class.
+
+        A SingleFlight de-duplicates concurrent calls within a process: while a call for
+        a key is in flight, further calls for the same key wait for it and share its
+        result (or exception) instead of running the function again.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """
+        Run a function for a key, unless a call for that key is already in flight.
+
+        Args:
+            key (str): Identifies calls that can share a result.
+            function (callable): The function to run, called without arguments.
+
+        Returns:
+            any: The result of the function, from this call or the one already in flight.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        # Wait for the call in flight and share its outcome.
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,171 @@
+import math
+
+# Mean radius of the Earth, and the length of one degree of latitude, in kilometres.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Compute the great-circle distance between two points.
+
+    Args:
+        lat1 (float): Latitude of the first point.
+        lon1 (float): Longitude of the first point.
+        lat2 (float): Latitude of the second point.
+        lon2 (float): Longitude of the second point.
+
+    Returns:
+        float: The distance in kilometres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_chord = (math.sin((phi2 - phi1) / 2) ** 2
+                  + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(half_chord)))
+
+class CoordinateGrid:
+    def __init__(self, cell_km):
+        """
+        Initialize the CoordinateGrid class with the size of its cells.
+
+        The grid splits the globe into rows of equal height, and each row into cells
+        about as wide as they are high, so cells cover roughly 'cell_km' by 'cell_km'
+        at every latitude.
+
+        Args:
+            cell_km (float): Height and approximate width of a cell in kilometres.
+        """
+        self.cell_km = cell_km
+        self.lat_step = cell_km / KM_PER_DEGREE
+
+    def _lon_step(self, row):
+        """
+        Return the width in degrees of the cells of a row.
+
+        Args:
+            row (int): The row.
+
+        Returns:
+            float: The width of its cells, at most 360 degrees.
+        """
+        center_lat = -90 + (row + 0.5) * self.lat_step
+        return min(360.0, self.lat_step / max(math.cos(math.radians(center_lat)), 1e-9))
+
+    def cell(self, lat, lon):
+        """
+        Find the cell containing a point.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+
+        Returns:
+            tuple: Row and column of the cell.
+        """
+        row = math.floor((lat + 90) / self.lat_step)
+        return row, math.floor((lon + 180) / self._lon_step(row))
+
+    def neighbours(self, lat, lon):
+        """
+        List the cell containing a point and the cells around it.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+
+        Returns:
+            list: Rows and columns of up to nine cells.
+        """
+        row = math.floor((lat + 90) / self.lat_step)
+        cells = []
+        for neighbour_row in (row - 1, row, row + 1):
+            column = math.floor((lon + 180) / self._lon_step(neighbour_row))
+            cells.extend((neighbour_row, neighbour_column) for neighbour_column in (column - 1, column, column + 1))
+        return cells
+
+    def quantize(self, lat, lon):
+        """
+        Snap a point to the centre of its cell, so nearby points share coordinates.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+
+        Returns:
+            tuple: Latitude and longitude of the cell centre, rounded to 5 decimals.
+        """
+        row, column = self.cell(lat, lon)
+        center_lat = -90 + (row + 0.5) * self.lat_step
+        center_lon = -180 + (column + 0.5) * self._lon_step(row)
+        return round(min(90.0, center_lat), 5), round(min(180.0, center_lon), 5)
+
+class SpatialIndex:
+    def __init__(self, radius_km):
+        """
+        Initialize the SpatialIndex class, which finds known locations near a point.
+
+        Locations are bucketed in a grid whose cells are as large as the search radius,
+        so a search only measures the distance to locations in the nine surrounding cells.
+        Updates are single dictionary and set operations, safe without a lock.
+
+        Args:
+            radius_km (float): Largest distance of the locations returned by nearby.
+        """
+        self.radius_km = radius_km
+        self.grid = CoordinateGrid(radius_km)
+        self._cells = {}
+
+    def add(self, lat, lon):
+        """
+        Add a location.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+        """
+        cell = self.grid.cell(lat, lon)
+        locations = self._cells.get(cell)
+        if locations is None:
+            locations = self._cells.setdefault(cell, set())
+        locations.add((lat, lon))
+
+    def discard(self, lat, lon):
+        """
+        Remove a location, if present.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+        """
+        locations = self._cells.get(self.grid.cell(lat, lon))
+        if locations is not None:
+            locations.discard((lat, lon))
+
+    def nearby(self, lat, lon):
+        """
+        List the locations within the radius of a point, nearest first.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+
+        Returns:
+            list: Latitude and longitude of each location found.
+        """
+        found = []
+        for cell in self.grid.neighbours(lat, lon):
+            # Copy the set, since other threads may add to it.
+            for location in list(self._cells.get(cell, ())):
+                distance = haversine_km(lat, lon, location[0], location[1])
+                if distance <= self.radius_km:
+                    found.append((distance, location))
+        found.sort()
+        return [location for _, location in found]
+
+    def __len__(self):
+        """
+        Count the indexed locations.
+
+        Returns:
+            int: The number of locations.
+        """
+        return sum(len(locations) for locations in list(self._cells.values()))
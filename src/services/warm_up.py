@@ -0,0 +1,104 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+class CacheWarmer:
+    def __init__(self, weather_service, cities, max_workers=4, max_calls=None):
+        """
+        Initialize the CacheWarmer class with the cities fetched when a worker starts.
+
+        Warm-up resolves the configured cities and fetches the current weather of those
+        not cached yet, a few at a time, so a new worker does not send its first users'
+        requests upstream. Fetches run at background priority of the upstream quota, and
+        at most 'max_calls' of them are made, so warm-up never spends the budget of
+        interactive requests. Locations another worker is already fetching are skipped.
+        The worker reports itself ready once warm-up has finished, whatever its outcome.
+
+        Args:
+            weather_service (WeatherService): The service whose cache is warmed.
+            cities (list): Names of the cities to warm.
+            max_workers (int): Number of cities fetched at once. Defaults to 4.
+            max_calls (int, optional): Largest number of upstream weather calls. Defaults to None, for no limit.
+        """
+        self.weather_service = weather_service
+        self.cities = list(cities)
+        self.max_workers = max_workers
+        self.max_calls = max_calls
+        self.ready = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger('CacheWarmer')
+
+    def start(self):
+        """
+        Warm the cache in a daemon thread, unless warm-up has already started.
+        """
+        if self._thread is not None or self.ready.is_set():
+            return
+        self._thread = threading.Thread(target=self._run, name='weather-warm-up', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Warm the cache, then report the worker ready even if warm-up failed.
+        """
+        try:
+            self.warm()
+        except Exception as error:
+            self.logger.error("Cache warm-up failed: %s", error)
+        finally:
+            self.ready.set()
+
+    def warm(self):
+        """
+        Fetch the current weather of every configured city not cached yet.
+
+        Returns:
+            collections.Counter: Number of locations per outcome: 'cached', 'fetched',
+                'pending', 'refused', 'over_budget' or 'failed'.
+        """
+        # Resolve the cities first, so cities sharing a location are fetched once.
+        outcomes = Counter()
+        locations = set()
+        for city in self.cities:
+            try:
+                lat, lon = self.weather_service.convert_city_to_coordinates(city)
+            except Exception as error:
+                self.logger.warning("Could not resolve warm-up city %s: %s", city, error)
+                lat = lon = None
+            if lat is None or lon is None:
+                outcomes['failed'] += 1
+            else:
+                locations.add(self.weather_service.quantize(lat, lon))
+
+        calls_left = threading.Semaphore(self.max_calls) if self.max_calls is not None else None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='weather-warm-up') as executor:
+            outcomes.update(executor.map(lambda location: self._warm_location(location, calls_left), locations))
+
+        self.logger.info("Cache warm-up finished: %s", dict(outcomes))
+        return outcomes
+
+    def _warm_location(self, location, calls_left):
+        """
+        Fetch the current weather of one location, within the budget of upstream calls.
+
+        Args:
+            location (tuple): The latitude and longitude.
+            calls_left (threading.Semaphore): Upstream calls left, or None for no limit.
+
+        Returns:
+            str: The outcome of the location.
+        """
+        if calls_left is not None and not calls_left.acquire(blocking=False):
+            # Locations cached by another worker are still counted as such.
+            return 'cached' if self.weather_service.is_fresh(*location) else 'over_budget'
+        try:
+            outcome = self.weather_service.prefetch(*location)
+        except Exception as error:
+            self.logger.warning("Could not warm %s,%s: %s", location[0], location[1], error)
+            outcome = 'failed'
+
+        # Give the call back to the budget if none was made.
+        if calls_left is not None and outcome in ('cached', 'pending', 'refused'):
+            calls_left.release()
+        return outcome
@@ -1,35 +1,264 @@
 import logging
+import os
+import threading
+import time
 import requests
-from utils.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from .cache_service import CacheService
-from utils.config import Config
+from .cache_sweeper import CacheSweeper
+from .circuit_breaker import CircuitOpenError
+from .http_client import HttpClient
+from .single_flight import SingleFlight
+from .refresher import WarmRefresher
+from .city_index import CityIndex, normalize_city_name
+from .forecast_record import ForecastRecord, ForecastSeries
+from .spatial import CoordinateGrid, SpatialIndex
+from .archive import HistoricalArchive
+from .quota import QuotaManager
+from .warm_up import CacheWarmer
+from .cache_snapshot import read_snapshot, write_snapshot
+from .providers import ProviderRouter, ProvidersUnavailableError, create_provider
+
+# Seconds clients may keep archived observations, which never change.
+ARCHIVED_MAX_AGE = 24 * 60 * 60
+
+# Error messages of requests refused because the upstream call quota is spent, or the upstream API is failing.
+QUOTA_EXHAUSTED_MESSAGE = 'Upstream call quota exhausted, try again later'
+UPSTREAM_UNAVAILABLE_MESSAGE = 'Upstream service unavailable, try again later'
+
+class GeocodingUnavailableError(Exception):
+    """
+    Raised when a city cannot be geocoded because the geocoding API could not be reached.
+    """
 
 class WeatherService:
     def __init__(self, config):
         """
-        Initialize the WeatherService class using settings from the Config utility class.
+        Initialize the WeatherService class using the given application configuration.
 
         This initialization sets up the WeatherService with API keys and base URLs 
         required for interacting with the OpenWeatherMap API. It also initializes a 
-        CacheService for caching weather data and sets up logging.
-        """
+        CacheService for caching weather data and sets up logging. The service is 
+        meant to be built once per application and shared by all requests.
 
-        config = Config.get_instance().get_app_config()
+        Args:
+            config (Mapping): The application configuration, such as Flask's 'app.config'.
+        """
 
         # Extract the API key, base URL, and Geocoding URL for the OpenWeatherMap API.
-        # Retrieve configuration settings using attribute access
         self.api_key = config['API_KEY']
         self.base_url = config['BASE_URL']
         self.geocoding_url = config['GEOCODING_URL']
 
-        # Initialize the CacheService to cache weather data.
-        self.cache = CacheService()
+        # Sweep expired entries out of the cache databases and keep them within their bounds, unless disabled.
+        sweep_interval_seconds = config.get('CACHE_SWEEP_INTERVAL_SECONDS', 60)
+        sweeping = sweep_interval_seconds > 0
+
+        # Initialize the CacheService to cache weather data. Expired entries are kept while
+        # they may still be served near the quota limit, and for a retention period after.
+        self.cache = CacheService(
+            cache_dir=config.get('CACHE_DIR', '/app/cache'),
+            expiry_seconds=config.get('CACHE_EXPIRY_SECONDS', 10),
+            memory_max_entries=config.get('CACHE_MEMORY_MAX_ENTRIES', 1024),
+            memory_max_bytes=config.get('CACHE_MEMORY_MAX_BYTES', 16 * 1024 * 1024),
+            stale_seconds=config.get('CACHE_STALE_SECONDS', 0),
+            max_entries=config.get('CACHE_MAX_ENTRIES', 100000) if sweeping else None,
+            max_bytes=config.get('CACHE_MAX_BYTES', 256 * 1024 * 1024) if sweeping else None,
+            retention_seconds=config.get(
+                'CACHE_RETENTION_SECONDS', 24 * 60 * 60 if config.get('QUOTA_CALLS_PER_MINUTE', 0) > 0 else 0
+            ),
+            keep_expired=lambda: self.stale_max_age() is not None
+        )
+
+        # Initialize the pooled HTTP client shared by all upstream calls.
+        self.http = HttpClient(
+            pool_size=config.get('HTTP_POOL_SIZE', 10),
+            connect_timeout=config.get('HTTP_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('HTTP_READ_TIMEOUT', 10),
+            retries=config.get('HTTP_RETRIES', 2),
+            backoff_factor=config.get('HTTP_RETRY_BACKOFF', 0.5),
+            breaker_failure_threshold=config.get('BREAKER_FAILURE_THRESHOLD', 5),
+            breaker_reset_seconds=config.get('BREAKER_RESET_SECONDS', 30),
+            breaker_half_open_calls=config.get('BREAKER_HALF_OPEN_CALLS', 1),
+            hedge=config.get('HTTP_HEDGE', False),
+            hedge_min_delay=config.get('HTTP_HEDGE_MIN_DELAY', 0.05),
+            hedge_permit=self.allow_hedge,
+            hedge_pool_size=config.get('HTTP_HEDGE_POOL_SIZE', 4)
+        )
+
+        # Fetch weather through the configured providers, primary first, with failover or fan-out.
+        # The fan-out pool defaults to one thread per provider for each request thread of the worker.
+        provider_names = config.get('WEATHER_PROVIDERS', ['openweathermap'])
+        self.providers = ProviderRouter(
+            [create_provider(name, config, self.http) for name in provider_names],
+            policy=config.get('WEATHER_PROVIDER_POLICY', ProviderRouter.FAILOVER),
+            pool_size=config.get('WEATHER_PROVIDER_POOL_SIZE', int(os.environ.get('WEB_THREADS', 4)) * len(provider_names))
+        )
+
+        # Optionally snap coordinates to grid cells, and reuse fresh entries of nearby locations.
+        grid_km = config.get('COORDINATE_GRID_KM', 0)
+        self.grid = CoordinateGrid(grid_km) if grid_km > 0 else None
+        nearby_radius_km = config.get('NEARBY_RADIUS_KM', 0)
+        self.nearby_index = SpatialIndex(nearby_radius_km) if nearby_radius_km > 0 else None
+
+        # Granularity of the provider's observations: requested times are rounded down to it, 0 to keep them as is.
+        self.timestamp_step_seconds = config.get('TIMESTAMP_STEP_SECONDS', 3600)
+
+        # Hours ahead answered from the cached hourly series of a location, 0 to disable.
+        self.series_hours = config.get('FORECAST_SERIES_HOURS', 48)
+
+        # Keep past observations permanently in the historical archive, unless ARCHIVE_DIR is empty.
+        archive_dir = config.get('ARCHIVE_DIR', os.path.join(config.get('CACHE_DIR', '/app/cache'), 'archive'))
+        self.archive = HistoricalArchive(archive_dir) if archive_dir else None
+        self.archive_min_age_seconds = config.get('ARCHIVE_MIN_AGE_SECONDS', 3600)
+
+        # De-duplicate concurrent fetches of the same key, optionally across processes.
+        self.single_flight = SingleFlight()
+        self.cross_process_single_flight = config.get('SINGLE_FLIGHT_CROSS_PROCESS', False)
+        self.lease_seconds = config.get('SINGLE_FLIGHT_LEASE_SECONDS', 30)
+        self.lease_poll_seconds = config.get('SINGLE_FLIGHT_POLL_SECONDS', 0.05)
+
+        # Optionally pace upstream calls with a token bucket shared by all workers through the cache store.
+        self.quota = None
+        if config.get('QUOTA_CALLS_PER_MINUTE', 0) > 0:
+            self.quota = QuotaManager(
+                self.cache.store,
+                config['QUOTA_CALLS_PER_MINUTE'],
+                burst=config.get('QUOTA_BURST'),
+                background_reserve=config.get('QUOTA_BACKGROUND_RESERVE', 0.5),
+                stale_reserve=config.get('QUOTA_STALE_RESERVE', 0.2),
+                max_wait_seconds=config.get('QUOTA_MAX_WAIT_SECONDS', 1)
+            )
+
+        # Refresh stale entries in the background, optionally keeping the hottest locations warm.
+        self.refresh_workers = config.get('REFRESH_WORKERS', 4)
+        self._create_refresh_executor()
+        self.refresher = None
+        if config.get('REFRESH_TOP_N', 0) > 0:
+            self.refresher = WarmRefresher(self, config['REFRESH_TOP_N'], config.get('REFRESH_INTERVAL_SECONDS', 5))
+
+        # Optionally warm the cache for a list of cities when background tasks start.
+        self.warmer = None
+        if config.get('WARMUP_CITIES'):
+            self.warmer = CacheWarmer(
+                self, config['WARMUP_CITIES'], config.get('WARMUP_WORKERS', 4), config.get('WARMUP_MAX_CALLS')
+            )
 
-        # Set up logging with a specific format and level.
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+        # Initialize a separate, long-lived cache for geocoding results.
+        self.geocoding_cache = CacheService(
+            cache_dir=config.get('CACHE_DIR', '/app/cache'),
+            expiry_seconds=config.get('GEOCODING_CACHE_EXPIRY_SECONDS', 30 * 24 * 60 * 60),
+            memory_max_entries=config.get('GEOCODING_CACHE_MEMORY_MAX_ENTRIES', 10000),
+            name='geocoding',
+            max_entries=config.get('GEOCODING_CACHE_MAX_ENTRIES', 100000) if sweeping else None
+        )
+        self.sweeper = CacheSweeper((self.cache, self.geocoding_cache), sweep_interval_seconds) if sweeping else None
+
+        # Set up logging.
         self.logger = logging.getLogger('WeatherService')
+
+        # Load the optional offline city index built with 'flask build-city-index'.
+        self.city_index = None
+        city_index_path = config.get('CITY_INDEX_PATH')
+        if city_index_path:
+            if os.path.exists(city_index_path):
+                self.city_index = CityIndex.load(city_index_path)
+                self.logger.info("Loaded %d names from city index %s", len(self.city_index), city_index_path)
+            else:
+                self.logger.warning("City index not found: %s", city_index_path)
+
+        # Start from the cache snapshot left by a previous instance, if any.
+        self.snapshot_path = config.get('CACHE_SNAPSHOT_PATH')
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.restore_snapshot(self.snapshot_path)
+
         self.logger.info("Weather service initialized")
 
+    def _create_refresh_executor(self):
+        """
+        Create the thread pool running background refreshes and its bookkeeping.
+        """
+        self.refresh_executor = ThreadPoolExecutor(
+            max_workers=self.refresh_workers, thread_name_prefix='weather-refresh'
+        )
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the background tasks of the service, such as the cache warm-up, the warm refresher and the cache sweeper.
+
+        Threads do not survive a fork, so a preloading server calls this in each worker.
+        """
+        if self.warmer is not None:
+            self.warmer.start()
+        if self.refresher is not None:
+            self.refresher.start()
+        if self.sweeper is not None:
+            self.sweeper.start()
+
+    def is_ready(self):
+        """
+        Reports whether the service is ready for traffic, that is whether cache warm-up has finished.
+
+        Returns:
+            bool: False while warm-up is configured and not finished, otherwise True.
+        """
+        return self.warmer is None or self.warmer.ready.is_set()
+
+    def snapshot(self, path=None):
+        """
+        Writes the newest servable entries of the weather and geocoding caches to a snapshot file.
+
+        Args:
+            path (str, optional): Path of the snapshot. Defaults to 'CACHE_SNAPSHOT_PATH'.
+
+        Returns:
+            int: The number of entries written.
+        """
+        path = path or self.snapshot_path
+        written = write_snapshot(path, {
+            cache.name: cache.snapshot_entries() for cache in (self.cache, self.geocoding_cache)
+        })
+        self.logger.info("Wrote %d cache entries to %s", written, path)
+        return written
+
+    def restore_snapshot(self, path):
+        """
+        Imports the entries of a snapshot file that can still be served, keeping newer cached entries.
+
+        Args:
+            path (str): Path of the snapshot.
+
+        Returns:
+            int: The number of entries imported, 0 if the snapshot cannot be read.
+        """
+        try:
+            sections = read_snapshot(path)
+        except (OSError, ValueError) as error:
+            self.logger.warning("Could not restore cache snapshot %s: %s", path, error)
+            return 0
+        return sum(cache.restore_entries(sections.get(cache.name, [])) for cache in (self.cache, self.geocoding_cache))
+
+    def preload(self):
+        """
+        Load recent entries of the weather and geocoding caches into memory.
+        """
+        self.cache.preload()
+        self.geocoding_cache.preload()
+
+    def after_fork(self):
+        """
+        Reset the per-process state inherited from the parent after a fork.
+
+        Pooled sockets, thread pools and in-flight bookkeeping of the parent are 
+        replaced; caches and the city index are kept and shared copy-on-write.
+        """
+        self.http.reset()
+        self.providers.reset()
+        self.single_flight = SingleFlight()
+        self._create_refresh_executor()
+
     def get_weather(self, lat, lon, timestamp=None):
         """
         Fetches weather data for given coordinates. If a timestamp is provided,
@@ -43,44 +272,477 @@ class WeatherService:
         Returns:
             tuple: HTTP status code and the weather data or error message.
         """
-        # Create a unique cache key based on latitude, longitude, and timestamp.
-        cache_key = f"{lat},{lon},{timestamp}"
+        lat, lon = self.quantize(lat, lon)
+        timestamp = self.normalize_timestamp(timestamp)
+
+        # Answer times inside the hourly forecast window from the series of the location.
+        if timestamp is not None and self.in_series_window(timestamp):
+            record = self.lookup_series(lat, lon, timestamp)
+            if record is None:
+                # Fetching the current weather also caches the hourly series.
+                status_code, data = self.get_weather(lat, lon)
+                if status_code != 200:
+                    return status_code, data
+                record = self.lookup_series(lat, lon, timestamp)
+            if record is not None:
+                return 200, record
+
+        # Past observations never change, so archived ones are served without a lookup in the cache.
+        archived_record = self.lookup_archive(lat, lon, timestamp)
+        if archived_record is not None:
+            return 200, archived_record
+
+        cache_key = self.cache_key(lat, lon, timestamp)
+        if self.refresher is not None and timestamp is None:
+            self.refresher.record(lat, lon)
 
-        # Try to retrieve the response from cache first.
-        cached_response = self.cache.get(cache_key)
-        if cached_response:
-            # If cached data is available, return it without making an API call.
+        # Try to retrieve the response from cache first; near the quota limit, however old it is.
+        cached_entry = self.cache.get_entry(cache_key, self.stale_max_age())
+        if cached_entry:
+            # If cached data is available, return it without making an API call,
+            # refreshing it in the background once it is stale.
+            cached_response, age = cached_entry
+            if age >= self.cache.expiry_seconds:
+                self.refresh_in_background(lat, lon, timestamp)
+            elif timestamp is None:
+                self.remember_location(lat, lon)
             return 200, cached_response
 
-        # Prepare the parameters for the API request.
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': self.api_key,
-            'units': 'metric',  # Set units to metric.
-            'exclude': 'minutely,daily,alerts'  # Exclude unnecessary data.
-        }
-
-        # Determine the appropriate endpoint based on the presence of a timestamp.
-        endpoint = self.base_url + "/timemachine" if timestamp else self.base_url
-        if timestamp:
-            params['dt'] = timestamp
-
-        # Prepare and log the full request URL.
-        prepared_request = requests.Request('GET', endpoint, params=params).prepare()
-        self.logger.info(f"Request URL: {prepared_request.url}")
-
-        # Make the API request and handle the response.
-        response = requests.get(prepared_request.url)
-        if response.status_code == 200:
+        # Serve the current weather of a nearby location, if one is cached and fresh.
+        if timestamp is None:
+            nearby_response = self.nearby_entry(lat, lon, lambda near_lat, near_lon: self.cache_key(near_lat, near_lon, None))
+            if nearby_response is not None:
+                return 200, nearby_response
+
+        # Concurrent misses for the same key share a single upstream fetch.
+        return self.single_flight.do(cache_key, lambda: self._fetch_weather(lat, lon, timestamp, cache_key))
+
+    def time_to_live(self, lat, lon, timestamp=None):
+        """
+        Returns how long the weather for a location and time stays fresh, for HTTP caching.
+
+        Meant to be called right after get_weather, whose cache entry is then in the memory tier.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data. Defaults to None.
+
+        Returns:
+            int: Seconds until the cached entry expires, ARCHIVED_MAX_AGE for archived
+                observations, or 0 if the weather was not served from a cache entry.
+        """
+        lat, lon = self.quantize(lat, lon)
+        timestamp = self.normalize_timestamp(timestamp)
+        if timestamp is not None and self.in_series_window(timestamp):
+            key = self.series_key(lat, lon)
+        elif self.lookup_archive(lat, lon, timestamp) is not None:
+            return ARCHIVED_MAX_AGE
+        else:
+            key = self.cache_key(lat, lon, timestamp)
+
+        cached_item = self.cache.memory.get(key)
+        if cached_item is None:
+            return 0
+        return max(0, int(self.cache.expiry_seconds - (time.time() - cached_item[1])))
+
+    def allow_hedge(self, name):
+        """
+        Take a quota token for a hedged attempt, which is an extra upstream call.
+
+        Hedges draw on the background share of the quota and never wait, so they only
+        spend budget interactive requests do not need. Geocoding calls are not paced.
+
+        Args:
+            name (str): Name of the upstream operation.
+
+        Returns:
+            bool: True if the hedged attempt may be sent.
+        """
+        if self.quota is None or name == 'geocode':
+            return True
+        return self.quota.try_acquire(QuotaManager.BACKGROUND) == 0
+
+    def stale_max_age(self):
+        """
+        Returns the age from which cache entries are not served, lifted while the upstream quota is nearly spent.
+
+        Returns:
+            float: Infinity near the quota limit, otherwise None for the cache's own limit.
+        """
+        if self.quota is not None and self.quota.near_limit():
+            return float('inf')
+        return None
+
+    def quantize(self, lat, lon):
+        """
+        Snaps coordinates to the centre of their grid cell, if a grid is configured.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+
+        Returns:
+            tuple: The latitude and longitude used for caching and upstream calls.
+        """
+        if self.grid is None:
+            return lat, lon
+        return self.grid.quantize(lat, lon)
+
+    def normalize_timestamp(self, timestamp):
+        """
+        Rounds a time down to the provider's time step, so that times within one step share a cache entry.
+
+        Args:
+            timestamp (int, optional): Unix timestamp for historical data.
+
+        Returns:
+            int: The start of the time step containing the time, or None for current weather.
+        """
+        if timestamp is None or self.timestamp_step_seconds <= 0:
+            return timestamp
+        return timestamp - timestamp % self.timestamp_step_seconds
+
+    def store_response(self, lat, lon, timestamp, cache_key, data):
+        """
+        Caches a successful upstream response, with the hourly series of current weather, and archives past observations.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+            data (dict): The response data of the upstream API.
+
+        Returns:
+            ForecastRecord: The processed weather data.
+        """
+        weather_data = self.process_response(data)
+        if not timestamp:
+            self.cache_series(lat, lon, data)
+        self.cache.set(cache_key, weather_data)
+        if not timestamp:
+            self.remember_location(lat, lon)
+        self.archive_response(lat, lon, timestamp, weather_data)
+        return weather_data
+
+    def remember_location(self, lat, lon):
+        """
+        Records that the current weather of a location is cached, so nearby requests can reuse it.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+        """
+        if self.nearby_index is not None:
+            self.nearby_index.add(lat, lon)
+
+    def nearby_entry(self, lat, lon, key_function):
+        """
+        Finds the fresh cache entry of the nearest location within the nearby radius.
+
+        Locations whose entries have left the cache are dropped from the index.
+
+        Args:
+            lat (float): Latitude of the requested location.
+            lon (float): Longitude of the requested location.
+            key_function (callable): Returns the cache key of a latitude and longitude.
+
+        Returns:
+            any: The cached value, or None if no nearby location has a fresh entry.
+        """
+        if self.nearby_index is None:
+            return None
+
+        for near_lat, near_lon in self.nearby_index.nearby(lat, lon):
+            if (near_lat, near_lon) == (lat, lon):
+                continue
+            cached_entry = self.cache.get_entry(key_function(near_lat, near_lon))
+            if cached_entry is None:
+                self.nearby_index.discard(near_lat, near_lon)
+            elif cached_entry[1] < self.cache.expiry_seconds:
+                return cached_entry[0]
+        return None
+
+    def cache_key(self, lat, lon, timestamp):
+        """
+        Creates a unique cache key based on latitude, longitude, and timestamp.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+
+        Returns:
+            str: The cache key of the weather data.
+        """
+        return f"{lat},{lon},{timestamp}"
+
+    def series_key(self, lat, lon):
+        """
+        Creates the cache key of the hourly series of a location.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+
+        Returns:
+            str: The cache key of the series.
+        """
+        return f"series:{lat},{lon}"
+
+    def in_series_window(self, timestamp):
+        """
+        Checks whether a time falls inside the hourly forecast returned with the current weather.
+
+        Args:
+            timestamp (int): Unix timestamp.
+
+        Returns:
+            bool: True if the time is between the start of the current hour and 'series_hours' ahead.
+        """
+        now = time.time()
+        return now - now % ForecastSeries.STEP_SECONDS <= timestamp < now + self.series_hours * 3600
+
+    def lookup_series(self, lat, lon, timestamp):
+        """
+        Answers a time from the cached hourly series of a location, refreshing it once stale.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int): Unix timestamp.
+
+        Returns:
+            ForecastRecord: The weather of the hour containing the time, or None if no
+                cached series covers it.
+        """
+        cached_entry = self.cache.get_entry(self.series_key(lat, lon))
+        if not cached_entry:
+            # Fall back to the series of a nearby location.
+            nearby_series = self.nearby_entry(lat, lon, self.series_key)
+            return nearby_series.at(timestamp) if nearby_series is not None else None
+
+        series, age = cached_entry
+        record = series.at(timestamp)
+        if record is not None and age >= self.cache.expiry_seconds:
+            self.refresh_in_background(lat, lon)
+        return record
+
+    def cache_series(self, lat, lon, data):
+        """
+        Caches the hourly series of a onecall response, if it carries one.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            data (dict): The raw data received from the API.
+        """
+        if self.series_hours <= 0 or not isinstance(data.get('hourly'), list):
+            return
+        series = ForecastSeries.from_data_points(data['hourly'])
+        if len(series):
+            self.cache.set(self.series_key(lat, lon), series)
+
+    def is_archivable(self, timestamp):
+        """
+        Checks whether observations of a time are old enough to be final, and so can be archived.
+
+        Args:
+            timestamp (int, optional): Unix timestamp for historical data.
+
+        Returns:
+            bool: True if the archive is enabled and the time is at least ARCHIVE_MIN_AGE_SECONDS in the past.
+        """
+        return (self.archive is not None and timestamp is not None
+                and timestamp <= time.time() - self.archive_min_age_seconds)
+
+    def lookup_archive(self, lat, lon, timestamp):
+        """
+        Looks up the archived observation of a location and past time.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+
+        Returns:
+            ForecastRecord: The archived observation, or None.
+        """
+        if not self.is_archivable(timestamp):
+            return None
+        return self.archive.get(lat, lon, timestamp)
+
+    def archive_response(self, lat, lon, timestamp, weather_data):
+        """
+        Archives the observation of a past time fetched from the API.
+
+        Failing to write the archive is logged but does not fail the request.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            weather_data (ForecastRecord | dict): The processed response.
+        """
+        if not self.is_archivable(timestamp) or not isinstance(weather_data, ForecastRecord):
+            return
+        try:
+            self.archive.add(lat, lon, [weather_data])
+        except OSError as error:
+            self.logger.warning("Could not archive weather of %s,%s at %s: %s", lat, lon, timestamp, error)
+
+    def is_fresh(self, lat, lon):
+        """
+        Checks whether the current weather of a location is cached and not yet expired.
+
+        Args:
+            lat (float): Latitude of the location, already quantized.
+            lon (float): Longitude of the location, already quantized.
+
+        Returns:
+            bool: True if a fresh entry is cached.
+        """
+        cached_entry = self.cache.get_entry(self.cache_key(lat, lon, None))
+        return cached_entry is not None and cached_entry[1] < self.cache.expiry_seconds
+
+    def prefetch(self, lat, lon):
+        """
+        Fetches the current weather of a location at background priority, unless it is cached and fresh.
+
+        A location whose lease is held, because another worker is fetching it, is left to that worker.
+
+        Args:
+            lat (float): Latitude of the location, already quantized.
+            lon (float): Longitude of the location, already quantized.
+
+        Returns:
+            str: 'cached', 'pending' if another worker is fetching it, 'fetched', 'refused'
+                if the upstream quota is spent, or 'failed'.
+        """
+        if self.is_fresh(lat, lon):
+            self.remember_location(lat, lon)
+            return 'cached'
+
+        cache_key = self.cache_key(lat, lon, None)
+        if not self.cache.acquire_lease(cache_key, self.lease_seconds):
+            return 'pending'
+        try:
+            status_code, _ = self.single_flight.do(
+                cache_key, lambda: self._request_weather(lat, lon, None, cache_key, QuotaManager.BACKGROUND)
+            )
+        finally:
+            self.cache.release_lease(cache_key)
+
+        if status_code == 200:
+            return 'fetched'
+        return 'refused' if status_code == 429 else 'failed'
+
+    def refresh_in_background(self, lat, lon, timestamp=None):
+        """
+        Schedules a fetch of weather data on the refresh pool, unless one is already pending.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data. Defaults to None.
+        """
+        cache_key = self.cache_key(lat, lon, timestamp)
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        self.refresh_executor.submit(self._refresh, lat, lon, timestamp, cache_key)
+
+    def _refresh(self, lat, lon, timestamp, cache_key):
+        """
+        Fetches weather data on the refresh pool and caches it.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+        """
+        try:
+            self.single_flight.do(
+                cache_key, lambda: self._fetch_weather(lat, lon, timestamp, cache_key, QuotaManager.BACKGROUND)
+            )
+        except Exception as error:
+            self.logger.error("Background refresh failed for key %s: %s", cache_key, error)
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(cache_key)
+
+    def _fetch_weather(self, lat, lon, timestamp, cache_key, priority=QuotaManager.INTERACTIVE):
+        """
+        Fetches weather data from the API after a cache miss and caches it.
+
+        When cross-process single-flight is enabled, a lease in the persistent cache 
+        ensures only one worker fetches a given key; the others wait for its result to 
+        appear in the cache, and take over if the lease lapses first.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+            priority (str): Quota priority of the call. Defaults to QuotaManager.INTERACTIVE.
+
+        Returns:
+            tuple: HTTP status code and the weather data or error message.
+        """
+        if not self.cross_process_single_flight:
+            return self._request_weather(lat, lon, timestamp, cache_key, priority)
+
+        # Wait until either another worker caches the data or this one holds the lease.
+        while not self.cache.acquire_lease(cache_key, self.lease_seconds):
+            time.sleep(self.lease_poll_seconds)
+            cached_response = self.cache.get(cache_key)
+            if cached_response:
+                return 200, cached_response
+
+        try:
+            # The previous lease holder may have cached the data just before releasing it.
+            cached_response = self.cache.get(cache_key)
+            if cached_response:
+                return 200, cached_response
+            return self._request_weather(lat, lon, timestamp, cache_key, priority)
+        finally:
+            self.cache.release_lease(cache_key)
+
+    def _request_weather(self, lat, lon, timestamp, cache_key, priority=QuotaManager.INTERACTIVE):
+        """
+        Requests weather data from the API and caches successful responses.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            timestamp (int, optional): Unix timestamp for historical data.
+            cache_key (str): The cache key of the weather data.
+            priority (str): Quota priority of the call. Defaults to QuotaManager.INTERACTIVE.
+
+        Returns:
+            tuple: HTTP status code and the weather data or error message.
+        """
+        # Wait for the upstream quota, refusing the call if none is left.
+        if self.quota is not None and not self.quota.acquire(priority):
+            return 429, QUOTA_EXHAUSTED_MESSAGE
+
+        # Fetch from the weather providers; a slow or failing upstream API is reported as unavailable.
+        try:
+            status_code, data = self.providers.route(lambda provider: provider.fetch(lat, lon, timestamp))
+        except ProvidersUnavailableError:
+            return 503, UPSTREAM_UNAVAILABLE_MESSAGE
+        if status_code == 200:
             # Process and cache the response if successful.
-            weather_data = self.process_response(response.json())
-            self.cache.set(cache_key, weather_data)
-            return response.status_code, weather_data
+            return status_code, self.store_response(lat, lon, timestamp, cache_key, data)
         else:
-            # Log the error for unsuccessful API responses.
-            self.logger.error(f"API error: {response.status_code}, {response.json().get('message', 'Unknown error')}")
-            return response.status_code, response.json().get('message', 'Unknown error')
+            # Log the error for unsuccessful API responses, and stop calling once the API reports its limit.
+            if status_code == 429 and self.quota is not None:
+                self.quota.exhaust()
+            self.logger.error("API error: %s, %s", status_code, data)
+            return status_code, data
 
     def process_response(self, data):
         """
@@ -90,7 +752,7 @@ class WeatherService:
             data (dict): The raw data received from the API.
 
         Returns:
-            dict: Processed weather data.
+            ForecastRecord | dict: The numeric weather data, or an error message.
         """
         # Extract relevant data based on the structure of the response.
         if 'data' in data:
@@ -101,36 +763,70 @@ class WeatherService:
             self.logger.error("Invalid data format in response")
             return {'error': 'Invalid data format'}
 
-        # Format the extracted weather details.
-        return {
-            'temperature': f"{weather_data_point.get('temp', 'N/A')}C",
-            'pressure': f"{weather_data_point.get('pressure', 'N/A')}hPa",
-            'humidity': f"{weather_data_point.get('humidity', 'N/A')}%",
-            'clouds': f"{weather_data_point.get('clouds', 'N/A')}%"
-        }
+        # Keep the extracted weather details as numbers; they are formatted when the response is serialized.
+        return ForecastRecord.from_data_point(weather_data_point)
+
+    def lookup_city_offline(self, normalized_name):
+        """
+        Looks up the coordinates of a city in the offline city index, then in the geocoding cache.
+
+        Args:
+            normalized_name (str): The city name, normalized with normalize_city_name.
+
+        Returns:
+            tuple: Latitude and longitude of the city, or None if it is not known offline.
+        """
+        # Try the offline city index first.
+        if self.city_index is not None:
+            coordinates = self.city_index.lookup(normalized_name)
+            if coordinates:
+                return coordinates
+
+        # Then try the geocoding cache.
+        cached_coordinates = self.geocoding_cache.get(normalized_name)
+        if cached_coordinates:
+            return cached_coordinates[0], cached_coordinates[1]
+        return None
 
     def convert_city_to_coordinates(self, city_name):
         """
         Converts a city name to latitude and longitude using the OpenWeatherMap Geocoding API.
 
+        The offline city index and the geocoding cache are consulted first, so most 
+        lookups are answered without leaving the process.
+
         Args:
             city_name (str): The name of the city to convert.
 
         Returns:
             tuple: Latitude and longitude of the city, or None, None if not found or in case of an error.
+
+        Raises:
+            GeocodingUnavailableError: If the geocoding API could not be reached.
         """
+        normalized_name = normalize_city_name(city_name)
+        coordinates = self.lookup_city_offline(normalized_name)
+        if coordinates:
+            return coordinates
+
         # Prepare the parameters for the geocoding API request.
         params = {'q': city_name, 'limit': 1, 'appid': self.api_key}
 
-        # Make the geocoding API request.
-        response = requests.get(self.geocoding_url, params=params)
+        # Make the geocoding API request; a slow or failing API is reported as unavailable.
+        try:
+            response = self.http.get(self.geocoding_url, params=params, name='geocode')
+        except (CircuitOpenError, requests.RequestException) as error:
+            self.logger.error("Geocoding API unavailable: %s", error)
+            raise GeocodingUnavailableError(str(error)) from error
         if response.status_code == 200:
             data = response.json()
             if data:
+                # Cache the coordinates under the normalized name.
+                self.geocoding_cache.set(normalized_name, [data[0]['lat'], data[0]['lon']])
                 return data[0]['lat'], data[0]['lon']
             else:
-                self.logger.error(f"City not found: {city_name}")
+                self.logger.error("City not found: %s", city_name)
                 return None, None
         else:
-            self.logger.error(f"Geocoding API error: {response.status_code}")
+            self.logger.error("Geocoding API error: %s", response.status_code)
             return None, None
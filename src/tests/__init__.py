@@ -0,0 +1,11 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Read test users from a temporary file, never from a local config/users.yaml.
+_users_dir = tempfile.mkdtemp()
+with open(os.path.join(_users_dir, 'users.yaml'), 'w') as users_file:
+    users_file.write('user: "pass"\n')
+os.environ['WEATHER_USERS_FILE'] = os.path.join(_users_dir, 'users.yaml')
+atexit.register(shutil.rmtree, _users_dir, True)
@@ -0,0 +1,62 @@
+import unittest
+import logging
+import tempfile
+from benchmarks import bench_cache, bench_process_response
+from benchmarks.run import compare
+from benchmarks.stub_server import StubServer, ONECALL_PATH, TIMEMACHINE_PATH, GEOCODING_PATH
+from services.weather_service import WeatherService
+
+class TestStubServer(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer().start()
+        self.weather_service = WeatherService(dict(
+            self.stub.config(), API_KEY='test', CACHE_DIR=tempfile.mkdtemp(), HTTP_RETRY_BACKOFF=0
+        ))
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def test_forecast_path_against_stub(self):
+        lat, lon = self.weather_service.convert_city_to_coordinates('London')
+        self.assertIsNotNone(lat)
+        self.assertEqual(self.weather_service.convert_city_to_coordinates('unknowncity'), (None, None))
+
+        status_code, data = self.weather_service.get_weather(lat, lon)
+        self.assertEqual(status_code, 200)
+        self.assertTrue(data.to_dict()['temperature'].endswith('C'))
+
+        status_code, data = self.weather_service.get_weather(lat, lon, 1700000000)
+        self.assertEqual(status_code, 200)
+
+        self.assertEqual(self.stub.request_counts, {GEOCODING_PATH: 2, ONECALL_PATH: 1, TIMEMACHINE_PATH: 1})
+
+    def test_error_injection(self):
+        self.stub.server.settings['error_rate'] = 1.0
+        status_code, data = self.weather_service.get_weather(10.0, 20.0)
+        self.assertEqual((status_code, data), (500, 'Injected error'))
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_cache_benchmark(self):
+        results = bench_cache.run([100], operations=50)
+        self.assertEqual(results[0]['entries'], 100)
+        self.assertIn('get_memory_us', results[0])
+
+    def test_process_response_benchmark(self):
+        results = bench_process_response.run(10)
+        self.assertIn('onecall_us', results)
+
+    def test_compare(self):
+        baseline = {'results': {'forecast': [{'requests_per_second': 100.0, 'p99_ms': 10.0}]}}
+        current = {'results': {'forecast': [{'requests_per_second': 80.0, 'p99_ms': 10.5}]}}
+        regressions = compare(baseline, current, threshold=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('requests_per_second', regressions[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from app import create_app
+from services.city_index import CityIndex
+
+class TestBackfillArchiveCommand(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(testing=True)
+        self.temp_dir = tempfile.mkdtemp()
+        self.weather_service = self.app.extensions['weather_service']
+        self.weather_service.city_index = CityIndex(['london'], array('d', [51.5074, -0.1278]))
+
+        # Recorded timemachine responses, the second one for another location
+        self.recordings_path = os.path.join(self.temp_dir, 'recordings.jsonl')
+        with open(self.recordings_path, 'w', encoding='utf-8') as recordings_file:
+            for day, lat, lon in ((1, 51.51, -0.13), (2, 51.51, -0.13), (5, 51.51, -0.13), (2, 48.85, 2.35)):
+                data_point = {'dt': 1704067200 + (day - 1) * 86400, 'temp': float(day), 'pressure': 1010, 'humidity': 50, 'clouds': 0}
+                recordings_file.write(json.dumps({'lat': lat, 'lon': lon, 'data': [data_point]}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        shutil.rmtree(self.app.config['CACHE_DIR'], ignore_errors=True)
+
+    def test_backfill_archive(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['backfill-archive', self.recordings_path, '--city', 'London',
+                                     '--start', '2024-01-01', '--end', '2024-01-02'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Archived 2 observations for London', result.output)
+
+        # Only observations of the range, recorded near the city, are archived
+        archive = self.weather_service.archive
+        self.assertEqual(archive.get(51.5074, -0.1278, 1704067200 + 86400).temp, 2.0)
+        self.assertIsNone(archive.get(51.5074, -0.1278, 1704067200 + 4 * 86400))
+
+    def test_unknown_city_is_rejected(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['backfill-archive', self.recordings_path, '--city', 'Atlantis',
+                                     '--start', '2024-01-01', '--end', '2024-01-02'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('Unknown city', result.output)
+
+if __name__ == '__main__':
+    unittest.main()
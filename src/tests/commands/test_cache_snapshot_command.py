@@ -0,0 +1,33 @@
+import unittest
+import os
+import shutil
+import tempfile
+from app import create_app
+from services.cache_snapshot import read_snapshot
+
+class TestSnapshotCacheCommand(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(testing=True)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        shutil.rmtree(self.app.config['CACHE_DIR'], ignore_errors=True)
+
+    def test_snapshot_cache(self):
+        self.app.extensions['weather_service'].geocoding_cache.set('london', [51.5, -0.12])
+        output = os.path.join(self.temp_dir, 'cache.snapshot')
+
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['snapshot-cache', '--output', output])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(f'Wrote 1 cache entries to {output}', result.output)
+        self.assertEqual([key for key, _, _ in read_snapshot(output)['geocoding']], ['london'])
+
+    def test_output_is_required(self):
+        result = self.app.test_cli_runner().invoke(args=['snapshot-cache'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('CACHE_SNAPSHOT_PATH', result.output)
+
+if __name__ == '__main__':
+    unittest.main()
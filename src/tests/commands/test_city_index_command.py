@@ -0,0 +1,34 @@
+import unittest
+import os
+import shutil
+import tempfile
+from app import create_app
+from services.city_index import CityIndex
+
+class TestBuildCityIndexCommand(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(testing=True)
+        self.temp_dir = tempfile.mkdtemp()
+        self.gazetteer_path = os.path.join(self.temp_dir, 'cities.txt')
+        with open(self.gazetteer_path, 'w', encoding='utf-8') as gazetteer_file:
+            row = ['2988507', 'Paris', 'Paris', '', '48.85341', '2.3488', 'P', 'PPLC', 'FR'] + [''] * 5 + ['2138551']
+            gazetteer_file.write('\t'.join(row) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_build_city_index(self):
+        index_path = os.path.join(self.temp_dir, 'cities.idx')
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['build-city-index', self.gazetteer_path, '--output', index_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Indexed 2 names', result.output)
+        self.assertEqual(CityIndex.load(index_path).lookup('paris'), (48.85341, 2.3488))
+
+    def test_output_is_required(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['build-city-index', self.gazetteer_path])
+        self.assertNotEqual(result.exit_code, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,8 @@ import unittest
 from flask_testing import TestCase
 from unittest.mock import patch
 from app import create_app
-from services.weather_service import WeatherService
+from services.weather_service import UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError, WeatherService
+from services.forecast_record import ForecastRecord
 from utils.config import Config
 import os
 import yaml
@@ -35,6 +36,44 @@ class TestForecast(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'sunny', response.data)
 
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_forecast_record_is_formatted(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, ForecastRecord(dt=1700000000, temp=12.3, pressure=1013, humidity=73, clouds=90))
+
+        response = self.client.get('/forecast/London/', headers=self.get_auth_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {'temperature': '12.3C', 'pressure': '1013hPa', 'humidity': '73%', 'clouds': '90%'})
+
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    @patch.object(WeatherService, 'time_to_live')
+    def test_forecast_conditional_get(self, mock_time_to_live, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, ForecastRecord(dt=1700000000, temp=12.3, pressure=1013, humidity=73, clouds=90))
+        mock_time_to_live.return_value = 7
+
+        response = self.client.get('/forecast/London/', headers=self.get_auth_headers())
+        self.assertEqual(response.headers['Cache-Control'], 'private, max-age=7')
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        # A client holding the current response gets an empty 304 with the same validators
+        headers = dict(self.get_auth_headers(), **{'If-None-Match': etag})
+        response = self.client.get('/forecast/London/', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # A changed record gets a new ETag and a full response
+        mock_get_weather.return_value = (200, ForecastRecord(dt=1700003600, temp=11.0, pressure=1013, humidity=73, clouds=90))
+        mock_time_to_live.return_value = 0
+        response = self.client.get('/forecast/London/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+
     @patch.object(WeatherService, 'convert_city_to_coordinates')
     def test_forecast_invalid_city(self, mock_convert_city):
         auth_headers = self.get_auth_headers()
@@ -44,6 +83,15 @@ class TestForecast(TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertIn(b'city_not_found', response.data)
 
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    def test_forecast_geocoding_unavailable(self, mock_convert_city):
+        # An unreachable geocoding API is answered like an unreachable weather API
+        mock_convert_city.side_effect = GeocodingUnavailableError("Read timed out")
+
+        response = self.client.get('/forecast/London/', headers=self.get_auth_headers())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json, UPSTREAM_UNAVAILABLE_MESSAGE)
+
     @patch.object(WeatherService, 'convert_city_to_coordinates')
     def test_forecast_invalid_date_format(self, mock_convert_city):
         auth_headers = self.get_auth_headers()
@@ -53,5 +101,74 @@ class TestForecast(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn(b'invalid_date_format', response.data)
 
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_forecast_date_formats(self, mock_get_weather, mock_convert_city):
+        auth_headers = self.get_auth_headers()
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+
+        # ISO-8601 dates, with or without an offset, and other formats the lenient parser accepts
+        for at in ('2024-01-01T12:00:00Z', '2024-01-01T13:00:00 01:00', '2024-01-01T12:00:00', '01/01/2024T12:00Z'):
+            response = self.client.get(f'/forecast/London/?at={at}', headers=auth_headers)
+            self.assertEqual(response.status_code, 200, at)
+            mock_get_weather.assert_called_with(51.5074, -0.1278, 1704110400)
+
+        response = self.client.get('/forecast/London/?at=1978-12-31T23:59:59Z', headers=auth_headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'1979', response.data)
+
+        response = self.client.get('/forecast/London/?at=2999-01-01', headers=auth_headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'4 days', response.data)
+
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_batch_forecast(self, mock_get_weather, mock_convert_city):
+        auth_headers = self.get_auth_headers()
+        mock_convert_city.side_effect = lambda city: (None, None) if city == 'unknowncity' else (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+
+        response = self.client.post('/forecast/batch', headers=auth_headers, json={'items': [
+            {'city': 'London'},
+            {'city': 'London', 'at': '2024-01-01T12:00:00Z'},
+            {'city': 'unknowncity'},
+            {'city': 'London', 'at': 'invalid-date'}
+        ]})
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json['results']
+        self.assertEqual([result['status'] for result in results], [200, 200, 404, 400])
+        self.assertEqual(results[0]['body'], {'forecast': 'sunny'})
+        self.assertEqual(results[2]['body']['error_code'], 'city_not_found')
+        self.assertEqual(results[3]['body']['error_code'], 'invalid_date_format')
+        mock_get_weather.assert_any_call(51.5074, -0.1278, 1704110400)
+
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_batch_forecast_item_failure(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.side_effect = Exception("Test exception")
+
+        response = self.client.post('/forecast/batch', headers=self.get_auth_headers(), json={'items': [{'city': 'London'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['results'][0]['status'], 500)
+
+    def test_batch_forecast_invalid_body(self):
+        auth_headers = self.get_auth_headers()
+        for body in [{}, {'items': []}, {'items': [{'at': '2024-01-01'}]}, {'items': ['London']}]:
+            response = self.client.post('/forecast/batch', headers=auth_headers, json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(b'invalid_batch', response.data)
+
+        response = self.client.post('/forecast/batch', headers=auth_headers,
+                                    json={'items': [{'city': 'London'}] * 101})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'batch_too_large', response.data)
+
+    def test_batch_forecast_requires_auth(self):
+        response = self.client.post('/forecast/batch', json={'items': [{'city': 'London'}]})
+        self.assertEqual(response.status_code, 401)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from flask_testing import TestCase
+from unittest.mock import patch
+from app import create_app
+from services.weather_service import WeatherService
+from utils.config import Config
+import base64
+
+class TestMetricsRoute(TestCase):
+    def create_app(self):
+        return create_app(testing=True)
+
+    def get_auth_headers(self):
+        users = Config.get_instance().get_user_credentials()
+        username, password = next(iter(users.items()))
+        encoded_credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        return {'Authorization': f'Basic {encoded_credentials}'}
+
+    def test_metrics_format(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+
+        body = response.data.decode('utf-8')
+        for name in ('weather_http_request_duration_seconds', 'weather_http_requests_in_flight',
+                     'weather_upstream_request_duration_seconds', 'weather_cache_lookups_total',
+                     'weather_cache_entries', 'weather_cache_memory_bytes'):
+            self.assertIn(f"# TYPE {name} ", body)
+        self.assertIn('weather_cache_entries{cache="geocoding",tier="disk"} 0', body)
+
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_request_metrics(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+
+        self.client.get('/forecast/London/', headers=self.get_auth_headers())
+        self.client.get('/forecast/Paris/', headers=self.get_auth_headers())
+        self.client.get('/forecast/London/')
+        self.client.get('/missing')
+
+        body = self.client.get('/metrics').data.decode('utf-8')
+        self.assertIn('weather_http_request_duration_seconds_count{route="/forecast/<city>/",method="GET",status="200"} 2', body)
+        self.assertIn('weather_http_request_duration_seconds_count{route="/forecast/<city>/",method="GET",status="401"} 1', body)
+        self.assertIn('weather_http_request_duration_seconds_count{route="<unmatched>",method="GET",status="404"} 1', body)
+
+        # Only the scrape itself is still in flight.
+        self.assertIn('weather_http_requests_in_flight{route="/forecast/<city>/"} 0', body)
+        self.assertIn('weather_http_requests_in_flight{route="/metrics"} 1', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from flask_testing import TestCase
+from unittest.mock import patch
 from app import create_app
 import json
 
@@ -23,5 +24,15 @@ class TestPingRoute(TestCase):
         self.assertEqual(data['status'], 'ok')
         self.assertEqual(data['version'], '1.0.0')
 
+    def test_ping_route_while_warming_up(self):
+        """
+        Test that the /ping route reports the worker as not ready until cache warm-up has finished.
+        """
+        weather_service = self.app.extensions['weather_service']
+        with patch.object(weather_service, 'is_ready', return_value=False):
+            response = self.client.get('/ping/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json['status'], 'warming_up')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import shutil
+import tempfile
+from services.archive import HistoricalArchive
+from services.forecast_record import ForecastRecord
+
+class TestHistoricalArchive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive = HistoricalArchive(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_get_returns_observation_of_the_hour(self):
+        records = [ForecastRecord(1700000000 + hour * 3600, 10.5 + hour, 1013, 80, None) for hour in range(3)]
+        self.assertEqual(self.archive.add(51.5, -0.12, records), 3)
+
+        # Any time inside an archived hour is answered, keeping integer and missing values
+        self.assertEqual(self.archive.get(51.5, -0.12, 1700000000 + 3600 + 1800), records[1])
+        self.assertIsInstance(self.archive.get(51.5, -0.12, 1700000000).pressure, int)
+        self.assertIsNone(self.archive.get(51.5, -0.12, 1700000000).clouds)
+        self.assertIsNone(self.archive.get(51.5, -0.12, 1700000000 + 3 * 3600))
+        self.assertIsNone(self.archive.get(48.85, 2.35, 1700000000))
+
+    def test_partitions_by_location_and_month(self):
+        january, february = 1704067200, 1706745600
+        self.archive.add(51.5, -0.12, [ForecastRecord(january, 1.0), ForecastRecord(february, 2.0)])
+        location_dir = os.path.join(self.temp_dir, '+51.5000-0.1200')
+        self.assertTrue(os.path.exists(os.path.join(location_dir, '2024-01.wca')))
+        self.assertTrue(os.path.exists(os.path.join(location_dir, '2024-02.wca')))
+
+    def test_add_keeps_existing_observations(self):
+        self.archive.add(51.5, -0.12, [ForecastRecord(1700000000, 1.0)])
+        self.assertEqual(self.archive.get(51.5, -0.12, 1700000000).temp, 1.0)
+
+        # Archived observations are immutable; new ones are merged into a new file version
+        self.assertEqual(self.archive.add(51.5, -0.12, [ForecastRecord(1700000000, 9.0), ForecastRecord(1700003600, 2.0)]), 1)
+        self.assertEqual(self.archive.get(51.5, -0.12, 1700000000).temp, 1.0)
+        self.assertEqual(self.archive.get(51.5, -0.12, 1700003600).temp, 2.0)
+
+        # Another process sees the archived observations
+        self.assertEqual(HistoricalArchive(self.temp_dir).get(51.5, -0.12, 1700003600).temp, 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+import shutil
+import time
+import httpx
+from unittest.mock import patch
+from utils.config import Config
+from services.weather_service import GeocodingUnavailableError, WeatherService
+from services.async_weather_service import AsyncWeatherService
+
+class TestAsyncWeatherService(unittest.TestCase):
+    def setUp(self):
+        config = Config.get_instance()
+        config.load_app_config(testing=True)
+        app_config = dict(config.get_app_config(), HTTP_RETRY_BACKOFF=0)
+
+        # Start every test with empty caches
+        shutil.rmtree(app_config['CACHE_DIR'], ignore_errors=True)
+        self.weather_service = WeatherService(app_config)
+        self.async_weather_service = AsyncWeatherService(self.weather_service, app_config)
+        self.upstream_requests = []
+
+    def run_with_upstream(self, handler, coroutine_function):
+        # Run a coroutine with the upstream API replaced by a handler
+        async def run():
+            async def recording_handler(request):
+                self.upstream_requests.append(request)
+                await asyncio.sleep(0.05)
+                return handler(request)
+
+            self.async_weather_service._client = httpx.AsyncClient(transport=httpx.MockTransport(recording_handler))
+            self.async_weather_service._client_loop = asyncio.get_running_loop()
+            try:
+                return await coroutine_function()
+            finally:
+                await self.async_weather_service.aclose()
+        return asyncio.run(run())
+
+    def test_get_weather_success(self):
+        def handler(request):
+            return httpx.Response(200, json={'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}})
+
+        status_code, data = self.run_with_upstream(handler, lambda: self.async_weather_service.get_weather(51.5, -0.1))
+        self.assertEqual(status_code, 200)
+        self.assertEqual(data.to_dict()['temperature'], '15C')
+
+        # The result is cached for the synchronous service too
+        self.assertEqual(self.weather_service.get_weather(51.5, -0.1), (200, data))
+
+    def test_get_weather_api_error(self):
+        status_code, data = self.run_with_upstream(
+            lambda request: httpx.Response(500, json={'message': 'Server error'}),
+            lambda: self.async_weather_service.get_weather(51.5, -0.1)
+        )
+        self.assertEqual((status_code, data), (500, 'Server error'))
+        self.assertEqual(len(self.upstream_requests), 3, "5xx responses should be retried")
+
+    def test_concurrent_misses_share_one_fetch(self):
+        def handler(request):
+            return httpx.Response(200, json={'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}})
+
+        async def fetch_many():
+            return await asyncio.gather(*(self.async_weather_service.get_weather(51.5, -0.1) for _ in range(20)))
+
+        results = self.run_with_upstream(handler, fetch_many)
+        self.assertEqual(len(self.upstream_requests), 1)
+        self.assertEqual({status_code for status_code, _ in results}, {200})
+
+    def run_while_ticking(self, handler, coroutine_function, target, attribute):
+        # Run a coroutine with a method of the target slowed down as if waiting on a lock,
+        # counting how often the event loop ran other work meanwhile
+        method = getattr(target, attribute)
+        def slow_method(*args):
+            time.sleep(0.3)
+            return method(*args)
+
+        async def run_and_tick():
+            ticks = 0
+            task = asyncio.ensure_future(coroutine_function())
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return await task, ticks
+
+        with patch.object(target, attribute, side_effect=slow_method):
+            return self.run_with_upstream(handler, run_and_tick)
+
+    def test_store_work_does_not_block_the_loop(self):
+        # Cache lookups and writes waiting on a lock leave the event loop free for other requests
+        def handler(request):
+            if 'q' in request.url.params:
+                return httpx.Response(200, json=[{'lat': 51.5074, 'lon': -0.1278}])
+            return httpx.Response(200, json={'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}})
+
+        for target, attribute in ((self.weather_service, 'store_response'), (self.weather_service.cache, 'get_entry'),
+                                  (self.weather_service, 'nearby_entry')):
+            self.weather_service.cache.memory = type(self.weather_service.cache.memory)()
+            self.weather_service.cache.store.delete(self.weather_service.cache_key(51.5, -0.1, None))
+            (status_code, _), ticks = self.run_while_ticking(
+                handler, lambda: self.async_weather_service.get_weather(51.5, -0.1), target, attribute
+            )
+            self.assertEqual(status_code, 200)
+            self.assertGreater(ticks, 20, attribute)
+
+        for attribute in ('get', 'set'):
+            coordinates, ticks = self.run_while_ticking(
+                handler, lambda: self.async_weather_service.convert_city_to_coordinates(f'London{attribute}'),
+                self.weather_service.geocoding_cache, attribute
+            )
+            self.assertEqual(coordinates, (51.5074, -0.1278))
+            self.assertGreater(ticks, 20, attribute)
+
+    def test_convert_city_to_coordinates(self):
+        def handler(request):
+            self.assertEqual(request.url.params['q'], 'London')
+            return httpx.Response(200, json=[{'lat': 51.5074, 'lon': -0.1278}])
+
+        async def convert_twice():
+            first = await self.async_weather_service.convert_city_to_coordinates('London')
+            second = await self.async_weather_service.convert_city_to_coordinates('london')
+            return first, second
+
+        self.assertEqual(self.run_with_upstream(handler, convert_twice), ((51.5074, -0.1278), (51.5074, -0.1278)))
+        self.assertEqual(len(self.upstream_requests), 1)
+
+    def test_convert_city_to_coordinates_failure(self):
+        coordinates = self.run_with_upstream(
+            lambda request: httpx.Response(200, json=[]),
+            lambda: self.async_weather_service.convert_city_to_coordinates('UnknownCity')
+        )
+        self.assertEqual(coordinates, (None, None))
+
+    def test_convert_city_to_coordinates_unavailable(self):
+        def handler(request):
+            raise httpx.ConnectTimeout("Connection timed out")
+
+        with self.assertRaises(GeocodingUnavailableError):
+            self.run_with_upstream(handler, lambda: self.async_weather_service.convert_city_to_coordinates('London'))
+
+if __name__ == '__main__':
+    unittest.main()
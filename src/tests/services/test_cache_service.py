@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch
 import os
 import json
+import sqlite3
 from services.cache_service import CacheService
 import time
 
@@ -52,14 +53,113 @@ class TestCacheService(unittest.TestCase):
         self.assertEqual(value, 'value', "Cache values should persist between instances")
 
     def test_cache_file_structure(self):
-        # Test the structure of the cache file
+        # Test the structure of the cache database
         self.cache_service.set('key1', 'value1')
-        with open(os.path.join(self.temp_cache_dir, 'cache.json'), 'r') as file:
-            cache_content = json.load(file)
-        self.assertIn('key1', cache_content)
-        self.assertIsInstance(cache_content['key1'], dict)
-        self.assertIn('value', cache_content['key1'])
-        self.assertIn('timestamp', cache_content['key1'])
+        connection = sqlite3.connect(os.path.join(self.temp_cache_dir, 'cache.db'))
+        row = connection.execute("SELECT value, timestamp FROM cache WHERE key = ?", ('key1',)).fetchone()
+        connection.close()
+        self.assertIsNotNone(row)
+        self.assertEqual(json.loads(row[0]), 'value1')
+        self.assertIsInstance(row[1], float)
+
+    def test_legacy_cache_migration(self):
+        # Test that entries of a legacy cache.json file are imported into the database
+        legacy_file = os.path.join(self.temp_cache_dir, 'cache.json')
+        with open(legacy_file, 'w') as file:
+            json.dump({
+                'fresh_key': {'value': {'temperature': '15C'}, 'timestamp': time.time()},
+                'stale_key': {'value': 'old', 'timestamp': time.time() - 60}
+            }, file)
+
+        migrated_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2)
+        self.assertEqual(migrated_service.get('fresh_key'), {'temperature': '15C'})
+        self.assertIsNone(migrated_service.get('stale_key'), "Migrated entries should keep their timestamps")
+        self.assertFalse(os.path.exists(legacy_file))
+        self.assertTrue(os.path.exists(legacy_file + '.migrated'))
+
+    def test_tier_counters(self):
+        # Test that hits are served from memory and disk hits are promoted
+        self.cache_service.set('key', 'value')
+        self.cache_service.get('key')
+        self.cache_service.get('missing')
+
+        new_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2)
+        new_cache_service.get('key')
+        new_cache_service.get('key')
+
+        self.assertEqual(self.cache_service.get_stats()['memory_hits'], 1)
+        self.assertEqual(self.cache_service.get_stats()['misses'], 1)
+        stats = new_cache_service.get_stats()
+        self.assertEqual(stats['disk_hits'], 1)
+        self.assertEqual(stats['memory_hits'], 1)
+        self.assertEqual(stats['memory_entries'], 1)
+
+    def test_memory_tier_sees_newer_disk_value(self):
+        # Test that an expired memory entry falls through to a newer persistent value
+        other_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2)
+        self.cache_service.set('key', 'old')
+        time.sleep(2.1)
+        other_cache_service.set('key', 'new')
+        self.assertEqual(self.cache_service.get('key'), 'new')
+
+    def test_stale_entries(self):
+        # Test that expired entries are served as stale until the stale period ends
+        stale_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=1, stale_seconds=2)
+        stale_cache_service.set('key', 'value')
+        time.sleep(1.1)
+
+        self.assertIsNone(stale_cache_service.get('key'), "Stale values should not be returned by get")
+        value, age = stale_cache_service.get_entry('key')
+        self.assertEqual(value, 'value')
+        self.assertGreaterEqual(age, 1)
+        self.assertEqual(stale_cache_service.get_stats()['stale_hits'], 2)
+
+        time.sleep(2)
+        self.assertIsNone(stale_cache_service.get_entry('key'))
+        self.assertEqual(stale_cache_service.get_stats()['expirations'], 1)
+
+    def test_preload(self):
+        # Test that recent entries are loaded into the memory tier of a new instance
+        self.cache_service.set('key1', 'value1')
+        self.cache_service.set('key2', 'value2')
+        new_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2)
+        self.assertEqual(new_cache_service.preload(), 2)
+        self.assertEqual(new_cache_service.get('key1'), 'value1')
+        self.assertEqual(new_cache_service.get_stats()['memory_hits'], 1)
+
+    def test_sweep(self):
+        # Test that sweeps remove expired entries never read again, and evict beyond the bounds
+        bounded_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2, max_entries=2)
+        bounded_cache_service.set('expired', 'value')
+        time.sleep(2.1)
+        for key in ('a', 'b', 'c'):
+            bounded_cache_service.set(key, 'value')
+            time.sleep(0.01)
+        bounded_cache_service.get('a')
+
+        self.assertEqual(bounded_cache_service.sweep(), (1, 1))
+        self.assertEqual(len(bounded_cache_service.store), 2)
+        self.assertIsNone(bounded_cache_service.store.get('b'))
+        self.assertIsNotNone(bounded_cache_service.store.get('a'))
+        self.assertEqual(bounded_cache_service.get_stats()['disk_evictions'], 1)
+        self.assertEqual(bounded_cache_service.sweep(), (0, 0))
+
+    def test_sweep_retention(self):
+        # Test that entries past their lifetime are kept for the retention period, or while asked to
+        keep_expired = [True]
+        retaining_cache_service = CacheService(cache_dir=self.temp_cache_dir, expiry_seconds=2, retention_seconds=60,
+                                               keep_expired=lambda: keep_expired[0])
+        retaining_cache_service.set('key', 'value')
+        with patch('time.time', return_value=time.time() + 30):
+            self.assertEqual(retaining_cache_service.sweep(), (0, 0))
+        with patch('time.time', return_value=time.time() + 120):
+            self.assertEqual(retaining_cache_service.sweep(), (0, 0))
+            keep_expired[0] = False
+            self.assertEqual(retaining_cache_service.sweep(), (1, 0))
+
+            # The value left in memory is still served when asked for, however old
+            self.assertEqual(retaining_cache_service.get_entry('key', float('inf'))[0], 'value')
+            self.assertIsNone(retaining_cache_service.get_entry('key'))
 
     # Additional tests can be added as needed
 
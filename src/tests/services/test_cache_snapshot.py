@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch, Mock
+import os
+import shutil
+import tempfile
+from utils.config import Config
+from services.cache_snapshot import read_snapshot, write_snapshot
+from services.weather_service import WeatherService
+
+class TestCacheSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.config = Config.get_instance()
+        self.config.load_app_config(testing=True)
+        self.temp_dir = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.temp_dir, 'cache.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        sections = {
+            'cache': [('51.5,-0.12,None', b'\x01binary', 1700000000.5)],
+            'geocoding': [('london', '[51.5, -0.12]', 1700000001.0)],
+            'empty': []
+        }
+        self.assertEqual(write_snapshot(self.snapshot_path, sections), 2)
+        self.assertEqual(read_snapshot(self.snapshot_path), sections)
+
+    def test_corrupt_snapshot_is_rejected(self):
+        write_snapshot(self.snapshot_path, {'cache': [('key', 'value', 1700000000.0)]})
+        with open(self.snapshot_path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+        for corrupt in (data[:-3], b'XXXX' + data[4:]):
+            with open(self.snapshot_path, 'wb') as snapshot_file:
+                snapshot_file.write(corrupt)
+            with self.assertRaises(ValueError):
+                read_snapshot(self.snapshot_path)
+
+    @patch('requests.Session.get')
+    def test_new_instance_starts_from_snapshot(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+        config = dict(self.config.get_app_config(), CACHE_DIR=os.path.join(self.temp_dir, 'old'),
+                      CACHE_SNAPSHOT_PATH=self.snapshot_path)
+        old_service = WeatherService(config)
+        status_code, data = old_service.get_weather(51.5, -0.12)
+        old_service.geocoding_cache.set('london', [51.5, -0.12])
+        self.assertEqual(old_service.snapshot(), 2)
+
+        # An instance with an empty cache directory serves the snapshot without calling upstream
+        new_service = WeatherService(dict(config, CACHE_DIR=os.path.join(self.temp_dir, 'new')))
+        self.assertEqual(new_service.get_weather(51.5, -0.12), (200, data))
+        self.assertEqual(new_service.geocoding_cache.get('london'), [51.5, -0.12])
+        self.assertEqual(mock_get.call_count, 1)
+
+        # An unreadable snapshot is ignored
+        with open(self.snapshot_path, 'wb') as snapshot_file:
+            snapshot_file.write(b'garbage')
+        self.assertEqual(new_service.restore_snapshot(self.snapshot_path), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sqlite3
+import shutil
+import tempfile
+import threading
+from services.cache_store import SQLiteCacheStore
+
+class TestSQLiteCacheStore(unittest.TestCase):
+    def setUp(self):
+        # Use a temporary directory for the database file
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = SQLiteCacheStore(os.path.join(self.temp_dir, 'cache.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_set_and_get(self):
+        self.store.set('key', 'value', 100.0)
+        self.assertEqual(self.store.get('key'), ('value', 100.0))
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_delete_only_matching_timestamp(self):
+        # An entry rewritten since it was read must not be deleted
+        self.store.set('key', 'new', 200.0)
+        self.store.delete('key', 100.0)
+        self.assertEqual(self.store.get('key'), ('new', 200.0))
+        self.store.delete('key', 200.0)
+        self.assertIsNone(self.store.get('key'))
+
+    def test_import_keeps_newer_entries(self):
+        self.store.set('key', 'newer', 200.0)
+        self.store.import_entries([('key', 'older', 100.0), ('other', 'value', 100.0)])
+        self.assertEqual(self.store.get('key'), ('newer', 200.0))
+        self.assertEqual(self.store.get('other'), ('value', 100.0))
+        self.assertEqual(len(self.store), 2)
+
+    def test_delete_expired(self):
+        self.store.set('old', 'value', 100.0)
+        self.store.set('new', 'value', 200.0)
+        self.assertEqual(self.store.delete_expired(150.0), 1)
+        self.assertIsNone(self.store.get('old'))
+        self.assertEqual(self.store.get('new'), ('value', 200.0))
+
+    def test_evict_least_recently_used(self):
+        # Entries read recently survive eviction, whatever their age
+        for index, key in enumerate(('a', 'b', 'c', 'd')):
+            self.store.set(key, 'x' * 10, 100.0 + index)
+        self.store.touch(['a'], 200.0)
+
+        self.assertEqual(self.store.evict(max_entries=3), 1)
+        self.assertIsNone(self.store.get('b'))
+        self.assertEqual(self.store.evict(max_bytes=15), 2)
+        self.assertEqual([key for key in 'abcd' if self.store.get(key)], ['a'])
+        self.assertEqual(self.store.evict(max_entries=1, max_bytes=10), 0)
+
+    def test_upgrades_older_databases(self):
+        # Entries of a database without access times are kept, and evicted first
+        db_path = os.path.join(self.temp_dir, 'old.db')
+        connection = sqlite3.connect(db_path)
+        connection.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, timestamp REAL NOT NULL)")
+        connection.execute("INSERT INTO cache VALUES ('old', 'value', 300.0)")
+        connection.commit()
+        connection.close()
+
+        store = SQLiteCacheStore(db_path)
+        store.set('new', 'value', 100.0)
+        self.assertEqual(store.get('old'), ('value', 300.0))
+        self.assertEqual(store.evict(max_entries=1), 1)
+        self.assertIsNone(store.get('old'))
+
+    def test_leases(self):
+        # Only one owner may hold an unexpired lease
+        self.assertTrue(self.store.acquire_lease('key', 'a', 110.0, 100.0))
+        self.assertFalse(self.store.acquire_lease('key', 'b', 115.0, 105.0))
+
+        # An expired lease can be taken over
+        self.assertTrue(self.store.acquire_lease('key', 'b', 130.0, 120.0))
+
+        # Releasing someone else's lease has no effect
+        self.store.release_lease('key', 'a')
+        self.assertFalse(self.store.acquire_lease('key', 'a', 135.0, 125.0))
+        self.store.release_lease('key', 'b')
+        self.assertTrue(self.store.acquire_lease('key', 'a', 135.0, 125.0))
+
+    def test_concurrent_writers(self):
+        # Writes from many threads must all land without corrupting the store
+        def write(thread_id):
+            for i in range(50):
+                self.store.set(f"{thread_id}-{i}", 'value', float(i))
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.store), 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import os
+import shutil
+import tempfile
+from services.city_index import CityIndex, normalize_city_name
+
+GAZETTEER_ROWS = [
+    # geonameid, name, asciiname, alternatenames, lat, lon, feature class, feature code, country, ..., population
+    ['2643743', 'London', 'London', 'Londres,Londra', '51.50853', '-0.12574', 'P', 'PPLC', 'GB', '', 'ENG', '', '', '', '8961989'],
+    ['6058560', 'London', 'London', '', '42.98339', '-81.23304', 'P', 'PPL', 'CA', '', '08', '', '', '', '346765'],
+    ['3448439', 'São Paulo', 'Sao Paulo', '', '-23.5475', '-46.63611', 'P', 'PPLA', 'BR', '', '27', '', '', '', '10021295'],
+    ['2634895', 'Thames', 'Thames', '', '51.5', '0.5', 'H', 'STM', 'GB', '', '', '', '', '', '0'],
+]
+
+class TestCityIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.gazetteer_path = os.path.join(self.temp_dir, 'cities.txt')
+        with open(self.gazetteer_path, 'w', encoding='utf-8') as gazetteer_file:
+            for row in GAZETTEER_ROWS:
+                gazetteer_file.write('\t'.join(row + ['', '', '', '']) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_normalize_city_name(self):
+        self.assertEqual(normalize_city_name('  São   Paulo , BR '), 'sao paulo,br')
+        self.assertEqual(normalize_city_name('LONDON'), 'london')
+
+    def test_most_populous_place_wins(self):
+        city_index = CityIndex.build_from_gazetteer(self.gazetteer_path)
+        self.assertEqual(city_index.lookup('London'), (51.50853, -0.12574))
+        self.assertEqual(city_index.lookup('london, ca'), (42.98339, -81.23304))
+        self.assertEqual(city_index.lookup('Sao Paulo'), (-23.5475, -46.63611))
+        self.assertIsNone(city_index.lookup('Thames'), "Only populated places should be indexed")
+        self.assertIsNone(city_index.lookup('Londres'))
+
+    def test_filters(self):
+        city_index = CityIndex.build_from_gazetteer(self.gazetteer_path, min_population=1000000,
+                                                    include_alternate_names=True)
+        self.assertEqual(city_index.lookup('Londres'), (51.50853, -0.12574))
+        self.assertIsNone(city_index.lookup('london,ca'))
+
+    def test_save_and_load(self):
+        index_path = os.path.join(self.temp_dir, 'cities.idx')
+        CityIndex.build_from_gazetteer(self.gazetteer_path).save(index_path)
+        city_index = CityIndex.load(index_path)
+        self.assertEqual(len(city_index), 5)
+        self.assertEqual(city_index.lookup('são paulo,br'), (-23.5475, -46.63611))
+
+    def test_load_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            CityIndex.load(self.gazetteer_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import base64
+import hashlib
+import os
+import shutil
+import signal
+import tempfile
+import time
+from unittest.mock import patch
+from services.credential_store import CredentialStore
+
+def basic_header(username, password):
+    return 'Basic ' + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+class TestCredentialStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.users_path = os.path.join(self.temp_dir, 'users.yaml')
+        self.write_users('alice: "secret"\nbob: "sha256:' + hashlib.sha256(b'hunter2').hexdigest() + '"\n')
+        self.store = CredentialStore(self.users_path, check_interval_seconds=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write_users(self, text):
+        with open(self.users_path, 'w') as users_file:
+            users_file.write(text)
+
+    def test_verify_authorization(self):
+        self.assertEqual(self.store.verify_authorization(basic_header('alice', 'secret')), 'alice')
+        self.assertEqual(self.store.verify_authorization(basic_header('bob', 'hunter2')), 'bob')
+        self.assertIsNone(self.store.verify_authorization(basic_header('alice', 'wrong')))
+        self.assertIsNone(self.store.verify_authorization(basic_header('mallory', 'secret')))
+        self.assertIsNone(self.store.verify_authorization('Bearer token'))
+        self.assertIsNone(self.store.verify_authorization('Basic not-base64!'))
+        self.assertIsNone(self.store.verify_authorization(None))
+
+    def test_verified_headers_are_remembered(self):
+        header = basic_header('alice', 'secret')
+        with patch.object(CredentialStore, 'verify', wraps=self.store.verify) as mock_verify:
+            for _ in range(3):
+                self.assertEqual(self.store.verify_authorization(header), 'alice')
+            self.assertEqual(mock_verify.call_count, 1)
+
+            # Failed attempts are never remembered
+            for _ in range(2):
+                self.store.verify_authorization(basic_header('alice', 'wrong'))
+            self.assertEqual(mock_verify.call_count, 3)
+
+    def test_reloads_when_the_file_changes(self):
+        header = basic_header('alice', 'secret')
+        self.assertEqual(self.store.verify_authorization(header), 'alice')
+
+        # The change is picked up at the next check, and remembered headers are forgotten
+        self.write_users('carol: "new"\n')
+        self.store._next_check = 0
+        self.assertIsNone(self.store.verify_authorization(header))
+        self.assertEqual(self.store.verify_authorization(basic_header('carol', 'new')), 'carol')
+
+    def test_keeps_users_when_the_file_is_invalid(self):
+        self.write_users('alice: [unclosed\n')
+        self.assertFalse(self.store.reload())
+        self.assertEqual(self.store.verify('alice', 'secret'), 'alice')
+
+    def test_reload_signal(self):
+        # Signals gunicorn handles itself are refused, others reload the file
+        for signal_name in ('SIGHUP', 'SIGUSR1', 'SIGNOPE'):
+            with self.assertRaises(ValueError):
+                self.store.install_reload_signal(signal_name)
+
+        previous_handler = signal.getsignal(signal.SIGALRM)
+        try:
+            self.store.install_reload_signal('SIGALRM')
+            self.write_users('carol: "new"\n')
+            os.kill(os.getpid(), signal.SIGALRM)
+            deadline = time.monotonic() + 5
+            while self.store.verify('carol', 'new') is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.store.verify('carol', 'new'), 'carol')
+        finally:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import json
+from services.forecast_record import ForecastRecord, ForecastSeries, decode_value, encode_value, to_json
+
+class TestForecastRecord(unittest.TestCase):
+    def test_to_dict_keeps_number_formatting(self):
+        record = ForecastRecord.from_data_point({'dt': 1700000000, 'temp': 12.3, 'pressure': 1013, 'humidity': 73})
+        self.assertEqual(record.to_dict(), {'temperature': '12.3C', 'pressure': '1013hPa', 'humidity': '73%', 'clouds': 'N/A%'})
+
+        record = ForecastRecord.from_data_point({'temp': 15, 'pressure': 1013.0, 'humidity': 'unknown', 'clouds': 0})
+        self.assertEqual(record.to_dict(), {'temperature': '15C', 'pressure': '1013.0hPa', 'humidity': 'N/A%', 'clouds': '0%'})
+
+    def test_binary_round_trip(self):
+        records = [
+            ForecastRecord(dt=1700000000, temp=-3.75, pressure=1013, humidity=73, clouds=90),
+            ForecastRecord(dt=1700000000, temp=15, pressure=1013.0, humidity=None, clouds=0),
+            ForecastRecord()
+        ]
+        for record in records:
+            encoded = record.encode()
+            self.assertEqual(len(encoded), ForecastRecord.LAYOUT.size)
+            decoded = ForecastRecord.decode(encoded)
+            self.assertEqual(decoded, record)
+            self.assertEqual(decoded.to_dict(), record.to_dict())
+
+    def test_cache_codec(self):
+        record = ForecastRecord(dt=1700000000, temp=12.3, pressure=1013, humidity=73, clouds=90)
+        self.assertEqual(decode_value(encode_value(record)), record)
+        self.assertEqual(decode_value(encode_value([51.5, -0.12])), [51.5, -0.12])
+
+        # Entries written as JSON by older releases are still readable
+        self.assertEqual(decode_value('{"temperature": "15C"}'), {'temperature': '15C'})
+
+    def test_series_lookup(self):
+        series = ForecastSeries.from_data_points([
+            {'dt': 7200, 'temp': 2}, {'dt': 0, 'temp': 0}, {'dt': 3600, 'temp': 1.5}, {'temp': 9}
+        ])
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.at(0).temp, 0)
+        self.assertEqual(series.at(3599).temp, 0)
+        self.assertEqual(series.at(3600).temp, 1.5)
+        self.assertEqual(series.at(10799).temp, 2)
+        self.assertIsNone(series.at(-1))
+        self.assertIsNone(series.at(10800))
+
+        decoded = decode_value(encode_value(series))
+        self.assertEqual(decoded, series)
+        self.assertEqual(decoded.at(5000).to_dict()['temperature'], '1.5C')
+
+    def test_to_json(self):
+        record = ForecastRecord(temp=12.3, pressure=1013, humidity=73, clouds=90)
+        self.assertEqual(
+            json.loads(json.dumps({'body': record}, default=to_json)),
+            {'body': {'temperature': '12.3C', 'pressure': '1013hPa', 'humidity': '73%', 'clouds': '90%'}}
+        )
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default=to_json)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import patch
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from services.http_client import HttpClient
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests
+    protocol_version = 'HTTP/1.1'
+    failures_left = 0
+    slow_left = 0
+
+    def do_GET(self):
+        if StubHandler.slow_left > 0:
+            StubHandler.slow_left -= 1
+            time.sleep(1)
+        if StubHandler.failures_left > 0:
+            StubHandler.failures_left -= 1
+            status, body = 503, b'{"message": "unavailable"}'
+        else:
+            status, body = 200, json.dumps({'path': self.path}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        StubHandler.failures_left = 0
+        StubHandler.slow_left = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data"
+        self.client = HttpClient(pool_size=2, retries=2, backoff_factor=0)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            response = self.client.get(self.url, params={'q': 'london'}, name='geocode')
+            self.assertEqual(response.json(), {'path': '/data?q=london'})
+
+        stats = self.client.get_stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['handshakes'], 1)
+        self.assertAlmostEqual(stats['reuse_ratio'], 0.8)
+        self.assertEqual(stats['latency']['geocode']['count'], 5)
+        self.assertEqual(stats['latency']['geocode']['buckets']['+Inf'], 5)
+
+    def test_retries_transient_errors(self):
+        StubHandler.failures_left = 2
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get_stats()['requests'], 3)
+
+    def test_gives_up_after_retries(self):
+        StubHandler.failures_left = 5
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+
+    def test_circuit_breaker_opens_and_probes(self):
+        client = HttpClient(retries=0, breaker_failure_threshold=2, breaker_reset_seconds=0.1)
+        StubHandler.failures_left = 2
+        self.assertEqual(client.get(self.url, name='onecall').status_code, 503)
+        self.assertEqual(client.get(self.url, name='onecall').status_code, 503)
+
+        # The open breaker refuses calls of its operation only
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.url, name='onecall')
+        self.assertEqual(client.get(self.url, name='geocode').status_code, 200)
+
+        # After the reset time a successful probe closes it again
+        time.sleep(0.1)
+        self.assertEqual(client.get(self.url, name='onecall').status_code, 200)
+        self.assertEqual(client.breaker('onecall').state, CircuitBreaker.CLOSED)
+        client.session.close()
+
+    def test_hedged_request_answers_first(self):
+        client = HttpClient(pool_size=2, hedge=True, hedge_min_delay=0.05)
+        for _ in range(HttpClient.HEDGE_MIN_SAMPLES):
+            client.attempt_latency.observe(0.001, 'onecall')
+
+        # The first attempt stalls, so the hedged one sent after 50ms answers
+        StubHandler.slow_left = 1
+        start = time.perf_counter()
+        self.assertEqual(client.get(self.url, name='onecall').status_code, 200)
+        self.assertLess(time.perf_counter() - start, 0.9)
+        self.assertEqual(client.hedges.value('onecall'), 1)
+        client.session.close()
+
+    def test_hedge_permit(self):
+        # A refused hedge leaves the first attempt to answer on its own
+        client = HttpClient(pool_size=2, hedge=True, hedge_min_delay=0.05, hedge_permit=lambda name: False)
+        for _ in range(HttpClient.HEDGE_MIN_SAMPLES):
+            client.attempt_latency.observe(0.001, 'onecall')
+
+        StubHandler.slow_left = 1
+        self.assertEqual(client.get(self.url, name='onecall').status_code, 200)
+        self.assertEqual(client.hedges.value('onecall'), 0)
+        client.session.close()
+
+    def test_busy_hedging_pool_is_skipped(self):
+        # Requests do not queue behind attempts holding every thread of the pool
+        client = HttpClient(pool_size=2, hedge=True, hedge_min_delay=0.05, hedge_pool_size=2)
+        for _ in range(HttpClient.HEDGE_MIN_SAMPLES):
+            client.attempt_latency.observe(0.001, 'onecall')
+        for _ in range(2):
+            client._hedge_slots.acquire()
+
+        with patch.object(client.hedge_executor, 'submit') as mock_submit:
+            self.assertEqual(client.get(self.url, name='onecall').status_code, 200)
+            mock_submit.assert_not_called()
+        client.session.close()
+
+    def test_hedge_delay_is_reused(self):
+        client = HttpClient(hedge=True, hedge_min_delay=0.01)
+        for _ in range(HttpClient.HEDGE_MIN_SAMPLES):
+            client.attempt_latency.observe(0.02, 'onecall')
+        delay = client.hedge_delay('onecall')
+
+        # New samples change the delay only once it is computed again, after the refresh interval
+        for _ in range(10 * HttpClient.HEDGE_MIN_SAMPLES):
+            client.attempt_latency.observe(2.0, 'onecall')
+        self.assertEqual(client.hedge_delay('onecall'), delay)
+        client._hedge_delays.clear()
+        self.assertGreater(client.hedge_delay('onecall'), delay)
+        client.session.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from services.memory_cache import MemoryCache
+
+class TestMemoryCache(unittest.TestCase):
+    def test_set_and_get(self):
+        cache = MemoryCache(max_entries=10, max_bytes=1000)
+        cache.set('key', 'value', 100.0, 5)
+        self.assertEqual(cache.get('key'), ('value', 100.0))
+        self.assertIsNone(cache.get('missing'))
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = MemoryCache(max_entries=2, max_bytes=1000)
+        cache.set('a', 1, 100.0, 1)
+        cache.set('b', 2, 100.0, 1)
+        cache.get('a')  # 'b' is now the least recently used entry
+        cache.set('c', 3, 100.0, 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_byte_budget(self):
+        cache = MemoryCache(max_entries=10, max_bytes=10)
+        cache.set('a', 1, 100.0, 6)
+        cache.set('b', 2, 100.0, 6)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size_bytes, 6)
+
+        # Entries larger than the whole budget are never held
+        cache.set('c', 3, 100.0, 11)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(len(cache), 1)
+
+    def test_delete_only_matching_timestamp(self):
+        cache = MemoryCache()
+        cache.set('key', 'value', 200.0, 5)
+        cache.delete('key', 100.0)
+        self.assertIsNotNone(cache.get('key'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.size_bytes, 0)
+
+if __name__ == '__main__':
+    unittest.main()
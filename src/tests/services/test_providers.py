@@ -0,0 +1,149 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from utils.config import Config
+from services.providers import FileProvider, ProviderRouter, ProvidersUnavailableError, WeatherProvider
+from services.weather_service import WeatherService
+
+class StubProvider(WeatherProvider):
+    def __init__(self, name, result=None, error=None, delay_seconds=0):
+        self.name = name
+        self.result = result
+        self.error = error
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+
+    def fetch(self, lat, lon, timestamp=None):
+        self.calls += 1
+        time.sleep(self.delay_seconds)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class TestWeatherProvider(unittest.TestCase):
+    def test_fetch_is_required(self):
+        class IncompleteProvider(WeatherProvider):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            IncompleteProvider()
+
+class TestFileProvider(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.recordings_path = os.path.join(self.temp_dir, 'recordings.json')
+        with open(self.recordings_path, 'w', encoding='utf-8') as recordings_file:
+            json.dump([
+                {'lat': 51.51, 'lon': -0.13, 'current': {'dt': 1704067200, 'temp': 5},
+                 'hourly': [{'dt': 1704070800, 'temp': 6}]},
+                {'lat': 51.5, 'lon': -0.12, 'data': [{'dt': 1703980800, 'temp': 3}]}
+            ], recordings_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_fetch(self):
+        provider = FileProvider(self.recordings_path, radius_km=5)
+
+        status_code, data = provider.fetch(51.5074, -0.1278)
+        self.assertEqual((status_code, data['current']['temp'], len(data['hourly'])), (200, 5, 1))
+
+        # Times are answered from the data point of their hour, in any recording nearby
+        self.assertEqual(provider.fetch(51.5074, -0.1278, 1703980800 + 1800)[1]['data'], [{'dt': 1703980800, 'temp': 3}])
+        self.assertEqual(provider.fetch(51.5074, -0.1278, 1704070800)[1]['data'], [{'dt': 1704070800, 'temp': 6}])
+
+        self.assertEqual(provider.fetch(51.5074, -0.1278, 1600000000)[0], 404)
+        self.assertEqual(provider.fetch(48.85, 2.35)[0], 404)
+
+class TestProviderRouter(unittest.TestCase):
+    def test_failover(self):
+        primary = StubProvider('primary', error=ConnectionError('down'))
+        secondary = StubProvider('secondary', result=(500, 'Server error'))
+        tertiary = StubProvider('tertiary', result=(200, {'current': {}}))
+        router = ProviderRouter([primary, secondary, tertiary])
+
+        self.assertEqual(router.route(lambda provider: provider.fetch(1, 2)), (200, {'current': {}}))
+        self.assertEqual(router.wins.values(), {'tertiary': 1})
+        self.assertEqual(router.failures.values(), {'primary': 1})
+
+        # A healthy primary is the only provider called
+        router = ProviderRouter([tertiary, primary])
+        router.route(lambda provider: provider.fetch(1, 2))
+        self.assertEqual(primary.calls, 1)
+
+    def test_unhealthy_responses(self):
+        # Without a healthy response, the first listed provider that answered is returned
+        router = ProviderRouter([StubProvider('a', error=ConnectionError('down')),
+                                 StubProvider('b', result=(401, 'Invalid API key')),
+                                 StubProvider('c', result=(404, 'Not found'))])
+        self.assertEqual(router.route(lambda provider: provider.fetch(1, 2)), (401, 'Invalid API key'))
+
+        router = ProviderRouter([StubProvider('a', error=ConnectionError('down'))])
+        with self.assertRaises(ProvidersUnavailableError):
+            router.route(lambda provider: provider.fetch(1, 2))
+
+    def test_fastest_healthy_response_wins(self):
+        slow = StubProvider('slow', result=(200, 'slow'), delay_seconds=0.5)
+        failing = StubProvider('failing', result=(503, 'Unavailable'))
+        fast = StubProvider('fast', result=(200, 'fast'), delay_seconds=0.05)
+        router = ProviderRouter([slow, failing, fast], policy=ProviderRouter.FASTEST)
+
+        start = time.perf_counter()
+        self.assertEqual(router.route(lambda provider: provider.fetch(1, 2)), (200, 'fast'))
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+        async def fetch(provider):
+            await asyncio.sleep(provider.delay_seconds)
+            return provider.fetch(1, 2)
+        self.assertEqual(asyncio.run(router.route_async(fetch)), (200, 'fast'))
+
+    def test_busy_pool_fails_over_on_caller_thread(self):
+        slow = StubProvider('slow', result=(200, 'slow'), delay_seconds=0.3)
+        fast = StubProvider('fast', result=(200, 'fast'))
+        router = ProviderRouter([slow, fast], policy=ProviderRouter.FASTEST, pool_size=2)
+
+        threads = []
+        def fetch(provider):
+            threads.append(threading.current_thread())
+            return provider.fetch(1, 2)
+
+        # The slow loser still holds its slot, so the next fetch does not fan out
+        self.assertEqual(router.route(fetch), (200, 'fast'))
+        threads.clear()
+        self.assertEqual(router.route(fetch), (200, 'slow'))
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertEqual(router.skipped_fanouts.value('fastest'), 1)
+
+        # Once the loser finishes, its slot is free to fan out again
+        time.sleep(0.35)
+        self.assertEqual(router.route(fetch), (200, 'fast'))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ProviderRouter([StubProvider('a')], policy='random')
+
+class TestWeatherServiceProviders(TestFileProvider):
+    @patch('requests.Session.get')
+    def test_file_provider_backs_up_openweathermap(self, mock_get):
+        mock_get.side_effect = ConnectionError('down')
+        config = Config.get_instance()
+        config.load_app_config(testing=True)
+        shutil.rmtree(config.get_app_config()['CACHE_DIR'], ignore_errors=True)
+        weather_service = WeatherService(dict(
+            config.get_app_config(), WEATHER_PROVIDERS=['openweathermap', 'file'],
+            FILE_PROVIDER_PATH=self.recordings_path, HTTP_RETRIES=0
+        ))
+
+        status_code, data = weather_service.get_weather(51.5074, -0.1278)
+        self.assertEqual((status_code, data.temp), (200, 5))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(weather_service.providers.wins.values(), {'file': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from services.cache_store import SQLiteCacheStore
+from services.quota import QuotaManager
+
+class TestQuotaManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = SQLiteCacheStore(os.path.join(self.temp_dir, 'cache.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_bucket_is_shared_through_the_store(self):
+        quota = QuotaManager(self.store, calls_per_minute=0.6, burst=2, max_wait_seconds=0)
+        other_worker = QuotaManager(SQLiteCacheStore(self.store.db_path), calls_per_minute=0.6, burst=2, max_wait_seconds=0)
+
+        self.assertTrue(quota.acquire(QuotaManager.INTERACTIVE))
+        self.assertTrue(other_worker.acquire(QuotaManager.INTERACTIVE))
+        self.assertFalse(quota.acquire(QuotaManager.INTERACTIVE))
+        self.assertLess(other_worker.remaining(), 1)
+        self.assertEqual(quota.denials.value(QuotaManager.INTERACTIVE), 1)
+
+    def test_background_calls_leave_a_reserve(self):
+        quota = QuotaManager(self.store, calls_per_minute=0.6, burst=4, background_reserve=0.5)
+
+        # Background calls stop once half of the bucket is spent, interactive ones continue
+        self.assertTrue(quota.acquire(QuotaManager.BACKGROUND))
+        self.assertTrue(quota.acquire(QuotaManager.BACKGROUND))
+        self.assertFalse(quota.acquire(QuotaManager.BACKGROUND))
+        self.assertTrue(quota.acquire(QuotaManager.INTERACTIVE))
+
+    def test_interactive_calls_wait_for_a_token(self):
+        quota = QuotaManager(self.store, calls_per_minute=600, burst=1, max_wait_seconds=1)
+        self.assertTrue(quota.acquire(QuotaManager.INTERACTIVE))
+
+        start = time.monotonic()
+        self.assertTrue(quota.acquire(QuotaManager.INTERACTIVE))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_near_limit_and_exhaust(self):
+        quota = QuotaManager(self.store, calls_per_minute=0.6, burst=10, stale_reserve=0.2)
+        self.assertFalse(quota.near_limit())
+        quota.exhaust()
+        self.assertTrue(quota.near_limit())
+        self.assertFalse(quota.acquire(QuotaManager.BACKGROUND))
+
+if __name__ == '__main__':
+    unittest.main()
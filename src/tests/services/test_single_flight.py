@@ -0,0 +1,53 @@
+import unittest
+import threading
+import time
+from services.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+
+    def run_concurrently(self, function, count=8):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(self.single_flight.do('key', function))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_result(self):
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results, errors = self.run_concurrently(slow_fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(errors, [])
+
+    def test_errors_are_shared(self):
+        def failing_fetch():
+            time.sleep(0.2)
+            raise RuntimeError('upstream down')
+
+        results, errors = self.run_concurrently(failing_fetch, count=4)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+
+    def test_sequential_calls_run_again(self):
+        self.assertEqual(self.single_flight.do('key', lambda: 1), 1)
+        self.assertEqual(self.single_flight.do('key', lambda: 2), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from services.spatial import CoordinateGrid, SpatialIndex, haversine_km
+
+class TestSpatial(unittest.TestCase):
+    def test_haversine(self):
+        # London to Paris
+        self.assertAlmostEqual(haversine_km(51.5074, -0.1278, 48.8566, 2.3522), 343.5, delta=1)
+        self.assertEqual(haversine_km(10.0, 20.0, 10.0, 20.0), 0)
+
+    def test_grid_quantize(self):
+        grid = CoordinateGrid(1)
+        # Points a few metres apart share a cell
+        self.assertEqual(grid.quantize(51.50741, -0.12781), grid.quantize(51.50745, -0.12779))
+
+        # The centre of a cell is within the cell, and quantizing it again is stable
+        center = grid.quantize(51.5074, -0.1278)
+        self.assertLess(haversine_km(51.5074, -0.1278, *center), 1)
+        self.assertEqual(grid.quantize(*center), center)
+
+        # Cells keep their width in kilometres away from the equator
+        self.assertNotEqual(grid.quantize(70.0, 10.0), grid.quantize(70.0, 10.03))
+
+    def test_spatial_index(self):
+        index = SpatialIndex(5)
+        index.add(51.5074, -0.1278)
+        index.add(51.52, -0.10)
+        index.add(48.8566, 2.3522)
+        self.assertEqual(len(index), 3)
+
+        self.assertEqual(index.nearby(51.51, -0.12), [(51.5074, -0.1278), (51.52, -0.10)])
+        self.assertEqual(index.nearby(40.0, 0.0), [])
+
+        index.discard(51.5074, -0.1278)
+        self.assertEqual(index.nearby(51.51, -0.12), [(51.52, -0.10)])
+
+if __name__ == '__main__':
+    unittest.main()
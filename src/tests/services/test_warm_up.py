@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch, Mock
+import shutil
+from array import array
+from utils.config import Config
+from services.weather_service import WeatherService
+from services.city_index import CityIndex
+
+class TestCacheWarmer(unittest.TestCase):
+    def setUp(self):
+        self.config = Config.get_instance()
+        self.config.load_app_config(testing=True)
+        shutil.rmtree(self.config.get_app_config()['CACHE_DIR'], ignore_errors=True)
+
+    def create_service(self, **config):
+        config = dict(self.config.get_app_config(), WARMUP_CITIES=['London', 'Paris', 'Atlantis', 'london']) | config
+        weather_service = WeatherService(config)
+        weather_service.city_index = CityIndex(['london', 'paris'], array('d', [51.5, -0.12, 48.85, 2.35]))
+        return weather_service
+
+    def mock_upstream(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+
+    @patch('requests.Session.get')
+    def test_warm_fetches_each_location_once(self, mock_get):
+        self.mock_upstream(mock_get)
+        weather_service = self.create_service()
+
+        # Cities are resolved offline only; Atlantis is unknown
+        with patch.object(WeatherService, 'convert_city_to_coordinates',
+                          side_effect=lambda city: weather_service.lookup_city_offline(city.lower()) or (None, None)):
+            outcomes = weather_service.warmer.warm()
+            self.assertEqual(outcomes, {'fetched': 2, 'failed': 1})
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertEqual(weather_service.get_weather(51.5, -0.12)[0], 200)
+            self.assertEqual(mock_get.call_count, 2)
+
+            # A second warm-up finds every location cached
+            self.assertEqual(weather_service.warmer.warm(), {'cached': 2, 'failed': 1})
+            self.assertEqual(mock_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_warm_stays_within_the_call_budget(self, mock_get):
+        self.mock_upstream(mock_get)
+        weather_service = self.create_service(WARMUP_MAX_CALLS=1, WARMUP_CITIES=['London', 'Paris'])
+
+        self.assertEqual(weather_service.warmer.warm(), {'fetched': 1, 'over_budget': 1})
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('requests.Session.get')
+    def test_ready_once_warm_up_finished(self, mock_get):
+        self.mock_upstream(mock_get)
+        weather_service = self.create_service(WARMUP_CITIES=['London'])
+        self.assertFalse(weather_service.is_ready())
+
+        weather_service.start()
+        self.assertTrue(weather_service.warmer.ready.wait(5))
+        self.assertTrue(weather_service.is_ready())
+        self.assertEqual(mock_get.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
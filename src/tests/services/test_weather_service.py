@@ -1,8 +1,16 @@
 import unittest
 from unittest.mock import patch, Mock
 import json
+import requests
+import shutil
+import sys
+import threading
+import time
 from utils.config import Config
-from services.weather_service import WeatherService
+from services.weather_service import UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError, WeatherService
+from services.city_index import CityIndex
+from services.refresher import WarmRefresher
+from array import array
 
 class TestWeatherService(unittest.TestCase):
 
@@ -10,9 +18,12 @@ class TestWeatherService(unittest.TestCase):
         self.config = Config.get_instance()
         self.config.load_app_config(testing=True)
         self.config.load_user_credentials()
-        self.weather_service = WeatherService(self.config)
 
-    @patch('requests.get')
+        # Start every test with empty caches
+        shutil.rmtree(self.config.get_app_config()['CACHE_DIR'], ignore_errors=True)
+        self.weather_service = WeatherService(self.config.get_app_config())
+
+    @patch('requests.Session.get')
     def test_get_weather_success(self, mock_get):
         # Mock successful API response
         mock_get.return_value = Mock(status_code=200)
@@ -21,10 +32,13 @@ class TestWeatherService(unittest.TestCase):
         # Test get_weather method
         status_code, data = self.weather_service.get_weather(51.5074, -0.1278)
         self.assertEqual(status_code, 200)
-        self.assertIn('temperature', data)
-        self.assertIn('pressure', data)
+        self.assertEqual(data.to_dict(), {'temperature': '15C', 'pressure': '1013hPa', 'humidity': '73%', 'clouds': '90%'})
+
+        # The numeric record survives the binary round trip through the cache
+        self.weather_service.cache.memory = type(self.weather_service.cache.memory)()
+        self.assertEqual(self.weather_service.get_weather(51.5074, -0.1278), (200, data))
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_get_weather_api_error(self, mock_get):
         # Mock API error response
         mock_get.return_value = Mock(status_code=500)
@@ -36,7 +50,171 @@ class TestWeatherService(unittest.TestCase):
         self.assertEqual(data, 'Server error')  # Check if the data is the error message
 
 
-    @patch('services.weather_service.requests.get')
+    @patch('requests.Session.get')
+    def test_concurrent_misses_share_one_fetch(self, mock_get):
+        # Concurrent requests for the same key should reach the API only once
+        def slow_response(*args, **kwargs):
+            time.sleep(0.2)
+            response = Mock(status_code=200)
+            response.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+            return response
+        mock_get.side_effect = slow_response
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.weather_service.get_weather(10.0, 20.0)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual([status_code for status_code, _ in results], [200] * 5)
+
+    @patch('requests.Session.get')
+    def test_waits_for_lease_holder_in_other_process(self, mock_get):
+        # With cross-process single-flight, a worker waits for the lease holder's result
+        self.weather_service.cross_process_single_flight = True
+        cache_key = "10.0,20.0,None"
+        self.weather_service.cache.store.acquire_lease(cache_key, 'other-worker', time.time() + 5, time.time())
+        threading.Timer(0.2, lambda: self.weather_service.cache.set(cache_key, {'temperature': '15C'})).start()
+
+        status_code, data = self.weather_service.get_weather(10.0, 20.0)
+        self.assertEqual((status_code, data), (200, {'temperature': '15C'}))
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_stale_entry_is_refreshed_in_background(self, mock_get):
+        # A stale entry is returned immediately while a refresh runs in the background
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 20, 'pressure': 1000, 'humidity': 50, 'clouds': 0}}
+        self.weather_service.cache.stale_seconds = 60
+        cache_key = self.weather_service.cache_key(10.0, 20.0, None)
+        self.weather_service.cache.store.set(cache_key, json.dumps({'temperature': '15C'}), time.time() - 30)
+
+        status_code, data = self.weather_service.get_weather(10.0, 20.0)
+        self.assertEqual((status_code, data), (200, {'temperature': '15C'}))
+
+        self.weather_service.refresh_executor.shutdown(wait=True)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.weather_service.cache.get(cache_key).to_dict()['temperature'], '20C')
+
+    @patch('requests.Session.get')
+    def test_forecast_times_are_answered_from_hourly_series(self, mock_get):
+        # Any time inside the hourly window costs one onecall fetch per location
+        now = int(time.time())
+        hour = now - now % 3600
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {
+            'current': {'dt': now, 'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90},
+            'hourly': [{'dt': hour + step * 3600, 'temp': 10 + step, 'pressure': 1000, 'humidity': 50, 'clouds': 0}
+                       for step in range(48)]
+        }
+
+        status_code, data = self.weather_service.get_weather(10.0, 20.0, hour + 2 * 3600 + 1234)
+        self.assertEqual((status_code, data.to_dict()['temperature']), (200, '12C'))
+        status_code, data = self.weather_service.get_weather(10.0, 20.0, hour + 47 * 3600 + 59)
+        self.assertEqual((status_code, data.to_dict()['temperature']), (200, '57C'))
+        self.assertEqual(self.weather_service.get_weather(10.0, 20.0)[1].to_dict()['temperature'], '15C')
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Times outside the window still go to the timemachine endpoint
+        mock_get.return_value.json.return_value = {'data': [{'dt': 1700000000, 'temp': 5}]}
+        status_code, data = self.weather_service.get_weather(10.0, 20.0, 1700000000)
+        self.assertEqual(data.to_dict()['temperature'], '5C')
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertTrue(mock_get.call_args[0][0].endswith('/timemachine'))
+
+    @patch('requests.Session.get')
+    def test_coordinates_are_quantized(self, mock_get):
+        # Coordinates a few metres apart share one cache entry
+        weather_service = WeatherService(dict(self.config.get_app_config(), COORDINATE_GRID_KM=1))
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15}}
+
+        self.assertEqual(weather_service.get_weather(51.50741, -0.12781)[0], 200)
+        self.assertEqual(weather_service.get_weather(51.50745, -0.12779)[0], 200)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args[1]['params']['lat'], weather_service.grid.quantize(51.50741, -0.12781)[0])
+
+    @patch('requests.Session.get')
+    def test_nearby_entries_are_reused(self, mock_get):
+        # A fresh entry within the radius answers requests for other locations
+        weather_service = WeatherService(dict(self.config.get_app_config(), NEARBY_RADIUS_KM=5, CACHE_EXPIRY_SECONDS=600))
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15}}
+
+        status_code, data = weather_service.get_weather(51.5074, -0.1278)
+        self.assertEqual(weather_service.get_weather(51.52, -0.10), (200, data))
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Locations further away are fetched
+        weather_service.get_weather(48.8566, 2.3522)
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_warm_refresher_refreshes_hottest_locations(self):
+        refresher = WarmRefresher(self.weather_service, top_n=1, interval_seconds=5)
+        for _ in range(3):
+            refresher.record(10.0, 20.0)
+        refresher.record(30.0, 40.0)
+
+        with patch.object(self.weather_service, 'refresh_in_background') as mock_refresh:
+            self.assertEqual(refresher.refresh_once(), [(10.0, 20.0)])
+            mock_refresh.assert_called_once_with(10.0, 20.0, None)
+
+        # Fresh entries far from expiry are left alone
+        self.weather_service.cache.expiry_seconds = 600
+        self.weather_service.cache.set(self.weather_service.cache_key(10.0, 20.0, None), {'temperature': '15C'})
+        with patch.object(self.weather_service, 'refresh_in_background') as mock_refresh:
+            self.assertEqual(refresher.refresh_once(), [])
+            mock_refresh.assert_not_called()
+
+    def test_warm_refresher_records_while_refreshing(self):
+        # Requests recorded during a round must neither break it nor be lost
+        refresher = WarmRefresher(self.weather_service, top_n=5, interval_seconds=5)
+        refreshed = threading.Event()
+        recorded = [0] * 4
+        final_records = 1000
+
+        def record(thread_id):
+            while not refreshed.is_set():
+                refresher.record(float(thread_id), float(recorded[thread_id] % 5000))
+                recorded[thread_id] += 1
+
+            # Once the rounds are over, every thread counts the same location
+            for _ in range(final_records):
+                refresher.record(-1.0, -1.0)
+
+        # Switch threads often, so a round is interrupted by the recording threads
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        threads = [threading.Thread(target=record, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            with patch.object(self.weather_service, 'refresh_in_background'):
+                for _ in range(50):
+                    refresher.refresh_once()
+        finally:
+            refreshed.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(switch_interval)
+
+        # No increment of the shared location is lost, and only recorded locations are counted
+        counts = refresher.request_counts
+        self.assertEqual(counts.pop((-1.0, -1.0)), len(threads) * final_records)
+        self.assertTrue(all(0 <= lat < len(threads) and 0 <= lon < 5000 for lat, lon in counts))
+        self.assertTrue(all(count > 0 for count in counts.values()))
+        self.assertLessEqual(sum(counts.values()), sum(recorded))
+
+    def test_after_fork_replaces_process_state(self):
+        session, executor = self.weather_service.http.session, self.weather_service.refresh_executor
+        self.weather_service.after_fork()
+        self.assertIsNot(self.weather_service.http.session, session)
+        self.assertIsNot(self.weather_service.refresh_executor, executor)
+
+    @patch('requests.Session.get')
     def test_convert_city_to_coordinates_success(self, mock_get):
         # Mock successful geocoding API response
         mock_get.return_value = Mock(status_code=200)
@@ -47,7 +225,7 @@ class TestWeatherService(unittest.TestCase):
         self.assertEqual(lat, 51.5074)
         self.assertEqual(lon, -0.1278)
 
-    @patch('services.weather_service.requests.get')
+    @patch('requests.Session.get')
     def test_convert_city_to_coordinates_failure(self, mock_get):
         # Mock failed geocoding API response
         mock_get.return_value = Mock(status_code=404)
@@ -58,6 +236,142 @@ class TestWeatherService(unittest.TestCase):
         self.assertIsNone(lat)
         self.assertIsNone(lon)
 
+    @patch('requests.Session.get')
+    def test_convert_city_to_coordinates_unavailable(self, mock_get):
+        # Timeouts and an open circuit are reported as unavailable rather than as an unknown city
+        mock_get.side_effect = requests.exceptions.ReadTimeout("Read timed out")
+        weather_service = WeatherService(dict(self.config.get_app_config(), BREAKER_FAILURE_THRESHOLD=1))
+        for _ in range(2):
+            with self.assertRaises(GeocodingUnavailableError):
+                weather_service.convert_city_to_coordinates("London")
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_hedges_take_a_quota_token(self):
+        # Hedged weather attempts are paid for from the background share of the quota
+        weather_service = WeatherService(dict(self.config.get_app_config(), QUOTA_CALLS_PER_MINUTE=0.006, QUOTA_BURST=4))
+        self.assertIs(weather_service.http.hedge_permit.__func__, WeatherService.allow_hedge)
+        self.assertEqual([weather_service.allow_hedge('onecall') for _ in range(3)], [True, True, False])
+        self.assertTrue(weather_service.allow_hedge('geocode'))
+
+    @patch('requests.Session.get')
+    def test_convert_city_to_coordinates_is_cached(self, mock_get):
+        # Repeated lookups of the same city should be answered from the geocoding cache
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = [{'lat': 48.8534, 'lon': 2.3488}]
+
+        self.assertEqual(self.weather_service.convert_city_to_coordinates("Paris"), (48.8534, 2.3488))
+        self.assertEqual(self.weather_service.convert_city_to_coordinates(" paris "), (48.8534, 2.3488))
+        self.assertEqual(mock_get.call_count, 1)
+
+        # The cache survives a restart
+        restarted_service = WeatherService(self.config.get_app_config())
+        self.assertEqual(restarted_service.convert_city_to_coordinates("PARIS"), (48.8534, 2.3488))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('requests.Session.get')
+    def test_convert_city_to_coordinates_uses_city_index(self, mock_get):
+        # Cities in the offline index never reach the geocoding API
+        self.weather_service.city_index = CityIndex(['london'], array('d', [51.5, -0.12]))
+        self.assertEqual(self.weather_service.convert_city_to_coordinates("London"), (51.5, -0.12))
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_times_within_an_hour_share_a_cache_entry(self, mock_get):
+        # Requested times are rounded down to the hour before the cache lookup and the upstream call
+        self.weather_service.archive = None
+        timestamp = int(time.time()) // 3600 * 3600 - 2 * 24 * 3600
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'data': [{'dt': timestamp, 'temp': 9.5, 'pressure': 1001, 'humidity': 60, 'clouds': 20}]}
+
+        first = self.weather_service.get_weather(10.0, 20.0, timestamp + 59)
+        self.assertEqual(self.weather_service.get_weather(10.0, 20.0, timestamp + 3599), first)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args.kwargs['params']['dt'], timestamp)
+
+    @patch('requests.Session.get')
+    def test_past_observations_are_archived(self, mock_get):
+        # A past observation is fetched once, then served from the archive after the cache is emptied
+        timestamp = int(time.time()) // 3600 * 3600 - 2 * 24 * 3600
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'data': [{'dt': timestamp, 'temp': 9.5, 'pressure': 1001, 'humidity': 60, 'clouds': 20}]}
+
+        status_code, data = self.weather_service.get_weather(51.5074, -0.1278, timestamp)
+        self.assertEqual(status_code, 200)
+        cache_dir = self.config.get_app_config()['CACHE_DIR']
+        empty_cache_service = WeatherService(dict(
+            self.config.get_app_config(), CACHE_DIR=cache_dir + '/empty', ARCHIVE_DIR=cache_dir + '/archive'
+        ))
+        self.assertEqual(empty_cache_service.get_weather(51.5074, -0.1278, timestamp + 60), (200, data))
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Recent times are not final yet, so they are not archived
+        self.assertIsNone(self.weather_service.lookup_archive(51.5074, -0.1278, int(time.time())))
+
+    @patch('requests.Session.get')
+    def test_quota_serves_expired_entries_near_the_limit(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+        weather_service = WeatherService(dict(
+            self.config.get_app_config(), QUOTA_CALLS_PER_MINUTE=0.006, QUOTA_BURST=2, QUOTA_MAX_WAIT_SECONDS=0
+        ))
+        status_code, data = weather_service.get_weather(51.5074, -0.1278)
+        self.assertEqual(status_code, 200)
+
+        # Once the API reports its limit, expired entries are served instead of calling it
+        mock_get.return_value = Mock(status_code=429)
+        mock_get.return_value.json.return_value = {'message': 'Too many requests'}
+        self.assertEqual(weather_service.get_weather(48.8534, 2.3488), (429, 'Too many requests'))
+        weather_service.cache.memory = type(weather_service.cache.memory)()
+        with patch('time.time', return_value=time.time() + 3600):
+            self.assertEqual(weather_service.get_weather(51.5074, -0.1278), (200, data))
+
+            # Without a cached entry the request is refused without an upstream call
+            self.assertEqual(weather_service.get_weather(40.7128, -74.0060)[0], 429)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_sweeps_keep_expired_entries_near_the_limit(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+        weather_service = WeatherService(dict(
+            self.config.get_app_config(), QUOTA_CALLS_PER_MINUTE=0.006, QUOTA_BURST=2, QUOTA_MAX_WAIT_SECONDS=0,
+            CACHE_RETENTION_SECONDS=0
+        ))
+        status_code, data = weather_service.get_weather(51.5074, -0.1278)
+        weather_service.quota.exhaust()
+
+        # Near the limit, sweeps leave expired entries in the database for later requests
+        with patch('time.time', return_value=time.time() + 120):
+            self.assertEqual(weather_service.cache.sweep(), (0, 0))
+            self.assertEqual(weather_service.get_weather(51.5074, -0.1278), (200, data))
+
+            # An entry swept before the limit was reached is still served from memory
+            weather_service.cache.store.delete(weather_service.cache_key(51.5074, -0.1278, None), time.time() - 120)
+            self.assertEqual(weather_service.get_weather(51.5074, -0.1278), (200, data))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('requests.Session.get')
+    def test_failing_upstream_opens_the_circuit(self, mock_get):
+        # Timeouts are reported as unavailable, and once the breaker opens the API is no longer called
+        mock_get.side_effect = requests.exceptions.ReadTimeout("Read timed out")
+        weather_service = WeatherService(dict(self.config.get_app_config(), BREAKER_FAILURE_THRESHOLD=2))
+        for lat in (51.5, 48.8, 40.7):
+            self.assertEqual(weather_service.get_weather(lat, 0.0), (503, UPSTREAM_UNAVAILABLE_MESSAGE))
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_time_to_live(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {'current': {'temp': 15, 'pressure': 1013, 'humidity': 73, 'clouds': 90}}
+        self.assertEqual(self.weather_service.time_to_live(51.5074, -0.1278), 0)
+
+        # A freshly cached entry can be kept for the rest of its lifetime
+        self.weather_service.get_weather(51.5074, -0.1278)
+        expiry_seconds = self.weather_service.cache.expiry_seconds
+        self.assertIn(self.weather_service.time_to_live(51.5074, -0.1278), (expiry_seconds - 1, expiry_seconds))
+        with patch('time.time', return_value=time.time() + expiry_seconds):
+            self.assertEqual(self.weather_service.time_to_live(51.5074, -0.1278), 0)
+
     # Additional tests can be written to cover caching, error handling, etc.
 
 if __name__ == '__main__':
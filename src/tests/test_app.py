@@ -65,6 +65,21 @@ class TestApp(TestCase):
         self.assertEqual(self.app.config['BASE_URL'], 'http://test_base_url')
         self.assertEqual(self.app.config['GEOCODING_URL'], 'http://test_geocoding_url')
 
+    @patch.object(WeatherService, 'convert_city_to_coordinates')
+    @patch.object(WeatherService, 'get_weather')
+    def test_weather_service_is_shared(self, mock_get_weather, mock_convert_city):
+        """
+        Test that forecast requests reuse the application's WeatherService.
+        """
+        self.assertIsInstance(self.app.extensions['weather_service'], WeatherService)
+
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+        with patch.object(WeatherService, '__init__') as mock_init:
+            self.client.get('/forecast/London/', headers=self.get_auth_headers())
+            self.client.get('/forecast/Paris/', headers=self.get_auth_headers())
+            mock_init.assert_not_called()
+
     @patch.object(WeatherService, 'convert_city_to_coordinates')
     @patch.object(WeatherService, 'get_weather')
     def test_forecast_route(self, mock_get_weather, mock_convert_city):
@@ -105,8 +120,9 @@ class TestApp(TestCase):
         self.assertEqual(data['error'], "Cannot find city 'unknowncity'")
         self.assertEqual(data['error_code'], 'city_not_found')
 
+    @patch.object(WeatherService, 'convert_city_to_coordinates', return_value=(10.0, 20.0))
     @patch.object(WeatherService, 'get_weather')
-    def test_500_error_handler(self, mock_get_weather):
+    def test_500_error_handler(self, mock_get_weather, mock_convert_city):
         """
         Test the 500 error handler.
         """
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch, AsyncMock
+import asyncio
+import base64
+import httpx
+from asgi import create_asgi_app
+from services.async_weather_service import AsyncWeatherService
+from services.forecast_record import ForecastRecord
+from services.weather_service import UPSTREAM_UNAVAILABLE_MESSAGE, GeocodingUnavailableError
+from utils.config import Config
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self):
+        self.app = create_asgi_app(testing=True)
+        users = Config.get_instance().get_user_credentials()
+        username, password = next(iter(users.items()))
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        self.auth_headers = {'Authorization': f'Basic {credentials}'}
+
+    def request(self, method, url, **kwargs):
+        async def send():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+                return await client.request(method, url, **kwargs)
+        return asyncio.run(send())
+
+    def test_ping_route(self):
+        response = self.request('GET', '/ping/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'name': 'weatherservice', 'status': 'ok', 'version': '1.0.0'})
+
+    def test_404_error_handler(self):
+        response = self.request('GET', '/nonexistentroute/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error_code'], 'not_found')
+
+    def test_forecast_requires_auth(self):
+        response = self.request('GET', '/forecast/London/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response.headers)
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    @patch.object(AsyncWeatherService, 'get_weather', new_callable=AsyncMock)
+    def test_forecast_valid_city(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+
+        response = self.request('GET', '/forecast/London/?at=2024-01-01T12:00:00+00:00', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'forecast': 'sunny'})
+        mock_get_weather.assert_awaited_once_with(51.5074, -0.1278, 1704110400)
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    @patch.object(AsyncWeatherService, 'get_weather', new_callable=AsyncMock)
+    def test_forecast_conditional_get(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, ForecastRecord(dt=1700000000, temp=12.3, pressure=1013, humidity=73, clouds=90))
+
+        response = self.request('GET', '/forecast/London/', headers=self.auth_headers)
+        self.assertEqual(response.headers['cache-control'], 'no-cache')
+        etag = response.headers['etag']
+
+        response = self.request('GET', '/forecast/London/', headers=dict(self.auth_headers, **{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_native_routes_are_measured(self):
+        self.request('GET', '/forecast/London/')
+
+        body = self.request('GET', '/metrics').text
+        self.assertIn('weather_http_request_duration_seconds_count{route="/forecast/<city>/",method="GET",status="401"} 1', body)
+        self.assertIn('weather_http_requests_in_flight{route="/forecast/<city>/"} 0', body)
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    def test_forecast_invalid_city(self, mock_convert_city):
+        mock_convert_city.return_value = (None, None)
+
+        response = self.request('GET', '/forecast/unknowncity/', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': "Cannot find city 'unknowncity'", 'error_code': 'city_not_found'})
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    def test_forecast_geocoding_unavailable(self, mock_convert_city):
+        mock_convert_city.side_effect = GeocodingUnavailableError("Connection timed out")
+
+        response = self.request('GET', '/forecast/London/', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), UPSTREAM_UNAVAILABLE_MESSAGE)
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    def test_forecast_invalid_date_format(self, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+
+        response = self.request('GET', '/forecast/London/?at=invalid-date', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error_code'], 'invalid_date_format')
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    @patch.object(AsyncWeatherService, 'get_weather', new_callable=AsyncMock)
+    def test_500_error_handler(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.return_value = (51.5074, -0.1278)
+        mock_get_weather.side_effect = Exception("Test exception")
+
+        response = self.request('GET', '/forecast/somecity/', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'Something went wrong', 'error_code': 'internal_server_error'})
+
+    @patch.object(AsyncWeatherService, 'convert_city_to_coordinates', new_callable=AsyncMock)
+    @patch.object(AsyncWeatherService, 'get_weather', new_callable=AsyncMock)
+    def test_batch_forecast(self, mock_get_weather, mock_convert_city):
+        mock_convert_city.side_effect = lambda city: (None, None) if city == 'unknowncity' else (51.5074, -0.1278)
+        mock_get_weather.return_value = (200, {'forecast': 'sunny'})
+
+        response = self.request('POST', '/forecast/batch', headers=self.auth_headers, json={'items': [
+            {'city': 'London'}, {'city': 'unknowncity'}, {'city': 'London', 'at': 'invalid-date'}
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 404, 400])
+
+        response = self.request('POST', '/forecast/batch', headers=self.auth_headers, content=b'not json')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
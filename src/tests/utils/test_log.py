@@ -0,0 +1,64 @@
+import unittest
+import json
+import logging
+import queue
+from utils.log import AsyncQueueHandler, JsonFormatter, RedactingFormatter, SamplingFilter, redact
+
+class TestLog(unittest.TestCase):
+    def make_record(self, message, *args, **extra):
+        record = logging.LogRecord('WeatherService', logging.INFO, __file__, 1, message, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_redact(self):
+        self.assertEqual(
+            redact("https://api/onecall?lat=1&appid=secret123&units=metric"),
+            "https://api/onecall?lat=1&appid=***&units=metric"
+        )
+        self.assertEqual(redact("Authorization: Basic dXNlcjpwYXNz"), "Authorization: Basic ***")
+        self.assertEqual(redact("key is abcdef", secrets=('abcdef',)), "key is ***")
+        self.assertEqual(redact("Cache hit for key: 51.5,-0.1,None"), "Cache hit for key: 51.5,-0.1,None")
+
+    def test_json_formatter(self):
+        record = self.make_record("Request URL: %s", "http://api?appid=test_api_key", event='upstream_request')
+        entry = json.loads(JsonFormatter(secrets=('test_api_key',)).format(record))
+
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'WeatherService')
+        self.assertEqual(entry['message'], "Request URL: http://api?appid=***")
+        self.assertEqual(entry['event'], 'upstream_request')
+
+    def test_text_formatter(self):
+        record = self.make_record("Request URL: %s", "http://api?appid=abc")
+        self.assertTrue(RedactingFormatter().format(record).endswith(" - Request URL: http://api?appid=***"))
+
+    def test_sampling_filter(self):
+        sampling_filter = SamplingFilter({'cache_hit': 0.1, 'cache_set': 0})
+        kept = [sampling_filter.filter(self.make_record("hit", event='cache_hit')) for _ in range(100)]
+        self.assertEqual(sum(kept), 10)
+        self.assertFalse(sampling_filter.filter(self.make_record("set", event='cache_set')))
+        self.assertTrue(sampling_filter.filter(self.make_record("miss", event='cache_miss')))
+        self.assertTrue(sampling_filter.filter(self.make_record("plain")))
+
+    def test_queue_handler_defers_formatting(self):
+        handler = AsyncQueueHandler(queue.Queue(maxsize=2))
+
+        handler.handle(self.make_record("Cache hit for key: %s", "1,2,None"))
+        deferred = handler.queue.get_nowait()
+        self.assertEqual((deferred.msg, deferred.args), ("Cache hit for key: %s", ("1,2,None",)))
+
+        # Mutable arguments are formatted before they can change.
+        arguments = ['a']
+        handler.handle(self.make_record("Items: %s", arguments))
+        arguments.append('b')
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "Items: ['a']")
+
+    def test_queue_handler_drops_when_full(self):
+        handler = AsyncQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(self.make_record("first"))
+        handler.handle(self.make_record("second"))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "first")
+
+if __name__ == '__main__':
+    unittest.main()
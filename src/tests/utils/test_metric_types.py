@@ -0,0 +1,77 @@
+import unittest
+import threading
+from utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+class TestMetricTypes(unittest.TestCase):
+    def test_counter_across_threads(self):
+        counter = Counter()
+
+        def increment():
+            for _ in range(1000):
+                counter.inc('hits')
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Counts of exited threads are kept.
+        self.assertEqual(counter.value('hits'), 8000)
+        self.assertEqual(counter.value('misses'), 0)
+
+        counter.inc('hits', 5)
+        self.assertEqual(counter.values(), {'hits': 8005})
+
+    def test_gauge(self):
+        gauge = Gauge()
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(gauge.value(), 1)
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, 'onecall')
+
+        snapshot = histogram.snapshot('onecall')
+        self.assertEqual(snapshot['buckets'], {0.1: 2, 1.0: 3, '+Inf': 4})
+        self.assertEqual(snapshot['count'], 4)
+        self.assertAlmostEqual(snapshot['sum'], 2.65)
+        self.assertEqual(histogram.snapshot('geocode')['count'], 0)
+
+    def test_histogram_quantile(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        self.assertIsNone(histogram.quantile(0.95))
+        for value in [0.05] * 10 + [0.5] * 10:
+            histogram.observe(value)
+
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.1)
+        self.assertAlmostEqual(histogram.quantile(0.95), 0.1 + 0.9 * 0.9)
+        histogram.observe(5.0)
+        self.assertEqual(histogram.quantile(1.0), 1.0)
+
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        registry.counter('requests_total', "Requests.", ('route', 'status')).inc(('/a"b', 200))
+        registry.histogram('latency_seconds', "Latency.", buckets=(0.5,)).observe(0.25)
+        registry.register('entries', 'gauge', "Entries.", ('tier',), lambda: {'memory': 3})
+
+        self.assertEqual(registry.render(), (
+            '# HELP requests_total Requests.\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{route="/a\\"b",status="200"} 1\n'
+            '# HELP latency_seconds Latency.\n'
+            '# TYPE latency_seconds histogram\n'
+            'latency_seconds_bucket{le="0.5"} 1\n'
+            'latency_seconds_bucket{le="+Inf"} 1\n'
+            'latency_seconds_sum 0.25\n'
+            'latency_seconds_count 1\n'
+            '# HELP entries Entries.\n'
+            '# TYPE entries gauge\n'
+            'entries{tier="memory"} 3\n'
+        ))
+
+if __name__ == '__main__':
+    unittest.main()
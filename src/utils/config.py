@@ -49,10 +49,18 @@ class Config:
         """
         Load user credentials from a YAML file.
         """
-        users_config_path = os.path.join(self.root_dir, 'config', 'users.yaml')
-        with open(users_config_path, 'r') as users_file:
+        with open(self.get_user_credentials_path(), 'r') as users_file:
             self.users = yaml.safe_load(users_file)
 
+    def get_user_credentials_path(self):
+        """
+        Get the path of the user credentials file.
+
+        Returns:
+            str: The path in the WEATHER_USERS_FILE environment variable, or of 'config/users.yaml'.
+        """
+        return os.environ.get('WEATHER_USERS_FILE') or os.path.join(self.root_dir, 'config', 'users.yaml')
+
     def get_app_config(self):
         """
         Get the loaded application configuration.
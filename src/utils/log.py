@@ -0,0 +1,241 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+# Query string parameters and header values whose values are secrets.
+SECRET_PATTERN = re.compile(r'(?i)\b(appid|api_?key|token|password|authorization)([=:]\s*(?:basic\s+|bearer\s+)?)[^&\s,;"\']+')
+REDACTED = '***'
+
+# Attributes every LogRecord has; any other attribute was passed through 'extra' and is
+# written as a field of the JSON record.
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Events sampled when LOG_SAMPLE_RATES is not configured: one cache hit in a hundred is logged.
+DEFAULT_SAMPLE_RATES = {'cache_hit': 0.01}
+
+# Argument types safe to format later on the listener thread, because they cannot change.
+IMMUTABLE_TYPES = (str, int, float, bool, type(None), bytes)
+
+def redact(text, secrets=()):
+    """
+    Mask secrets in a log message.
+
+    Args:
+        text (str): The message.
+        secrets (tuple): Literal secrets, such as the configured API key, masked wherever they appear.
+
+    Returns:
+        str: The message with the value of every secret parameter masked.
+    """
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+    return SECRET_PATTERN.sub(rf'\1\2{REDACTED}', text)
+
+class RedactingFormatter(logging.Formatter):
+    def __init__(self, fmt=None, secrets=()):
+        """
+        Initialize the RedactingFormatter class, a text formatter that masks secrets.
+
+        Args:
+            fmt (str, optional): The format string. Defaults to '%(asctime)s - %(message)s'.
+            secrets (tuple): Literal secrets masked wherever they appear. Defaults to none.
+        """
+        super().__init__(fmt or '%(asctime)s - %(message)s')
+        self.secrets = tuple(secret for secret in secrets if secret)
+
+    def format(self, record):
+        """
+        Format a record and mask its secrets.
+
+        Args:
+            record (LogRecord): The record.
+
+        Returns:
+            str: The formatted record.
+        """
+        return redact(super().format(record), self.secrets)
+
+class JsonFormatter(RedactingFormatter):
+    def format(self, record):
+        """
+        Format a record as one line of JSON, with secrets masked.
+
+        Fields passed through 'extra', such as 'event', are added to the record.
+
+        Args:
+            record (LogRecord): The record.
+
+        Returns:
+            str: The JSON record.
+        """
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage(), self.secrets)
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = redact(value, self.secrets) if isinstance(value, str) else value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = redact(record.exc_text, self.secrets)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rates):
+        """
+        Initialize the SamplingFilter class with the share of records kept per event.
+
+        Records carry their event in the 'event' attribute, passed through 'extra'. Of
+        the records of a sampled event, one in every 1 / rate is kept, and the rate is
+        attached to it as 'sample_rate' so counts can be scaled back up.
+
+        Args:
+            sample_rates (dict): Event names mapped to the share of records kept, such as {'cache_hit': 0.01}.
+        """
+        super().__init__()
+        self.intervals = {event: max(1, round(1 / rate)) if rate > 0 else 0 for event, rate in sample_rates.items()}
+        self.rates = dict(sample_rates)
+        self.counters = {event: itertools.count() for event in sample_rates}
+
+    def filter(self, record):
+        """
+        Decide whether a record is kept.
+
+        Args:
+            record (LogRecord): The record.
+
+        Returns:
+            bool: True if the record is kept.
+        """
+        event = getattr(record, 'event', None)
+        interval = self.intervals.get(event)
+        if interval is None:
+            return True
+        if interval == 0:
+            return False
+
+        # Counting with itertools.count is atomic, so concurrent threads need no lock.
+        if next(self.counters[event]) % interval:
+            return False
+        record.sample_rate = self.rates[event]
+        return True
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        """
+        Initialize the AsyncQueueHandler class, which hands records to a listener thread.
+
+        Records are put on a bounded queue without blocking; when the queue is full the
+        record is dropped and counted rather than stalling the request that logged it.
+
+        Args:
+            log_queue (queue.Queue): The queue read by the listener.
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        Prepare a record for the queue, leaving formatting to the listener thread where possible.
+
+        Messages whose arguments are all immutable are formatted by the listener. Other
+        messages are formatted now, since their arguments may change before the listener
+        gets to them.
+
+        Args:
+            record (LogRecord): The record.
+
+        Returns:
+            LogRecord: The record to enqueue.
+        """
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Render the traceback now, so its frames are not kept alive on the queue.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """
+        Put a record on the queue, dropping it if the queue is full.
+
+        Args:
+            record (LogRecord): The prepared record.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# The handler installed by setup_logging, and the listener writing its records.
+_handler = None
+_listener = None
+_setup_lock = threading.Lock()
+
+def setup_logging(config):
+    """
+    Route the records of every logger through a queue to a background writer thread.
+
+    Logging calls then only create a record and put it on a queue; formatting, secret
+    redaction and writing to stderr happen on the listener thread. The listener is
+    restarted in the child after a fork. Calling this again has no effect.
+
+    Args:
+        config (Mapping): The application configuration: LOG_LEVEL ('INFO'), LOG_FORMAT
+            ('json' or 'text'), LOG_SAMPLE_RATES (event names mapped to the share of
+            records kept, DEFAULT_SAMPLE_RATES if not set) and LOG_QUEUE_SIZE (10000).
+    """
+    global _handler, _listener
+
+    with _setup_lock:
+        if _handler is not None:
+            return
+
+        formatter_class = JsonFormatter if config.get('LOG_FORMAT', 'json') == 'json' else RedactingFormatter
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter_class(secrets=(config.get('API_KEY'),)))
+
+        _handler = AsyncQueueHandler(queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000)))
+        _handler.addFilter(SamplingFilter(config.get('LOG_SAMPLE_RATES', DEFAULT_SAMPLE_RATES) or {}))
+
+        root_logger = logging.getLogger()
+        root_logger.setLevel(config.get('LOG_LEVEL', 'INFO'))
+        root_logger.addHandler(_handler)
+
+        _listener = logging.handlers.QueueListener(_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_restart_listener)
+
+def _stop_listener():
+    """
+    Write the queued records and stop the listener thread.
+    """
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def _restart_listener():
+    """
+    Start a listener in a forked child, whose copy of the parent's listener thread does not run.
+
+    The queue is replaced too, since the parent's listener may have held its lock when
+    the process forked.
+    """
+    if _listener is not None:
+        _handler.queue = _listener.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+        _listener._thread = None
+        _listener.start()
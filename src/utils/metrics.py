@@ -0,0 +1,385 @@
+import bisect
+import math
+import threading
+
+# Default latency buckets, in seconds.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _ThreadShards:
+    def __init__(self, new_cells, merge_cells):
+        """
+        Initialize the _ThreadShards class, the per-thread storage behind every metric.
+
+        Each thread updates its own dictionary of cells, keyed by label values, without
+        taking any lock; the cells of a label set are allocated once per thread and then
+        updated in place. Readers merge the cells of all threads. Cells of threads that
+        have exited are folded into a retired shard, so short-lived threads do not leak.
+
+        Args:
+            new_cells (callable): Returns the empty cells of one label set.
+            merge_cells (callable): Adds the cells given as second argument to the first.
+        """
+        self.new_cells = new_cells
+        self.merge_cells = merge_cells
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def cells(self, key):
+        """
+        Return the cells of a label set owned by the calling thread.
+
+        Args:
+            key (hashable): The label values.
+
+        Returns:
+            list: The mutable cells.
+        """
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+
+        cells = shard.get(key)
+        if cells is None:
+            cells = shard[key] = self.new_cells()
+        return cells
+
+    def merged(self):
+        """
+        Merge the cells of all threads.
+
+        Returns:
+            dict: Label values mapped to their merged cells.
+        """
+        with self._lock:
+            live_shards = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live_shards.append((thread, shard))
+                else:
+                    self._merge_shard(self._retired, shard)
+            self._shards = live_shards
+
+            merged = {}
+            self._merge_shard(merged, self._retired)
+            for _, shard in live_shards:
+                # Copying is atomic, so the owning thread may keep adding label sets.
+                self._merge_shard(merged, shard.copy())
+        return merged
+
+    def _merge_shard(self, target, shard):
+        """
+        Add the cells of a shard to a target shard.
+
+        Args:
+            target (dict): The shard receiving the cells.
+            shard (dict): The shard whose cells are added.
+        """
+        for key, cells in shard.items():
+            target_cells = target.get(key)
+            if target_cells is None:
+                target_cells = target[key] = self.new_cells()
+            self.merge_cells(target_cells, cells)
+
+def _add_cells(target, cells):
+    """
+    Add cells element-wise to a target list of cells.
+
+    Args:
+        target (list): The cells receiving the values.
+        cells (list): The cells whose values are added.
+    """
+    for index, value in enumerate(cells):
+        target[index] += value
+
+class Counter:
+    def __init__(self):
+        """
+        Initialize the Counter class, a monotonically increasing count per label set.
+        """
+        self._shards = _ThreadShards(lambda: [0], _add_cells)
+
+    def inc(self, key=None, amount=1):
+        """
+        Increment the count of a label set.
+
+        Args:
+            key (hashable, optional): The label values. Defaults to None, for no labels.
+            amount (int): The increment. Defaults to 1.
+        """
+        self._shards.cells(key)[0] += amount
+
+    def value(self, key=None):
+        """
+        Return the count of a label set.
+
+        Args:
+            key (hashable, optional): The label values. Defaults to None.
+
+        Returns:
+            int: The count, 0 if the label set was never incremented.
+        """
+        cells = self._shards.merged().get(key)
+        return cells[0] if cells else 0
+
+    def values(self):
+        """
+        Return the count of every label set.
+
+        Returns:
+            dict: Label values mapped to their count.
+        """
+        return {key: cells[0] for key, cells in self._shards.merged().items()}
+
+class Gauge(Counter):
+    def dec(self, key=None, amount=1):
+        """
+        Decrement the value of a label set.
+
+        Each thread keeps its own running total, so a value raised and lowered by the
+        same thread, such as the number of requests it is serving, stays exact.
+
+        Args:
+            key (hashable, optional): The label values. Defaults to None, for no labels.
+            amount (int): The decrement. Defaults to 1.
+        """
+        self._shards.cells(key)[0] -= amount
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        Initialize the Histogram class with its bucket upper bounds.
+
+        Args:
+            buckets (tuple): Sorted upper bounds of the buckets. Values above the last
+                bound are counted in an extra overflow bucket.
+        """
+        self.buckets = tuple(buckets)
+
+        # Cells of a label set: one count per bucket, the overflow bucket, then the sum.
+        cell_count = len(self.buckets) + 2
+        self._shards = _ThreadShards(lambda: [0] * (cell_count - 1) + [0.0], _add_cells)
+
+    def observe(self, value, key=None):
+        """
+        Record one observation.
+
+        Args:
+            value (float): The observed value.
+            key (hashable, optional): The label values. Defaults to None, for no labels.
+        """
+        cells = self._shards.cells(key)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def snapshot(self, key=None):
+        """
+        Return the cumulative bucket counts, total count and sum of the observations.
+
+        Args:
+            key (hashable, optional): The label values. Defaults to None.
+
+        Returns:
+            dict: 'buckets' maps each upper bound (and '+Inf') to the number of
+                observations less than or equal to it, plus 'count' and 'sum'.
+        """
+        cells = self._shards.merged().get(key) or self._shards.new_cells()
+        return self._snapshot(cells)
+
+    def snapshots(self):
+        """
+        Return the snapshot of every label set.
+
+        Returns:
+            dict: Label values mapped to their snapshot.
+        """
+        return {key: self._snapshot(cells) for key, cells in self._shards.merged().items()}
+
+    def quantile(self, q, key=None):
+        """
+        Estimate a quantile of the observations, interpolating inside the bucket that holds it.
+
+        Args:
+            q (float): The quantile, between 0 and 1, such as 0.95.
+            key (hashable, optional): The label values. Defaults to None.
+
+        Returns:
+            float: The estimate, at most the last bucket bound, or None without observations.
+        """
+        snapshot = self.snapshot(key)
+        if not snapshot['count']:
+            return None
+
+        rank = q * snapshot['count']
+        lower, below = 0.0, 0
+        for bound, cumulative in snapshot['buckets'].items():
+            if cumulative >= rank:
+                if bound == '+Inf':
+                    return lower
+                return lower + (bound - lower) * (rank - below) / max(cumulative - below, 1)
+            lower, below = bound, cumulative
+
+    def _snapshot(self, cells):
+        """
+        Turn the merged cells of a label set into a snapshot.
+
+        Args:
+            cells (list): Bucket counts followed by the sum of the observations.
+
+        Returns:
+            dict: The snapshot, as returned by Histogram.snapshot.
+        """
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), cells[:-1]):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {'buckets': buckets, 'count': cumulative, 'sum': cells[-1]}
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Initialize the MetricsRegistry class, which renders metrics in the Prometheus text format.
+
+        Metrics are either updated as events happen (counters, gauges and histograms) or
+        collected when the registry is rendered, from counters a service already keeps.
+        """
+        self.metrics = {}
+
+    def register(self, name, metric_type, description, label_names, source):
+        """
+        Register a metric under a name.
+
+        Args:
+            name (str): The metric name.
+            metric_type (str): 'counter', 'gauge' or 'histogram'.
+            description (str): The help text of the metric.
+            label_names (tuple): Names of the labels, in the order of the label values.
+            source (Counter | Histogram | callable): The metric, or a callable returning
+                a dictionary of label values mapped to values (or histogram snapshots).
+
+        Returns:
+            Counter | Histogram | callable: The registered source.
+        """
+        self.metrics[name] = (metric_type, description, tuple(label_names), source)
+        return source
+
+    def get(self, name):
+        """
+        Return the source of a registered metric.
+
+        Args:
+            name (str): The metric name.
+
+        Returns:
+            Counter | Histogram | callable: The metric, or the callable collecting it.
+        """
+        return self.metrics[name][3]
+
+    def counter(self, name, description, label_names=()):
+        """
+        Create and register a Counter.
+
+        Returns:
+            Counter: The new counter.
+        """
+        return self.register(name, 'counter', description, label_names, Counter())
+
+    def gauge(self, name, description, label_names=()):
+        """
+        Create and register a Gauge.
+
+        Returns:
+            Gauge: The new gauge.
+        """
+        return self.register(name, 'gauge', description, label_names, Gauge())
+
+    def histogram(self, name, description, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        Create and register a Histogram.
+
+        Returns:
+            Histogram: The new histogram.
+        """
+        return self.register(name, 'histogram', description, label_names, Histogram(buckets))
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for name, (metric_type, description, label_names, source) in self.metrics.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            if callable(source):
+                samples = source()
+            elif metric_type == 'histogram':
+                samples = source.snapshots()
+            else:
+                samples = source.values()
+
+            for key, sample in sorted(samples.items(), key=lambda item: _label_values(item[0])):
+                labels = list(zip(label_names, _label_values(key)))
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(sample)}")
+                    continue
+                for bound, count in sample['buckets'].items():
+                    bucket_labels = labels + [('le', bound if bound == '+Inf' else _format_value(bound))]
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return '\n'.join(lines) + '\n'
+
+def _label_values(key):
+    """
+    Turn the key of a label set into a tuple of label values.
+
+    Args:
+        key (hashable): None for no labels, a single value or a tuple of values.
+
+    Returns:
+        tuple: The label values.
+    """
+    if key is None:
+        return ()
+    return key if isinstance(key, tuple) else (key,)
+
+def _format_labels(labels):
+    """
+    Format label names and values, escaping the values.
+
+    Args:
+        labels (list): Pairs of label name and value.
+
+    Returns:
+        str: The label set in braces, or an empty string without labels.
+    """
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    """
+    Format a sample value.
+
+    Args:
+        value (int | float): The value.
+
+    Returns:
+        str: The value as Prometheus expects it.
+    """
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
@@ -0,0 +1,15 @@
+"""
+Production WSGI entry point, served by gunicorn with 'gunicorn.conf.py'.
+
+The application is built once in the gunicorn master, before workers are forked:
+configuration, credentials, the city index and the newest cache entries are loaded
+here and shared copy-on-write by every worker.
+"""
+import gc
+from app import create_app
+
+app = create_app(start_background_tasks=False)
+app.extensions['weather_service'].preload()
+
+# Keep the garbage collector from touching, and so copying, the preloaded objects.
+gc.freeze()